@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 
+from app.api.sse import sse_response
 from app.models.chat import AskRequest, AskResponse
 from app.services.chat_service import chat_service
 
@@ -11,3 +12,9 @@ async def ask(request: AskRequest):
     """Single Q&A, stateless."""
     result = await chat_service.ask(request.message)
     return AskResponse(**result)
+
+
+@router.post("/ask/stream")
+async def ask_stream(request: AskRequest):
+    """Single Q&A streamed as Server-Sent Events (similar, token..., done | error)."""
+    return sse_response(chat_service.ask_stream(request.message))
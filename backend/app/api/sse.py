@@ -0,0 +1,31 @@
+"""Server-Sent Events helpers for streaming endpoints."""
+
+import json
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.responses import StreamingResponse
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one SSE message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """Stream ``{"event": ..., "data": ...}`` dicts as ``text/event-stream``.
+
+    When the client disconnects Starlette cancels the response, which closes
+    ``events`` and with it any upstream LLM stream.
+    """
+    async def body():
+        async for item in events:
+            yield format_sse(item["event"], item["data"])
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+        },
+    )
@@ -0,0 +1,81 @@
+from typing import Optional
+
+from fastapi import APIRouter, Query
+
+from app.services.ai_service import ai_service
+from app.services.circuit_breaker import breakers
+from app.services.duplicate_detector import duplicate_detector
+from app.services.executors import executors
+from app.services.llm_gateway import llm_gateway
+from app.services.outbox import outbox_service
+from app.services.ticket_stats import ticket_stats_service
+
+router = APIRouter()
+
+
+@router.get("/embedding-cache", response_model=dict)
+async def get_embedding_cache_stats():
+    """Get embedding cache hit/miss counters."""
+    return ai_service.embedding_cache.get_stats()
+
+
+@router.get("/embedding-batcher", response_model=dict)
+async def get_embedding_batcher_stats():
+    """Get embedding micro-batching counters."""
+    return ai_service.embedding_batcher.get_stats()
+
+
+@router.get("/search-batcher", response_model=dict)
+async def get_search_batcher_stats():
+    """Get similarity search coalescing counters (Milvus backend only)."""
+    batcher = getattr(ai_service.vector_store, "search_batcher", None)
+    return batcher.get_stats() if batcher else {}
+
+
+@router.get("/llm", response_model=dict)
+async def get_llm_gateway_stats():
+    """Get LLM gateway concurrency and queue-wait counters."""
+    return llm_gateway.get_stats()
+
+
+@router.get("/executors", response_model=dict)
+async def get_executor_stats():
+    """Get per-dependency thread pool queue depth and wait-time counters."""
+    return {name: executor.get_stats() for name, executor in executors.items()}
+
+
+@router.get("/breakers", response_model=dict)
+async def get_circuit_breakers():
+    """Get circuit breaker state (closed / open / half_open) per dependency."""
+    return {name: breaker.get_stats() for name, breaker in breakers.items()}
+
+
+@router.get("/duplicates", response_model=dict)
+async def get_duplicate_detector_stats():
+    """Get near-duplicate detector size, flag rate and average check latency."""
+    return duplicate_detector.get_stats()
+
+
+@router.get("/outbox", response_model=dict)
+async def get_outbox_stats():
+    """Get outbox job counts by status (pending / processing / done / dead) and worker counters."""
+    return await outbox_service.get_stats()
+
+
+@router.post("/outbox/retry", response_model=dict)
+async def retry_dead_outbox_jobs(jobId: Optional[str] = Query(None, description="Requeue only this job")):
+    """Requeue dead-lettered outbox jobs."""
+    requeued = await outbox_service.requeue_dead(jobId)
+    return {"requeued": requeued}
+
+
+@router.get("/ticket-stats", response_model=dict)
+async def get_ticket_stats_counters():
+    """Get the dashboard counters' last reconcile time, duration and drift."""
+    return ticket_stats_service.get_stats()
+
+
+@router.post("/ticket-stats/reconcile", response_model=dict)
+async def reconcile_ticket_stats_counters():
+    """Rebuild the dashboard counters from the tickets collection now."""
+    return await ticket_stats_service.reconcile()
@@ -2,14 +2,19 @@ from fastapi import APIRouter, HTTPException, Query, status, UploadFile, File
 from typing import Optional, List
 from pydantic import BaseModel
 from app.models.ticket import (
-    TicketCreate, TicketUpdate, TicketResponse, TicketImage,
-    TicketStatus, TicketSystemSource, TicketCategory, TicketPriority
+    TicketCreate, TicketUpdate, TicketResponse, TicketCreateResponse, TicketImage,
+    TicketStatus, TicketSystemSource, TicketCategory, TicketPriority, DuplicateCandidate
 )
+from app.api.sse import sse_response
 from app.schemas.response import TicketListResponse, MessageResponse
 from app.services.ticket_service import ticket_service
+from app.services.ticket_search import encode_cursor
 from app.services.ai_service import ai_service
+from app.services.duplicate_detector import duplicate_detector
+from app.services.vector_store import ticket_vector_metadata
+from app.services.executors import DependencySaturated
 from app.services.storage_service import storage_service
-from app.services.feishu_service import send_ticket_completed_message, send_ticket_created_message
+from app.services.feishu_service import send_ticket_created_message
 
 router = APIRouter()
 
@@ -31,6 +36,12 @@ class RecommendationResponse(BaseModel):
     recommendation: str
 
 
+class DuplicatesResponse(BaseModel):
+    """Likely duplicates of a ticket among recent open tickets."""
+    ticketId: str
+    duplicates: List[DuplicateCandidate]
+
+
 class UploadResponse(BaseModel):
     """Response for image upload."""
     image: TicketImage
@@ -42,7 +53,7 @@ class ImageDeleteResponse(BaseModel):
     success: bool
 
 
-@router.post("", response_model=TicketResponse, status_code=status.HTTP_201_CREATED)
+@router.post("", response_model=TicketCreateResponse, status_code=status.HTTP_201_CREATED)
 async def create_ticket(ticket_data: TicketCreate):
     """Create a new ticket."""
     created_by = ticket_data.createdBy
@@ -76,49 +87,48 @@ async def get_tickets(
     status: Optional[TicketStatus] = Query(None, description="Filter by status"),
     priority: Optional[TicketPriority] = Query(None, description="Filter by priority"),
     search: Optional[str] = Query(None, description="Search in description"),
-    createdBy: Optional[str] = Query(None, description="Filter by creator (fuzzy match)"),
-    ticketId: Optional[str] = Query(None, description="Filter by ticket ID")
+    createdBy: Optional[str] = Query(None, description="Filter by creator (case-insensitive substring match)"),
+    ticketId: Optional[str] = Query(None, description="Filter by ticket ID"),
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page (keyset pagination; page is ignored)")
 ):
-    """Get tickets with filtering and pagination."""
-    tickets, total = await ticket_service.get_tickets(
-        page=page,
-        page_size=pageSize,
-        system_source=systemSource,
-        category=category,
-        status=status,
-        priority=priority,
-        search=search,
-        created_by=createdBy,
-        ticket_id=ticketId
-    )
+    """Get tickets with filtering and pagination (page/pageSize or cursor)."""
+    try:
+        tickets, total, total_capped = await ticket_service.get_tickets(
+            page=page,
+            page_size=pageSize,
+            system_source=systemSource,
+            category=category,
+            status=status,
+            priority=priority,
+            search=search,
+            created_by=createdBy,
+            ticket_id=ticketId,
+            cursor=cursor
+        )
+    except ValueError as e:
+        # "status" is the filter parameter here, not fastapi.status
+        raise HTTPException(status_code=400, detail=str(e))
 
     total_pages = (total + pageSize - 1) // pageSize
+    next_cursor = None
+    if len(tickets) == pageSize:
+        next_cursor = encode_cursor(tickets[-1].createdAt, tickets[-1].id)
 
     return TicketListResponse(
         items=tickets,
         total=total,
         page=page,
         pageSize=pageSize,
-        totalPages=total_pages
+        totalPages=total_pages,
+        totalCapped=total_capped,
+        nextCursor=next_cursor
     )
 
 
 @router.get("/stats", response_model=dict)
 async def get_ticket_statistics():
     """Get ticket statistics for dashboard."""
-    stats = await ticket_service.get_ticket_statistics()
-    by_category = await ticket_service.get_tickets_by_category()
-    by_status = await ticket_service.get_tickets_by_status()
-    by_priority = await ticket_service.get_tickets_by_priority()
-    trend = await ticket_service.get_tickets_trend_7days()
-
-    return {
-        "overview": stats,
-        "byCategory": by_category,
-        "byStatus": by_status,
-        "byPriority": by_priority,
-        "trend": trend
-    }
+    return await ticket_service.get_dashboard_statistics()
 
 
 @router.get("/{ticket_id}")
@@ -137,18 +147,17 @@ async def update_ticket(ticket_id: str, ticket_data: TicketUpdate):
     if not ticket:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
 
-    # Store embedding and send notification when ticket status changes to COMPLETED
-    if ticket_data.status == "COMPLETED" and ticket.description:
-        await ai_service.store_ticket_embedding(
-            ticket_id=ticket_id,
-            description=ticket.description
-        )
-        # Send Feishu notification
-        await send_ticket_completed_message(
-            ticket_id=ticket.id,
-            description=ticket.description,
-            handle_detail=ticket.handleDetail
-        )
+    # In-memory, so kept in sync inline (adds completed tickets, drops reopened ones)
+    ai_service.index_ticket_text(ticket.model_dump())
+
+    # On COMPLETED, storing the embedding and the Feishu notification run
+    # from the outbox (enqueued by update_ticket), not in this request
+    if ticket_data.status != "COMPLETED" and any(
+        value is not None
+        for value in (ticket_data.status, ticket_data.systemSource, ticket_data.category, ticket_data.handleDetail)
+    ):
+        # Keep the filter fields stored with the vector in sync
+        await ai_service.update_ticket_metadata(ticket.id, ticket_vector_metadata(ticket.model_dump()))
 
     return ticket
 
@@ -160,8 +169,9 @@ async def delete_ticket(ticket_id: str):
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
 
-    # Also delete the embedding from Milvus
-    ai_service.milvus.delete_embedding(ticket_id)
+    # Also delete the embedding from the vector store and the lexical index
+    await ai_service.vector_store.delete_embedding(ticket_id)
+    ai_service.lexical_index.remove(ticket_id)
 
     return MessageResponse(message="Ticket deleted successfully", id=ticket_id)
 
@@ -177,10 +187,23 @@ async def generate_tags(request: TagGenerateRequest):
     return TagGenerateResponse(tags=tags)
 
 
+@router.get("/{ticket_id}/duplicates", response_model=DuplicatesResponse)
+async def get_ticket_duplicates(ticket_id: str):
+    """Get open tickets from the duplicate window that look like the same issue."""
+    ticket = await ticket_service.get_ticket_by_id(ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
+    duplicates = duplicate_detector.find(ticket.id, ticket.description, ticket.systemSource.value)
+    return DuplicatesResponse(ticketId=ticket.id, duplicates=duplicates)
+
+
 @router.get("/{ticket_id}/recommendation", response_model=RecommendationResponse)
-async def get_handling_recommendation(ticket_id: str):
+async def get_handling_recommendation(
+    ticket_id: str,
+    refresh: bool = Query(False, description="Ignore the stored recommendation and regenerate")
+):
     """Get AI-generated handling recommendation for a ticket."""
-    recommendation = await ai_service.generate_handling_recommendation(ticket_id)
+    recommendation = await ai_service.generate_handling_recommendation(ticket_id, refresh=refresh)
     if not recommendation:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -189,6 +212,15 @@ async def get_handling_recommendation(ticket_id: str):
     return RecommendationResponse(recommendation=recommendation)
 
 
+@router.get("/{ticket_id}/recommendation/stream")
+async def stream_handling_recommendation(
+    ticket_id: str,
+    refresh: bool = Query(False, description="Ignore the stored recommendation and regenerate")
+):
+    """Handling recommendation streamed as Server-Sent Events (similar, token..., done | error)."""
+    return sse_response(ai_service.stream_handling_recommendation(ticket_id, refresh=refresh))
+
+
 @router.post("/upload", response_model=UploadResponse)
 async def upload_image(file: UploadFile = File(...)):
     """Upload a single image for ticket.
@@ -200,7 +232,7 @@ async def upload_image(file: UploadFile = File(...)):
     content = await file.read()
 
     try:
-        image_info = storage_service.upload_image(
+        image_info = await storage_service.upload_image(
             file_data=content,
             filename=file.filename or "image.png",
             content_type=file.content_type or "image/png"
@@ -210,6 +242,8 @@ async def upload_image(file: UploadFile = File(...)):
         return UploadResponse(image=TicketImage(**image_info), url=url)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except DependencySaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Upload failed")
 
@@ -237,7 +271,7 @@ async def delete_ticket_image(ticket_id: str, image_id: str):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found")
 
     # Delete from storage
-    storage_service.delete_image(image_to_delete.storedName)
+    await storage_service.delete_image(image_to_delete.storedName)
 
     # Update ticket with new images list
     from app.models.ticket import TicketUpdate
@@ -17,11 +17,56 @@ class Settings(BaseSettings):
 
     # Zhipu AI
     zhipu_api_key: str = ""
+    zhipu_base_url: str = "https://open.bigmodel.cn/api/paas/v4"
+    llm_max_connections: int = 20  # LLM HTTP 连接池大小（keep-alive）
+    llm_max_concurrency: int = 8  # 同时进行的对话补全请求数上限
+    embedding_max_concurrency: int = 4  # 同时进行的 Embedding 请求数上限
+    llm_rate_limit: float = 10.0  # 每秒最多发起的 LLM/Embedding 请求数（0 表示不限）
+    llm_rate_burst: int = 20  # 令牌桶容量（允许的突发请求数）
+    llm_queue_timeout: int = 30  # 排队等待超过该秒数则放弃
+    llm_max_queue: int = 64  # 排队中的对话补全请求数上限，超出直接返回 503
+    embedding_max_queue: int = 128  # 排队中的 Embedding 请求数上限
+
+    # Vector store backend: "milvus" or "numpy" (进程内精确检索，无需 Milvus)
+    vector_store_backend: str = "milvus"
+    vector_store_path: str = "data/vectors"  # numpy 后端的数据目录
+    vector_store_persist_interval: int = 30  # numpy 后端持久化间隔（秒）
+    vector_store_compact_ratio: float = 0.2  # 墓碑占比超过该值时压缩
 
     # Milvus Vector Database
     milvus_host: str = "localhost"
     milvus_port: int = 19530
     milvus_collection: str = "ticket_embeddings"
+    milvus_write_batch_size: int = 256  # 写缓冲达到该条数时立即批量写入
+    milvus_write_interval: float = 1.0  # 写缓冲批量写入间隔（秒）
+    milvus_flush_interval: int = 60  # Milvus flush 间隔（秒），关闭时也会 flush
+    milvus_index_type: str = "IVF_FLAT"  # 向量索引类型：IVF_FLAT / IVF_SQ8 / IVF_PQ / HNSW（仅新建集合时生效）
+    milvus_index_nlist: int = 128  # IVF 聚类中心数
+    milvus_pq_m: int = 64  # IVF_PQ 子向量数（需整除向量维度），每条向量占 m 字节
+    milvus_pq_nbits: int = 8  # IVF_PQ 每个子向量编码位数
+    milvus_rerank_factor: int = 4  # 量化索引（IVF_SQ8 / IVF_PQ）先取 top_k × 该倍数 个候选，再用原始向量精确重排；1 为不重排
+    milvus_search_nprobe: int = 16  # IVF 检索时探查的聚类数
+    milvus_hnsw_m: int = 16  # HNSW 每个节点的最大连接数
+    milvus_hnsw_ef_construction: int = 200  # HNSW 建索引时的候选队列长度
+    milvus_search_ef: int = 64  # HNSW 检索时的候选队列长度（不小于 top_k）
+    milvus_search_batch_size: int = 32  # 单次合并检索的最大查询向量数
+    milvus_search_batch_wait_ms: int = 5  # 合并并发相似检索的等待窗口（毫秒）
+    similar_tickets_same_scope: bool = False  # 智能推荐只检索同来源系统、同类型的历史工单
+
+    # Hybrid retrieval: 向量检索 + 进程内 BM25 关键词检索（字符二元组），RRF 融合
+    hybrid_search: bool = True  # 关闭后仅使用向量检索
+    hybrid_candidates: int = 20  # 每路检索参与融合的候选数
+    hybrid_rrf_k: int = 60  # RRF 平滑常数
+    lexical_index_path: str = "data/lexical_index.json"  # BM25 索引持久化文件
+    lexical_index_persist_interval: int = 30  # BM25 索引持久化间隔（秒）
+
+    # Ticket list totals
+    ticket_list_total_mode: str = "exact"  # 有筛选时 exact: 精确总数；approximate: 计数封顶（显示 "1000+"）。无筛选时总是用集合元数据计数
+    ticket_list_count_cap: int = 1000  # approximate 模式下计数的上限
+
+    # Dashboard statistics
+    ticket_stats_materialized: bool = True  # 看板统计读 ticket_stats 物化计数（工单增删改时 $inc），关闭则每次聚合
+    ticket_stats_reconcile_interval: int = 3600  # 物化计数对账（全量重算并修正偏差）间隔（秒）
 
     # MinIO Object Storage
     minio_endpoint: str = "localhost:9000"
@@ -31,11 +76,55 @@ class Settings(BaseSettings):
     minio_secure: bool = False
     minio_url_expiry: int = 3600  # 1 hour in seconds
 
+    # Near-duplicate detection (MinHash/LSH over recent open tickets, 不调用 Embedding)
+    duplicate_detection: bool = True
+    duplicate_window_hours: int = 24  # 只与该时间窗口内创建的未完成工单比较
+    duplicate_threshold: float = 0.6  # 估计 Jaccard 相似度阈值
+    duplicate_minhash_perm: int = 64  # MinHash 签名长度（需为 bands 的整数倍）
+    duplicate_lsh_bands: int = 16  # LSH 分段数（段越多召回越高、候选越多）
+    duplicate_max_results: int = 5
+
+    # Circuit breakers: 连续失败 N 次后熔断，熔断期间直接走降级逻辑，M 秒后放行探测请求
+    llm_breaker_failures: int = 5
+    llm_breaker_recovery: int = 30
+    embedding_breaker_failures: int = 5
+    embedding_breaker_recovery: int = 30
+    milvus_breaker_failures: int = 5
+    milvus_breaker_recovery: int = 30
+    breaker_half_open_max_calls: int = 1  # 半开状态允许的并发探测请求数
+
+    # Outbox: 工单完成后的 Embedding 写入 / 飞书通知由后台任务异步执行
+    outbox_workers: int = 4  # 后台任务并发数
+    outbox_poll_interval: float = 1.0  # 空闲时轮询间隔（秒）
+    outbox_lease_seconds: int = 120  # 任务租约，超时未完成则由其他 worker 重新领取
+    outbox_max_attempts: int = 8  # 最大尝试次数，超出进入死信
+    outbox_backoff_base: float = 2.0  # 重试退避基数（秒），按 2^n 增长
+    outbox_backoff_max: float = 600.0  # 重试退避上限（秒）
+    outbox_retention_days: int = 7  # 已完成任务保留天数
+
+    # Dedicated thread pools for blocking dependency calls (满载时返回 503)
+    vector_executor_workers: int = 4  # Milvus 管理操作 / numpy 向量库线程数
+    vector_executor_queue: int = 64  # 等待队列上限
+    storage_executor_workers: int = 8  # MinIO 线程数
+    storage_executor_queue: int = 32  # 等待队列上限
+
     # Timeout settings (in seconds)
     milvus_timeout: int = 60  # Milvus 操作超时（首次插入可能较慢）
     embedding_timeout: int = 30  # Embedding API 超时 (文本较长可能需要更长时间)
     llm_timeout: int = 60  # LLM API 超时 (生成推荐/标签可能较慢)
 
+    # Prompt size: 推荐提示词的 token 预算（估算值），超出时先丢弃相似度最低的历史工单
+    prompt_token_budget: int = 3000
+    prompt_field_token_limit: int = 600  # 单个字段（问题描述/处理详情/解决方案模板）的 token 上限
+
+    # Embedding cache
+    embedding_cache_size: int = 2048  # 进程内 LRU 最大条目数
+    embedding_cache_ttl: int = 86400  # 进程内缓存过期时间（秒）
+    embedding_cache_persist: bool = True  # 是否使用 MongoDB 持久化缓存
+    embedding_cache_retention_days: int = 90  # MongoDB 缓存条目多少天未被使用后过期（TTL 索引）
+    embedding_batch_size: int = 16  # 单次批量 Embedding 请求最大条数
+    embedding_batch_wait_ms: int = 10  # 合并并发 Embedding 请求的等待窗口（毫秒）
+
     # Logging
     log_level: str = "INFO"  # 日志级别: DEBUG, INFO, WARNING, ERROR
     log_dir: str = "logs"  # 日志目录
@@ -1,12 +1,14 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional
 from app.config import settings
+from app.indexes import ensure_indexes
 from app.logger import get_logger
 
 logger = get_logger(__name__)
 
 client: Optional[AsyncIOMotorClient] = None
 database = None
+_supports_transactions: Optional[bool] = None
 
 
 async def connect_to_mongo():
@@ -16,18 +18,13 @@ async def connect_to_mongo():
     database = client[settings.database_name]
     print(f"Connected to MongoDB at {settings.mongodb_url}")
 
-    # Create TTL index for chat_sessions (expire after 1 day)
+    # Indexes from the registry in app/indexes.py (no-op when they exist)
     try:
-        collection = database["chat_sessions"]
-        existing_indexes = await collection.index_information()
-        if "createdAt_1" not in existing_indexes:
-            await collection.create_index(
-                "createdAt",
-                expireAfterSeconds=86400  # 1 day = 24 * 60 * 60
-            )
-            logger.info("Created TTL index for chat_sessions collection")
+        failed = await ensure_indexes(database)
+        if failed:
+            logger.warning(f"Missing MongoDB indexes: {failed}; run scripts/ensure_indexes.py --verify")
     except Exception as e:
-        logger.warning(f"Failed to create TTL index: {e}")
+        logger.warning(f"Failed to ensure MongoDB indexes: {e}")
 
 
 async def close_mongo_connection():
@@ -38,6 +35,29 @@ async def close_mongo_connection():
         print("Closed MongoDB connection")
 
 
+async def supports_transactions() -> bool:
+    """Whether the deployment is a replica set / sharded cluster (multi-document transactions)."""
+    global _supports_transactions
+    if _supports_transactions is None:
+        try:
+            hello = await client.admin.command("hello")
+            _supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception as e:
+            logger.warning(f"Failed to detect MongoDB topology: {e}")
+            return False
+        if not _supports_transactions:
+            logger.warning("MongoDB is standalone; multi-document writes run without a transaction")
+    return _supports_transactions
+
+
+async def run_in_transaction(callback: Callable[[Any], Awaitable[Any]]) -> Any:
+    """Run ``callback(session)`` in a transaction, or with ``session=None`` on a standalone server."""
+    if not await supports_transactions():
+        return await callback(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(callback)
+
+
 def get_database():
     """Get database instance."""
     return database
@@ -0,0 +1,268 @@
+"""Declarative MongoDB index registry.
+
+``INDEXES`` lists every index the application relies on, per collection.
+``ensure_indexes`` applies it at startup (``connect_to_mongo``) and from
+``scripts/ensure_indexes.py``; creating an index that already exists is a
+no-op, and a changed TTL is applied with ``collMod``. Indexes superseded by
+a registry change are listed in ``RETIRED_INDEXES`` and dropped once the
+new ones exist.
+
+``query_shapes()`` lists the filter + sort shapes the services issue and
+``pipeline_shapes()`` the aggregations (the ``$facet`` list pages), so
+``tests/test_query_plans.py`` (and ``scripts/ensure_indexes.py --verify``
+against a live deployment) can run ``explain()`` on each of them and fail
+if one falls back to a collection scan. Add the shape here together with
+its index when a new query is introduced.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.config import settings
+from app.logger import get_logger
+from app.services.ticket_search import (
+    TICKET_LIST_SORT, cursor_filter, encode_cursor, search_filter, ticket_list_pipeline
+)
+
+logger = get_logger(__name__)
+
+# MongoDB error code for an index that exists with different options
+INDEX_OPTIONS_CONFLICT = 85
+
+
+def _by_created(field: str) -> IndexModel:
+    """Equality filter on ``field`` + the ticket list order (createdAt, id)."""
+    return IndexModel([(field, ASCENDING)] + TICKET_LIST_SORT)
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "tickets": [
+        # Detail / update / delete / similar-ticket lookups. Sparse: legacy
+        # tickets without a custom id are addressed by _id.
+        IndexModel([("id", ASCENDING)], unique=True, sparse=True),
+        # Unfiltered list and the duplicate detector's window
+        IndexModel(TICKET_LIST_SORT),
+        # List filters (each optional) in list order; the trailing id lets
+        # keyset pagination seek on (createdAt, id) without a sort stage
+        _by_created("status"),
+        _by_created("systemSource"),
+        _by_created("category"),
+        _by_created("priority"),
+        # List text search (see ticket_search)
+        _by_created("searchTokens"),
+        _by_created("createdByTokens"),
+        # Lexical index catch-up after a restart
+        IndexModel([("updatedAt", ASCENDING)]),
+    ],
+    "outbox": [
+        IndexModel([("status", ASCENDING), ("nextAttemptAt", ASCENDING)]),
+        IndexModel([("completedAt", ASCENDING)], expireAfterSeconds=settings.outbox_retention_days * 86400),
+    ],
+    "chat_sessions": [
+        IndexModel([("createdAt", ASCENDING)], expireAfterSeconds=86400),  # 1 day
+    ],
+    "embedding_cache": [
+        IndexModel([("lastUsedAt", ASCENDING)], expireAfterSeconds=settings.embedding_cache_retention_days * 86400),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)]),
+    ],
+}
+
+
+# Superseded indexes, dropped by ensure_indexes
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    "tickets": [
+        # Replaced by the (…, createdAt, id) list indexes
+        "createdAt_-1",
+        "status_1_createdAt_-1",
+        "systemSource_1_createdAt_-1",
+        "category_1_createdAt_-1",
+        "priority_1_createdAt_-1",
+        "searchTokens_1_createdAt_-1",
+        "createdByLower_1_createdAt_-1",
+        # Creator search matches substrings through createdByTokens
+        "createdByLower_1_createdAt_-1_id_-1",
+    ],
+}
+
+
+def _ttl_seconds(model: IndexModel) -> Optional[int]:
+    return model.document.get("expireAfterSeconds")
+
+
+async def ensure_indexes(database) -> List[str]:
+    """Create every registered index; return the names that could not be created.
+
+    Indexes are created one by one so a failing index (e.g. duplicate ids
+    blocking the unique index) does not hold back the others.
+    """
+    failed: List[str] = []
+    for collection_name, models in INDEXES.items():
+        collection = database[collection_name]
+        for model in models:
+            name = model.document["name"]
+            try:
+                await collection.create_indexes([model])
+            except OperationFailure as e:
+                ttl = _ttl_seconds(model)
+                if e.code == INDEX_OPTIONS_CONFLICT and ttl is not None:
+                    # Retention setting changed: update the TTL in place
+                    await database.command(
+                        "collMod", collection_name,
+                        index={"keyPattern": dict(model.document["key"]), "expireAfterSeconds": ttl}
+                    )
+                    logger.info(f"索引 {collection_name}.{name} TTL 已更新为 {ttl}s")
+                    continue
+                logger.warning(f"Failed to create index {collection_name}.{name}: {e}")
+                failed.append(f"{collection_name}.{name}")
+
+    if not failed:
+        await _drop_retired(database)
+    return failed
+
+
+async def _drop_retired(database):
+    for collection_name, names in RETIRED_INDEXES.items():
+        collection = database[collection_name]
+        existing = await collection.index_information()
+        for name in names:
+            if name in existing:
+                await collection.drop_index(name)
+                logger.info(f"已删除被替代的索引 {collection_name}.{name}")
+
+
+# ==================== 查询计划校验 ====================
+
+def query_shapes() -> List[Tuple[str, str, Dict[str, Any], Optional[List[Tuple[str, int]]]]]:
+    """(name, collection, filter, sort) for each production query shape.
+
+    Values are placeholders; only the shape matters to the planner.
+    """
+    now = datetime.utcnow()
+    newest = TICKET_LIST_SORT
+    after = cursor_filter(encode_cursor(now, "AS-20260101-01"))
+    return [
+        ("ticket detail", "tickets", {"id": "AS-20260101-01"}, None),
+        ("ticket list", "tickets", {}, newest),
+        ("ticket list by status", "tickets", {"status": "OPEN"}, newest),
+        ("ticket list by systemSource", "tickets", {"systemSource": "OMS"}, newest),
+        ("ticket list by category", "tickets", {"category": "SYSTEM_FAILURE"}, newest),
+        ("ticket list by priority", "tickets", {"priority": "HIGH"}, newest),
+        ("ticket list by status + systemSource", "tickets", {"status": "OPEN", "systemSource": "OMS"}, newest),
+        ("ticket list by id", "tickets", {"id": "AS-20260101-01"}, newest),
+        ("ticket list cursor page", "tickets", after, newest),
+        ("ticket list cursor page by status", "tickets", {"status": "OPEN", **after}, newest),
+        (
+            "ticket list search", "tickets",
+            {"searchTokens": {"$all": ["支付", "订单"]}, "description": {"$regex": "订单", "$options": "i"}},
+            newest,
+        ),
+        ("ticket list by creator", "tickets", search_filter(None, "zhang"), newest),
+        (
+            "ticket list cursor page by status + search", "tickets",
+            {"status": "OPEN", **search_filter("支付订单", None), **after},
+            newest,
+        ),
+        (
+            "similar ticket fetch", "tickets",
+            {"id": {"$in": ["AS-20260101-01", "AS-20260101-02"]}, "status": "COMPLETED",
+             "handleDetail": {"$ne": "", "$exists": True}},
+            None,
+        ),
+        ("lexical index rebuild", "tickets", {"status": "COMPLETED"}, None),
+        ("lexical index catch-up", "tickets", {"updatedAt": {"$gte": now}}, None),
+        ("lexical index delete check", "tickets", {"id": {"$in": ["AS-20260101-01", "AS-20260101-02"]}}, None),
+        (
+            "duplicate detector rebuild", "tickets",
+            {"createdAt": {"$gte": now}, "status": {"$ne": "COMPLETED"}, "id": {"$exists": True}},
+            [("createdAt", ASCENDING)],
+        ),
+        (
+            "outbox claim", "outbox",
+            {"$or": [
+                {"status": "pending", "nextAttemptAt": {"$lte": now}},
+                {"status": "processing", "lockedUntil": {"$lte": now}},
+            ]},
+            [("nextAttemptAt", ASCENDING)],
+        ),
+        ("outbox requeue", "outbox", {"status": "dead"}, None),
+        ("user by email", "users", {"email": "user@example.com"}, None),
+    ]
+
+
+def pipeline_shapes() -> List[Tuple[str, str, List[Dict[str, Any]]]]:
+    """(name, collection, pipeline) for each production aggregation that reads through an index.
+
+    The dashboard ``stats_pipeline`` counts every ticket by design and is
+    served from the ``ticket_stats`` counters instead, so it is not listed.
+    """
+    by_status = {"status": "OPEN"}
+    search = search_filter("支付订单", None)
+    return [
+        ("ticket list page by status", "tickets", ticket_list_pipeline(by_status, 20, 10)),
+        ("ticket list page by category", "tickets", ticket_list_pipeline({"category": "SYSTEM_FAILURE"}, 0, 10)),
+        ("ticket list page by search", "tickets", ticket_list_pipeline(search, 0, 10)),
+        (
+            "ticket list page by status + category + search", "tickets",
+            ticket_list_pipeline({"status": "OPEN", "category": "SYSTEM_FAILURE", **search}, 0, 10),
+        ),
+        ("ticket list page by creator", "tickets", ticket_list_pipeline(search_filter(None, "zhang"), 0, 10)),
+        ("ticket list page by status (capped count)", "tickets", ticket_list_pipeline(by_status, 0, 10, cap=1000)),
+    ]
+
+
+def aggregate_query_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """The query-layer part of an aggregate explain (where the index choice is)."""
+    if "queryPlanner" in explain:
+        return explain
+    for stage in explain.get("stages", []):
+        if "$cursor" in stage:
+            return stage["$cursor"]
+    return {}
+
+
+def plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """All stage names of an explain() winning plan (classic or SBE format)."""
+    winning = plan.get("queryPlanner", {}).get("winningPlan", {})
+    winning = winning.get("queryPlan", winning)
+    stages: List[str] = []
+    pending = [winning]
+    while pending:
+        stage = pending.pop()
+        if not stage:
+            continue
+        stages.append(stage.get("stage", "?"))
+        if stage.get("inputStage"):
+            pending.append(stage["inputStage"])
+        pending.extend(stage.get("inputStages") or [])
+    return stages
+
+
+async def verify_query_plans(database) -> List[Dict[str, Any]]:
+    """Explain every query and pipeline shape; ``ok`` is False when the plan contains a COLLSCAN."""
+    results = []
+    for name, collection_name, query, sort in query_shapes():
+        cursor = database[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        stages = plan_stages(await cursor.limit(10).explain())
+        results.append({
+            "name": name,
+            "collection": collection_name,
+            "stages": stages,
+            "ok": "COLLSCAN" not in stages,
+        })
+    for name, collection_name, pipeline in pipeline_shapes():
+        explain = await database.command("aggregate", collection_name, pipeline=pipeline, explain=True)
+        stages = plan_stages(aggregate_query_plan(explain))
+        results.append({
+            "name": name,
+            "collection": collection_name,
+            "stages": stages,
+            "ok": bool(stages) and "COLLSCAN" not in stages,
+        })
+    return results
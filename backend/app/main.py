@@ -1,9 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.config import settings
 from app.database import connect_to_mongo, close_mongo_connection
-from app.api import tickets, users, chat, auth
+from app.services.ai_service import ai_service
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.duplicate_detector import duplicate_detector
+from app.services.executors import DependencySaturated, shutdown_executors
+from app.services.outbox import outbox_service
+from app.services.ticket_jobs import TICKET_JOB_HANDLERS
+from app.services.ticket_stats import ticket_stats_service
+from app.api import tickets, users, chat, auth, system
 from app.logger import setup_logging, get_logger
+import math
 import uvicorn
 
 # 初始化日志
@@ -43,24 +52,53 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_db_client():
-    """Connect to MongoDB on startup."""
+    """Connect to MongoDB and start background services on startup."""
     logger.info("Application starting up...")
     await connect_to_mongo()
+    await ai_service.start()
+    await duplicate_detector.rebuild()
+    await outbox_service.start(TICKET_JOB_HANDLERS)
+    await ticket_stats_service.start()
     logger.info("Application startup complete")
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    """Close MongoDB connection on shutdown."""
+    """Flush background services and close MongoDB connection on shutdown."""
     logger.info("Application shutting down...")
+    await ticket_stats_service.close()
+    await outbox_service.close()
+    await ai_service.shutdown()
+    shutdown_executors()
     await close_mongo_connection()
     logger.info("Application shutdown complete")
 
 
+@app.exception_handler(DependencySaturated)
+async def dependency_saturated_handler(request: Request, exc: DependencySaturated):
+    """A saturated dependency pool only fails the requests that need it."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "5"},
+    )
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """Fail fast while a dependency's circuit is open, instead of waiting for its timeout."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
 # Include routers
 app.include_router(tickets.router, prefix="/api/tickets", tags=["tickets"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
+app.include_router(system.router, prefix="/api/system", tags=["system"])
 
 
 @app.get("/")
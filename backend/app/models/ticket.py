@@ -50,6 +50,10 @@ class AIMetadata(BaseModel):
     keywords: List[str] = Field(default_factory=list)
     similarTickets: List[str] = Field(default_factory=list)
     suggestedSolution: Optional[str] = None
+    # Fingerprint of (description, similar ticket ids, prompt version) the
+    # stored suggestedSolution was generated from
+    recommendationFingerprint: Optional[str] = None
+    recommendedAt: Optional[datetime] = None
 
 
 class TicketImage(BaseModel):
@@ -120,3 +124,15 @@ class TicketResponse(Ticket):
 
     class Config:
         from_attributes = True
+
+
+class DuplicateCandidate(BaseModel):
+    """A recent open ticket that looks like the same incident."""
+    id: str
+    similarity: float = Field(..., description="Estimated Jaccard similarity of the descriptions")
+    createdAt: Optional[datetime] = None
+
+
+class TicketCreateResponse(TicketResponse):
+    """Schema for the create response, flagging likely duplicates."""
+    possibleDuplicates: List[DuplicateCandidate] = Field(default_factory=list)
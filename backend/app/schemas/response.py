@@ -17,6 +17,8 @@ class TicketListResponse(BaseModel):
     page: int
     pageSize: int
     totalPages: int
+    totalCapped: bool = Field(False, description="total is a lower bound (approximate total mode), e.g. 1000+")
+    nextCursor: Optional[str] = Field(None, description="Pass as cursor to fetch the next page; null on the last page")
 
 
 class TicketDetailResponse(BaseModel):
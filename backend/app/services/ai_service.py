@@ -1,251 +1,238 @@
 import asyncio
-from typing import List, Optional, Dict, Any
-from zhipuai import ZhipuAI
-from pymilvus import (
-    connections,
-    Collection,
-    FieldSchema,
-    CollectionSchema,
-    DataType,
-    utility,
-)
+import hashlib
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Dict, Any
 from app.config import settings
 from app.database import get_collection
 from app.logger import get_logger
+from app.services.embedding_cache import EmbeddingCache
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.executors import DependencySaturated
+from app.services.lexical_index import BM25Index, reciprocal_rank_fusion
+from app.services.llm_gateway import llm_gateway
+from app.services.micro_batcher import MicroBatcher
+from app.services.prompt_builder import CATEGORY_NAMES, SOURCE_NAMES, build_ticket_prompt
+from app.services.vector_store import create_vector_store, ticket_vector_metadata
 
 logger = get_logger(__name__)
 
+EMBEDDING_MODEL = "embedding-3"
+# Bump when the recommendation prompt (prompt_builder) changes so cached recommendations are regenerated
+RECOMMENDATION_PROMPT_VERSION = "2"
+# Ticket ids per query when dropping deleted tickets from the lexical index
+LEXICAL_CHECK_BATCH = 1000
 
-class MilvusService:
-    """Service for Milvus vector database operations."""
 
-    def __init__(self):
-        self.collection_name = settings.milvus_collection
-        self.embedding_dim = 1024  # Zhipu embedding-3 dimension
-        self._connected = False
-        self._collection = None
-
-    def connect(self):
-        """Connect to Milvus server."""
-        if self._connected:
-            return True
-
-        try:
-            connections.connect(
-                alias="default",
-                host=settings.milvus_host,
-                port=settings.milvus_port,
-                timeout=settings.milvus_timeout
-            )
-            self._connected = True
-            logger.info(f"Connected to Milvus at {settings.milvus_host}:{settings.milvus_port}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to Milvus: {e}")
-            return False
-
-    def create_collection(self):
-        """Create the ticket embeddings collection if not exists."""
-        if not self.connect():
-            return False
-
-        try:
-            # Check if collection exists
-            if utility.has_collection(self.collection_name):
-                self._collection = Collection(self.collection_name)
-                logger.info(f"Collection '{self.collection_name}' already exists")
-                return True
-
-            # Define fields
-            fields = [
-                FieldSchema(name="id", dtype=DataType.VARCHAR, is_primary=True, max_length=50),
-                FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.embedding_dim),
-            ]
-
-            # Create collection
-            schema = CollectionSchema(fields=fields, description="Ticket embeddings for similarity search")
-            self._collection = Collection(name=self.collection_name, schema=schema)
-
-            # Create index for vector search
-            index_params = {
-                "metric_type": "COSINE",
-                "index_type": "IVF_FLAT",
-                "params": {"nlist": 128}
-            }
-            self._collection.create_index(field_name="embedding", index_params=index_params)
-
-            logger.info(f"Collection '{self.collection_name}' created successfully")
-            return True
-
-        except Exception as e:
-            logger.error(f"Error creating collection: {e}")
-            return False
-
-    def get_collection(self) -> Optional[Collection]:
-        """Get the collection instance."""
-        if not self._collection:
-            self.create_collection()
-        return self._collection
-
-    def insert_embedding(self, ticket_id: str, embedding: List[float]) -> bool:
-        """Insert a ticket embedding into Milvus."""
-        collection = self.get_collection()
-        if not collection:
-            return False
-
-        try:
-            # Load collection first
-            collection.load()
-
-            # Delete existing embedding if any (ignore errors if not exists)
-            try:
-                collection.delete(f'id == "{ticket_id}"')
-            except Exception:
-                pass  # Ignore delete errors
-
-            # Insert new embedding
-            data = [
-                [ticket_id],
-                [embedding]
-            ]
-            collection.insert(data)
-            collection.flush()
-            return True
-        except Exception as e:
-            logger.error(f"Error inserting embedding: {e}")
-            return False
-
-    def search_similar(
-        self,
-        embedding: List[float],
-        top_k: int = 5,
-        filter_expr: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
-        """Search for similar ticket embeddings."""
-        collection = self.get_collection()
-        if not collection:
-            return []
-
-        try:
-            # Load collection to memory
-            collection.load()
-
-            # Search parameters
-            search_params = {"metric_type": "COSINE", "params": {"nprobe": 16}}
-
-            # Perform search
-            results = collection.search(
-                data=[embedding],
-                anns_field="embedding",
-                param=search_params,
-                limit=top_k,
-                expr=filter_expr,
-                output_fields=["id"]
-            )
+def recommendation_fingerprint(ticket: Dict[str, Any], similar_ids: List[str]) -> str:
+    """Identify the inputs a stored recommendation was generated from."""
+    payload = "\x1f".join([
+        RECOMMENDATION_PROMPT_VERSION,
+        str(ticket.get("systemSource") or ""),
+        str(ticket.get("category") or ""),
+        ticket.get("description") or "",
+        *similar_ids,
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-            # Extract results
-            similar_ids = []
-            for hits in results:
-                for hit in hits:
-                    similar_ids.append({
-                        "id": hit.entity.get("id"),
-                        "score": hit.score
-                    })
 
-            return similar_ids
-
-        except Exception as e:
-            logger.error(f"Error searching embeddings: {e}")
-            return []
-
-    def delete_embedding(self, ticket_id: str) -> bool:
-        """Delete a ticket embedding from Milvus."""
-        collection = self.get_collection()
-        if not collection:
-            return False
-
-        try:
-            collection.load()
-            collection.delete(f'id == "{ticket_id}"')
-            collection.flush()
-            return True
-        except Exception as e:
-            logger.error(f"Error deleting embedding: {e}")
-            return False
+def similar_ticket_summary(ticket: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of a similar ticket sent to clients."""
+    return {
+        "id": ticket.get("id"),
+        "description": ticket.get("description", ""),
+        "handleDetail": ticket.get("handleDetail", ""),
+        "score": ticket.get("score", 0),
+    }
 
 
 class AIService:
     """Service for AI-related operations using Zhipu AI."""
 
     def __init__(self):
-        self.client = None
-        if settings.zhipu_api_key:
-            self.client = ZhipuAI(api_key=settings.zhipu_api_key)
-
-        self.milvus = MilvusService()
-        # Initialize Milvus collection on startup
-        self.milvus.create_collection()
+        self.llm = llm_gateway
+        self.vector_store = create_vector_store()
+        self.lexical_index = BM25Index(settings.lexical_index_path)
+
+        self.embedding_cache = EmbeddingCache(EMBEDDING_MODEL, self.vector_store.embedding_dim)
+        self.embedding_batcher = MicroBatcher(
+            self._embed_batch,
+            max_batch_size=settings.embedding_batch_size,
+            max_wait_ms=settings.embedding_batch_wait_ms,
+            name="embedding"
+        )
+
+    # ==================== 生命周期 ====================
+
+    async def start(self):
+        """Open the vector store and lexical index and start their background tasks."""
+        await self.vector_store.start()
+        await self.lexical_index.start()
+        await self._catch_up_lexical_index()
+
+    async def shutdown(self):
+        """Stop background tasks, persist pending vector/lexical writes and close LLM connections."""
+        await self.vector_store.close()
+        await self.lexical_index.close()
+        await self.llm.close()
+
+    # ==================== 关键词索引 ====================
+
+    def index_ticket_text(self, ticket: Dict[str, Any]):
+        """Add a completed ticket with a handling detail to the lexical index, else drop it."""
+        metadata = ticket_vector_metadata(ticket)
+        if metadata["status"] == "COMPLETED" and metadata["has_handle_detail"]:
+            text = f"{ticket.get('description') or ''}\n{ticket.get('handleDetail') or ''}"
+            self.lexical_index.add(ticket["id"], text, metadata)
+        else:
+            self.lexical_index.remove(ticket["id"])
+
+    async def _catch_up_lexical_index(self):
+        """Rebuild the lexical index from MongoDB, or apply tickets updated since it was saved.
+
+        Deletes are not in the snapshot, so after a catch-up the indexed ids
+        are checked against the tickets collection and missing ones dropped.
+        """
+        saved_at = self.lexical_index.saved_at
+        if saved_at is None:
+            query: Dict[str, Any] = {"status": "COMPLETED"}
+        else:
+            # Small overlap for writes in flight while the index was persisted
+            query = {"updatedAt": {"$gte": saved_at - timedelta(minutes=1)}}
+
+        collection = await get_collection("tickets")
+        projection = {
+            "_id": 0, "id": 1, "description": 1, "handleDetail": 1,
+            "status": 1, "systemSource": 1, "category": 1, "createdAt": 1,
+        }
+        count = 0
+        async for doc in collection.find(query, projection):
+            if doc.get("id"):
+                self.index_ticket_text(doc)
+                count += 1
+
+        removed = 0
+        if saved_at is not None:
+            indexed = self.lexical_index.ticket_ids()
+            for start in range(0, len(indexed), LEXICAL_CHECK_BATCH):
+                chunk = indexed[start:start + LEXICAL_CHECK_BATCH]
+                existing = {
+                    doc["id"] async for doc in collection.find({"id": {"$in": chunk}}, {"_id": 0, "id": 1})
+                }
+                for ticket_id in chunk:
+                    if ticket_id not in existing:
+                        self.lexical_index.remove(ticket_id)
+                        removed += 1
+        logger.info(f"关键词索引 - 同步 {count} 条工单，移除已删除 {removed} 条，共 {len(self.lexical_index)} 条")
 
     # ==================== Embedding 相关 ====================
 
-    def get_embedding(self, text: str) -> Optional[List[float]]:
-        """Generate embedding for text using Zhipu AI."""
-        if not self.client:
-            return None
+    async def get_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Generate embeddings for several texts in one API call."""
+        if not self.llm.available or not texts:
+            return [None] * len(texts)
 
         try:
-            response = self.client.embeddings.create(
-                model="embedding-3",
-                input=text,
-                dimensions=self.milvus.embedding_dim,
-                timeout=settings.embedding_timeout
+            return await self.llm.embeddings(
+                texts,
+                model=EMBEDDING_MODEL,
+                dimensions=self.vector_store.embedding_dim
             )
-            return response.data[0].embedding
+        except CircuitOpenError:
+            # Provider is down; callers treat missing embeddings as "no match"
+            return [None] * len(texts)
         except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            return None
+            logger.error(f"Error generating {len(texts)} embeddings: {e!r}")
+            return [None] * len(texts)
+
+    async def _embed_batch(self, _key, texts: List[str]) -> List[Optional[List[float]]]:
+        """MicroBatcher handler: embed coalesced texts with one API call."""
+        unique_texts = list(dict.fromkeys(texts))
+        embeddings = await self.get_embeddings(unique_texts)
+        by_text = dict(zip(unique_texts, embeddings))
+        return [by_text[t] for t in texts]
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """Get embedding for text, served from the embedding cache when possible.
+
+        Cache misses from concurrent callers are coalesced into batched API calls.
+        """
+        embedding = await self.embedding_cache.get(text)
+        if embedding is not None:
+            return embedding
+
+        embedding = await asyncio.wait_for(
+            self.embedding_batcher.submit(text),
+            timeout=settings.embedding_timeout
+        )
+        if embedding:
+            await self.embedding_cache.put(text, embedding)
+        return embedding
+
+    async def embed_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Get embeddings for a batch of texts (cache first, then batched API calls)."""
+        embeddings = await self.embedding_cache.get_many(texts)
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+
+        batch_size = settings.embedding_batch_size
+        for start in range(0, len(missing), batch_size):
+            chunk = missing[start:start + batch_size]
+            chunk_texts = [texts[i] for i in chunk]
+            results = await asyncio.wait_for(
+                self._embed_batch(None, chunk_texts),
+                timeout=settings.embedding_timeout
+            )
+            await self.embedding_cache.put_many(chunk_texts, results)
+            for i, embedding in zip(chunk, results):
+                embeddings[i] = embedding
+
+        return embeddings
 
     async def store_ticket_embedding(
         self,
         ticket_id: str,
-        description: str
+        description: str,
+        metadata: Optional[Dict[str, Any]] = None
     ) -> bool:
-        """Generate and store embedding for a ticket in Milvus."""
+        """Generate and store embedding (with scalar metadata) for a ticket in the vector store."""
         if not description:
             return False
 
         try:
-            embedding = await asyncio.wait_for(
-                asyncio.to_thread(self.get_embedding, description),
-                timeout=settings.embedding_timeout
-            )
+            embedding = await self.embed(description)
             if not embedding:
                 return False
 
             return await asyncio.wait_for(
-                asyncio.to_thread(self.milvus.insert_embedding, ticket_id, embedding),
+                self.vector_store.insert_embedding(ticket_id, embedding, metadata),
                 timeout=settings.milvus_timeout
             )
         except asyncio.TimeoutError:
             logger.warning(f"Timeout storing embedding for ticket {ticket_id}")
             return False
 
-    async def find_similar_tickets(
+    async def update_ticket_metadata(self, ticket_id: str, metadata: Dict[str, Any]) -> bool:
+        """Keep vector metadata in sync after status/source/category/handleDetail edits."""
+        try:
+            return await asyncio.wait_for(
+                self.vector_store.update_metadata(ticket_id, metadata),
+                timeout=settings.milvus_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout updating vector metadata for ticket {ticket_id}")
+            return False
+        except Exception as e:
+            logger.error(f"Error updating vector metadata for ticket {ticket_id}: {e}")
+            return False
+
+    async def _vector_search(
         self,
         description: str,
-        limit: int = 5
+        top_k: int,
+        filters: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
-        """Find similar completed tickets using Milvus vector search."""
-        if not description:
-            return []
-
-        logger.info(f"向量搜索 - 搜索文本: {description}")
-
+        """Embed the text and search the vector store ([] if no embedding)."""
         try:
-            embedding = await asyncio.wait_for(
-                asyncio.to_thread(self.get_embedding, description),
-                timeout=settings.embedding_timeout
-            )
+            embedding = await self.embed(description)
         except asyncio.TimeoutError:
             raise TimeoutError("向量搜索超时：生成 Embedding 失败")
 
@@ -253,240 +240,301 @@ class AIService:
             return []
 
         try:
-            # Search in Milvus
             similar_results = await asyncio.wait_for(
-                asyncio.to_thread(self.milvus.search_similar, embedding, limit * 2),
+                self.vector_store.search_similar(embedding, top_k, filters),
                 timeout=settings.milvus_timeout
             )
+        except asyncio.TimeoutError:
+            raise TimeoutError("向量搜索超时：向量库查询失败")
 
-            logger.info(f"向量搜索 - Milvus 返回 {len(similar_results)} 条结果")
-            for r in similar_results:
-                logger.debug(f"  - ID: {r['id']}, 相似度: {r['score']:.4f}")
-
-            if not similar_results:
-                return []
+        logger.info(f"向量搜索 - 向量库返回 {len(similar_results)} 条结果")
+        for r in similar_results:
+            logger.debug(f"  - ID: {r['id']}, 相似度: {r['score']:.4f}")
+        return similar_results
 
-            # Get ticket IDs from Milvus results
-            ticket_ids = [r["id"] for r in similar_results]
+    async def find_similar_tickets(
+        self,
+        description: str,
+        limit: int = 5,
+        system_source: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Find similar completed tickets with hybrid (vector + BM25) search.
+
+        Status / handleDetail (and optionally source / category) filters run
+        inside both searches. With ``hybrid_search`` on, the two rankings are
+        merged by reciprocal-rank fusion, and when the embedding or vector
+        search is unavailable the lexical results are used on their own.
+        ``score`` stays the cosine similarity for vector hits; lexical-only
+        hits carry the share of query terms they contain.
+        """
+        if not description:
+            return []
 
-            # Fetch full ticket data from MongoDB
-            collection = await get_collection("tickets")
-            query = {
-                "id": {"$in": ticket_ids},
-                "status": "COMPLETED",
-                "handleDetail": {"$ne": "", "$exists": True}
-            }
+        logger.info(f"向量搜索 - 搜索文本: {description}")
 
-            results = []
-            async for doc in collection.find(query).limit(limit):
-                # Add similarity score from Milvus
-                for r in similar_results:
-                    if r["id"] == doc.get("id"):
-                        doc["score"] = r["score"]
-                        break
-                results.append(doc)
+        filters: Dict[str, Any] = {"status": "COMPLETED", "has_handle_detail": True}
+        if system_source:
+            filters["systemSource"] = system_source
+        if category:
+            filters["category"] = category
 
-            logger.info(f"向量搜索 - MongoDB 过滤后返回 {len(results)} 条结果")
+        # Stores without metadata (legacy Milvus schema) filter in MongoDB only
+        top_k = limit if self.vector_store.supports_filters else limit * 2
 
-            return results
+        lexical_results: List[Dict[str, Any]] = []
+        if settings.hybrid_search:
+            top_k = max(top_k, settings.hybrid_candidates)
+            lexical_results = self.lexical_index.search(description, top_k, filters)
+            logger.info(f"关键词搜索 - 返回 {len(lexical_results)} 条结果")
 
-        except asyncio.TimeoutError:
-            raise TimeoutError("向量搜索超时：Milvus 查询失败")
+        try:
+            vector_results = await self._vector_search(description, top_k, filters)
+        except TimeoutError as e:
+            if not lexical_results:
+                raise
+            logger.warning(f"{e}，仅使用关键词搜索结果")
+            vector_results = []
+
+        if not lexical_results:
+            ranking = {r["id"]: r["score"] for r in vector_results}
+        elif not vector_results:
+            ranking = {r["id"]: r["score"] for r in lexical_results}
+        else:
+            ranking = reciprocal_rank_fusion([vector_results, lexical_results], settings.hybrid_rrf_k)
+        if not ranking:
+            return []
 
-    # ==================== 智能推荐 ====================
+        scores = {r["id"]: r["coverage"] for r in lexical_results}
+        scores.update({r["id"]: r["score"] for r in vector_results})
 
-    def _build_recommendation_prompt(
-        self,
-        current_ticket: Dict[str, Any],
-        similar_tickets: List[Dict[str, Any]]
-    ) -> str:
-        """Build prompt for handling recommendation."""
-
-        category_map = {
-            "TICKET_PROCESS": "工单处理",
-            "SYSTEM_FAILURE": "系统故障"
+        # Fetch full ticket data from MongoDB; the status check guards
+        # against index metadata that has not caught up yet
+        collection = await get_collection("tickets")
+        query = {
+            "id": {"$in": list(ranking.keys())},
+            "status": "COMPLETED",
+            "handleDetail": {"$ne": "", "$exists": True}
         }
-        source_map = {
-            "TMS": "TMS运输管理系统",
-            "OMS": "OMS订单管理系统",
-            "WMS": "WMS仓储管理系统"
-        }
-
-        category_name = category_map.get(current_ticket.get("category"), current_ticket.get("category"))
-        source_name = source_map.get(current_ticket.get("systemSource"), current_ticket.get("systemSource"))
-
-        # Build similar tickets context with REAL ticket IDs
-        similar_context = ""
-        ticket_ids = []
-        if similar_tickets:
-            similar_context = "\n## 历史相似工单及处理方式\n\n"
-            for i, ticket in enumerate(similar_tickets, 1):
-                ticket_id = ticket.get('id', '未知')
-                ticket_ids.append(ticket_id)
-                score = ticket.get("score", 0)
-                similar_context += f"### 相似工单 {i}\n"
-                similar_context += f"- 工单编号: {ticket_id}\n"
-                similar_context += f"- 相似度: {score:.1%}\n"
-                similar_context += f"- 问题描述: {ticket.get('description', '无')}\n"
-                similar_context += f"- 处理详情: {ticket.get('handleDetail', '无')}\n"
-                if ticket.get('solutionTemplate'):
-                    similar_context += f"- 解决方案模板: {ticket.get('solutionTemplate')}\n"
-                similar_context += "\n"
-
-        # Build the list of available ticket IDs
-        available_ids = "\n".join([f"- {tid}" for tid in ticket_ids]) if ticket_ids else "无"
-
-        prompt = f"""你是一个售后工单处理助手。你只能根据历史相似工单的处理详情，为当前工单推荐处理步骤。
-
-## 当前工单信息
-- 工单编号: {current_ticket.get('id', '未知')}
-- 来源系统: {source_name}
-- 工单类型: {category_name}
-- 问题描述: {current_ticket.get('description', '无')}
 
-{similar_context}
+        results = []
+        async for doc in collection.find(query):
+            doc["score"] = scores[doc["id"]]
+            results.append(doc)
 
-## 严格要求
-1. 如果没有历史相似工单，必须回答"暂无相似工单推荐"
-2. 如果有历史相似工单，推荐的处理步骤必须来自上述相似工单的"处理详情",不能自己凭空编造,可以根据当前问题的具体情况，对历史处理步骤进行适当的顺序调整或合并，但不能添加新的内容
-3. 输出格式要清晰，便于阅读和执行
-4. 在输出内容的最后，必须列出你参考的工单编号（**只能使用下面列出的真实编号，如果可用真实工单编号没有，就显示 无相似工单**）：
+        # Keep the (fused) search ranking
+        results.sort(key=lambda d: ranking[d["id"]], reverse=True)
+        results = results[:limit]
 
-可用的真实工单编号：
-{available_ids}
+        logger.info(f"向量搜索 - MongoDB 校验后返回 {len(results)} 条结果")
 
----
-**参考工单：**
-（只能填写上面列出的真实编号）
-- AS-XXXXXXX-XX
-- ...
+        return results
 
-请直接输出处理步骤，不要输出开场白或其他无关内容。"""
+    async def _prepare_recommendation(
+        self,
+        ticket_id: str,
+        refresh: bool
+    ) -> Optional[Dict[str, Any]]:
+        """Load the ticket, retrieve similar tickets and check the stored recommendation.
+
+        Returns None if the ticket does not exist, else a dict with ``ticket``,
+        ``similar_tickets``, ``fingerprint`` and ``cached`` (stored text or None).
+        """
+        collection = await get_collection("tickets")
+        current_ticket = await collection.find_one({"id": ticket_id})
+        if not current_ticket:
+            return None
 
-        return prompt
+        # Find similar completed tickets using vector search
+        scope = {}
+        if settings.similar_tickets_same_scope:
+            scope = {
+                "system_source": current_ticket.get("systemSource"),
+                "category": current_ticket.get("category"),
+            }
+        similar_tickets = await self.find_similar_tickets(
+            description=current_ticket.get("description", ""),
+            limit=3,
+            **scope
+        )
+
+        fingerprint = recommendation_fingerprint(current_ticket, [t["id"] for t in similar_tickets])
+        ai_metadata = current_ticket.get("aiMetadata") or {}
+        cached = None
+        if (
+            not refresh
+            and ai_metadata.get("suggestedSolution")
+            and ai_metadata.get("recommendationFingerprint") == fingerprint
+        ):
+            logger.info(f"智能推荐 - 命中已保存的推荐: {ticket_id}")
+            cached = ai_metadata["suggestedSolution"]
+
+        return {
+            "ticket": current_ticket,
+            "similar_tickets": similar_tickets,
+            "fingerprint": fingerprint,
+            "cached": cached,
+        }
 
-    def _build_simple_recommendation_prompt(
+    async def _save_recommendation(
         self,
-        problem: str,
-        similar_tickets: List[Dict[str, Any]]
-    ) -> str:
-        """Build prompt for simple recommendation (used by smart assistant)."""
-
-        # Build similar tickets context
-        similar_context = ""
-        ticket_ids = []
-        if similar_tickets:
-            similar_context = "\n## 历史相似工单及处理方式\n\n"
-            for i, ticket in enumerate(similar_tickets, 1):
-                ticket_id = ticket.get('id', '未知')
-                ticket_ids.append(ticket_id)
-                score = ticket.get("score", 0)
-                similar_context += f"### 相似工单 {i}\n"
-                similar_context += f"- 工单编号: {ticket_id}\n"
-                similar_context += f"- 相似度: {score:.1%}\n"
-                similar_context += f"- 问题描述: {ticket.get('description', '无')}\n"
-                similar_context += f"- 处理详情: {ticket.get('handleDetail', '无')}\n"
-                if ticket.get('solutionTemplate'):
-                    similar_context += f"- 解决方案模板: {ticket.get('solutionTemplate')}\n"
-                similar_context += "\n"
-
-        # Build the list of available ticket IDs
-        available_ids = "\n".join([f"- {tid}" for tid in ticket_ids]) if ticket_ids else "无"
-
-        prompt = f"""你是一个售后工单处理助手。你只能根据历史相似工单的处理详情，为当前工单推荐处理步骤。
-
-## 用户问题
-{problem}
-
-{similar_context}
-
-## 严格要求
-1. 如果没有历史相似工单，必须回答"暂无相似工单推荐，建议创建工单由人工处理"
-2. 如果有历史相似工单，推荐的处理步骤必须来自上述相似工单的"处理详情",不能自己凭空编造,可以根据当前问题的具体情况，对历史处理步骤进行适当的顺序调整或合并，但不能添加新的内容
-3. 输出格式要清晰，便于阅读和执行
-4. 在输出内容的最后，必须列出你参考的工单编号（**只能使用下面列出的真实编号，如果可用真实工单编号没有，就显示 无相似工单**）：
-
-可用的真实工单编号：
-{available_ids}
-
----
-**参考工单：**
-（只能填写上面列出的真实编号）
-- AS-XXXXXXX-XX
-- ...
-
-请直接输出处理步骤，不要输出开场白或其他无关内容。"""
-
-        return prompt
+        ticket_id: str,
+        recommendation: str,
+        similar_ids: List[str],
+        fingerprint: str
+    ):
+        """Store a generated recommendation and its fingerprint in aiMetadata."""
+        collection = await get_collection("tickets")
+        await collection.update_one(
+            {"id": ticket_id},
+            {"$set": {
+                "aiMetadata.suggestedSolution": recommendation,
+                "aiMetadata.similarTickets": similar_ids,
+                "aiMetadata.recommendationFingerprint": fingerprint,
+                "aiMetadata.recommendedAt": datetime.utcnow(),
+            }}
+        )
+
+    @staticmethod
+    def _stale_recommendation(prepared: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Previously stored recommendation, served while the LLM circuit is open."""
+        if not prepared:
+            return None
+        ai_metadata = prepared["ticket"].get("aiMetadata") or {}
+        return ai_metadata.get("suggestedSolution") or None
 
     async def generate_handling_recommendation(
         self,
-        ticket_id: str
+        ticket_id: str,
+        refresh: bool = False
     ) -> Optional[str]:
-        """Generate handling recommendation for a ticket based on similar historical tickets."""
-        if not self.client:
+        """Generate handling recommendation for a ticket based on similar historical tickets.
+
+        The result is stored in the ticket's ``aiMetadata`` with a fingerprint
+        of its inputs and served from there until the description, the
+        similar-ticket set or the prompt version changes (or ``refresh``).
+        While the LLM circuit is open a stale stored recommendation is
+        returned if there is one; otherwise ``CircuitOpenError`` propagates.
+        """
+        if not self.llm.available:
             return None
 
+        prepared = None
         try:
-            # Get current ticket
-            collection = await get_collection("tickets")
-            current_ticket = await collection.find_one({"id": ticket_id})
-            if not current_ticket:
+            prepared = await self._prepare_recommendation(ticket_id, refresh)
+            if not prepared:
                 return None
-
-            # Find similar completed tickets using Milvus
-            similar_tickets = await self.find_similar_tickets(
-                description=current_ticket.get("description", ""),
-                limit=3
-            )
+            if prepared["cached"]:
+                return prepared["cached"]
 
             # Build prompt and generate recommendation
-            prompt = self._build_recommendation_prompt(current_ticket, similar_tickets)
+            prompt = build_ticket_prompt(prepared["ticket"], prepared["similar_tickets"])
 
             # Print prompt for review
-            logger.info(f"智能推荐 - 生成的提示词:\n{prompt}")
-
-            def _call_glm():
-                return self.client.chat.completions.create(
-                    model="GLM-4-Flash",
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=1000,
-                    timeout=settings.llm_timeout
+            logger.info(f"智能推荐 - 生成的提示词（{prompt.describe()}）:\n{prompt.text}")
+
+            content = await self.llm.chat(prompt.text, max_tokens=1000, temperature=0.7)
+            recommendation = content.strip()
+            if recommendation:
+                await self._save_recommendation(
+                    ticket_id,
+                    recommendation,
+                    [t["id"] for t in prepared["similar_tickets"]],
+                    prepared["fingerprint"]
                 )
-
-            response = await asyncio.wait_for(
-                asyncio.to_thread(_call_glm),
-                timeout=settings.llm_timeout + 5  # 额外 5 秒缓冲
-            )
-
-            return response.choices[0].message.content.strip()
+            return recommendation
 
         except asyncio.TimeoutError:
             logger.warning(f"Timeout generating recommendation for ticket {ticket_id}")
             return None
+        except CircuitOpenError:
+            stale = self._stale_recommendation(prepared)
+            if stale:
+                logger.info(f"智能推荐 - AI 服务熔断，返回已保存的推荐: {ticket_id}")
+                return stale
+            raise
+        except DependencySaturated:
+            raise
         except Exception as e:
             logger.error(f"Error generating recommendation: {e}")
             return None
 
+    async def stream_handling_recommendation(
+        self,
+        ticket_id: str,
+        refresh: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of ``generate_handling_recommendation``.
+
+        Yields ``{"event": ..., "data": ...}`` dicts: ``similar`` (the retrieved
+        tickets) first, then ``token`` deltas, then ``done`` with the full
+        text; ``error`` replaces the rest on failure. The completed text is
+        stored like the non-streaming path. While the LLM circuit is open a
+        stale stored recommendation is sent with ``"stale": true``.
+        """
+        if not self.llm.available:
+            yield {"event": "error", "data": {"message": "AI 服务未配置"}}
+            return
+
+        try:
+            prepared = await self._prepare_recommendation(ticket_id, refresh)
+        except Exception as e:
+            logger.error(f"Error preparing recommendation: {e}")
+            yield {"event": "error", "data": {"message": "搜索相似工单失败"}}
+            return
+        if not prepared:
+            yield {"event": "error", "data": {"message": "Ticket not found"}}
+            return
+
+        similar_tickets = prepared["similar_tickets"]
+        yield {"event": "similar", "data": [similar_ticket_summary(t) for t in similar_tickets]}
+
+        if prepared["cached"]:
+            yield {"event": "token", "data": {"text": prepared["cached"]}}
+            yield {"event": "done", "data": {"recommendation": prepared["cached"], "cached": True}}
+            return
+
+        prompt = build_ticket_prompt(prepared["ticket"], similar_tickets)
+        logger.info(f"智能推荐(流式) - 生成的提示词（{prompt.describe()}）:\n{prompt.text}")
+
+        parts: List[str] = []
+        try:
+            async for delta in self.llm.stream_chat(prompt.text, max_tokens=1000):
+                parts.append(delta)
+                yield {"event": "token", "data": {"text": delta}}
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout streaming recommendation for ticket {ticket_id}")
+            yield {"event": "error", "data": {"message": "生成推荐超时"}}
+            return
+        except CircuitOpenError:
+            stale = self._stale_recommendation(prepared)
+            if stale and not parts:
+                yield {"event": "token", "data": {"text": stale}}
+                yield {"event": "done", "data": {"recommendation": stale, "cached": True, "stale": True}}
+            else:
+                yield {"event": "error", "data": {"message": "AI 服务暂时不可用，请稍后重试"}}
+            return
+        except Exception as e:
+            logger.error(f"Error streaming recommendation: {e}")
+            yield {"event": "error", "data": {"message": "生成推荐失败"}}
+            return
+
+        recommendation = "".join(parts).strip()
+        if recommendation:
+            await self._save_recommendation(
+                ticket_id,
+                recommendation,
+                [t["id"] for t in similar_tickets],
+                prepared["fingerprint"]
+            )
+        yield {"event": "done", "data": {"recommendation": recommendation, "cached": False}}
+
     # ==================== 标签生成 ====================
 
     def _build_tag_prompt(self, description: str, category: str, system_source: str) -> str:
         """Build prompt for tag generation."""
-        category_map = {
-            "TICKET_PROCESS": "工单处理",
-            "SYSTEM_FAILURE": "系统故障"
-        }
-        source_map = {
-            "TMS": "TMS运输管理系统",
-            "OMS": "OMS订单管理系统",
-            "WMS": "WMS仓储管理系统"
-        }
-
-        category_name = category_map.get(category, category)
-        source_name = source_map.get(system_source, system_source)
+        category_name = CATEGORY_NAMES.get(category, category)
+        source_name = SOURCE_NAMES.get(system_source, system_source)
 
         prompt = f"""你是一个售后工单系统的标签分析助手。请根据以下工单信息，生成3-5个合适的标签。
 
@@ -518,29 +566,13 @@ class AIService:
         system_source: str
     ) -> List[str]:
         """Generate tags for a ticket using Zhipu AI."""
-        if not self.client:
+        if not self.llm.available:
             return []
 
         try:
             prompt = self._build_tag_prompt(description, category, system_source)
 
-            def _call_glm():
-                return self.client.chat.completions.create(
-                    model="GLM-4-Flash",
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=200,
-                    timeout=settings.llm_timeout
-                )
-
-            response = await asyncio.wait_for(
-                asyncio.to_thread(_call_glm),
-                timeout=settings.llm_timeout + 5
-            )
-
-            content = response.choices[0].message.content.strip()
+            content = (await self.llm.chat(prompt, max_tokens=200, temperature=0.7)).strip()
 
             # Parse tags from response (one per line)
             tags = []
@@ -556,6 +588,8 @@ class AIService:
         except asyncio.TimeoutError:
             logger.warning("Timeout generating tags")
             return []
+        except DependencySaturated:
+            raise
         except Exception as e:
             logger.error(f"Error generating tags: {e}")
             return []
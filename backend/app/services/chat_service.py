@@ -1,41 +1,48 @@
 import asyncio
-from typing import List, Dict, Any
-from zhipuai import ZhipuAI
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 
-from app.config import settings
 from app.models.chat import SimilarTicket
-from app.services.ai_service import ai_service
+from app.services.ai_service import ai_service, similar_ticket_summary
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.llm_gateway import llm_gateway
+from app.services.prompt_builder import build_question_prompt
 from app.logger import get_logger
 
 logger = get_logger(__name__)
 
+NO_RECOMMENDATION = "暂无相似工单推荐，建议创建工单由人工处理。"
+SEARCH_FAILED = "搜索相似工单时出现错误，建议创建工单由人工处理。"
+AI_UNAVAILABLE = "智能服务暂时不可用，建议创建工单由人工处理。"
+
 
 class ChatService:
     """Service for simplified chat operations (single Q&A mode)."""
 
     def __init__(self):
-        self.client = None
-        if settings.zhipu_api_key:
-            self.client = ZhipuAI(api_key=settings.zhipu_api_key)
+        self.llm = llm_gateway
 
-    async def ask(self, user_input: str) -> dict:
-        """
-        Single Q&A, stateless.
-        Returns: {"success": bool, "message": str, "similarTickets": list}
-        """
+    def _parse_question(self, user_input: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return (problem, None) or (None, format error message)."""
         # 1. Check format
         if not user_input.startswith("问题描述:"):
-            return {
-                "success": False,
-                "message": "请按以下格式输入您的问题：\n问题描述:您的问题内容\n\n例如：问题描述:订单无法支付"
-            }
+            return None, "请按以下格式输入您的问题：\n问题描述:您的问题内容\n\n例如：问题描述:订单无法支付"
 
         # 2. Extract problem description
         problem = user_input.replace("问题描述:", "").strip()
         if not problem:
+            return None, "请输入具体的问题描述"
+        return problem, None
+
+    async def ask(self, user_input: str) -> dict:
+        """
+        Single Q&A, stateless.
+        Returns: {"success": bool, "message": str, "similarTickets": list}
+        """
+        problem, error = self._parse_question(user_input)
+        if error:
             return {
                 "success": False,
-                "message": "请输入具体的问题描述"
+                "message": error
             }
 
         # 3. Search for similar tickets
@@ -45,7 +52,7 @@ class ChatService:
             logger.error(f"Error searching similar tickets: {e}")
             return {
                 "success": True,
-                "message": "搜索相似工单时出现错误，建议创建工单由人工处理。",
+                "message": SEARCH_FAILED,
                 "similarTickets": []
             }
 
@@ -53,15 +60,7 @@ class ChatService:
         recommendation = await self._generate_simple_recommendation(problem, similar_tickets)
 
         # Convert to SimilarTicket models
-        similar_ticket_models = [
-            SimilarTicket(
-                id=t.get("id"),
-                description=t.get("description", ""),
-                handleDetail=t.get("handleDetail", ""),
-                score=t.get("score", 0)
-            )
-            for t in similar_tickets
-        ]
+        similar_ticket_models = [SimilarTicket(**similar_ticket_summary(t)) for t in similar_tickets]
 
         return {
             "success": True,
@@ -69,6 +68,63 @@ class ChatService:
             "similarTickets": [t.model_dump() for t in similar_ticket_models]
         }
 
+    async def ask_stream(self, user_input: str) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of ``ask``.
+
+        Yields ``{"event": ..., "data": ...}`` dicts: ``similar`` first, then
+        ``token`` deltas, then ``done`` with the full message. A malformed
+        question yields a single ``error`` event.
+        """
+        problem, error = self._parse_question(user_input)
+        if error:
+            yield {"event": "error", "data": {"message": error}}
+            return
+
+        try:
+            similar_tickets = await ai_service.find_similar_tickets(problem, limit=3)
+        except Exception as e:
+            logger.error(f"Error searching similar tickets: {e}")
+            similar_tickets = None
+
+        yield {
+            "event": "similar",
+            "data": [
+                SimilarTicket(**similar_ticket_summary(t)).model_dump()
+                for t in similar_tickets or []
+            ]
+        }
+
+        if not similar_tickets or not self.llm.available:
+            message = SEARCH_FAILED if similar_tickets is None else NO_RECOMMENDATION
+            yield {"event": "token", "data": {"text": message}}
+            yield {"event": "done", "data": {"message": message}}
+            return
+
+        prompt = build_question_prompt(problem, similar_tickets)
+        logger.info(f"智能客服(流式) - 生成的提示词（{prompt.describe()}）:\n{prompt.text}")
+
+        parts: List[str] = []
+        try:
+            async for delta in self.llm.stream_chat(prompt.text, max_tokens=1000):
+                parts.append(delta)
+                yield {"event": "token", "data": {"text": delta}}
+        except CircuitOpenError:
+            if not parts:
+                yield {"event": "token", "data": {"text": AI_UNAVAILABLE}}
+                parts = [AI_UNAVAILABLE]
+        except asyncio.TimeoutError:
+            logger.warning("Timeout streaming recommendation")
+            if not parts:
+                yield {"event": "token", "data": {"text": NO_RECOMMENDATION}}
+                parts = [NO_RECOMMENDATION]
+        except Exception as e:
+            logger.error(f"Error streaming recommendation: {e}")
+            if not parts:
+                yield {"event": "token", "data": {"text": NO_RECOMMENDATION}}
+                parts = [NO_RECOMMENDATION]
+
+        yield {"event": "done", "data": {"message": "".join(parts).strip()}}
+
     async def _generate_simple_recommendation(
         self,
         problem: str,
@@ -76,39 +132,27 @@ class ChatService:
     ) -> str:
         """Generate simple recommendation based on similar tickets."""
         if not similar_tickets:
-            return "暂无相似工单推荐，建议创建工单由人工处理。"
+            return NO_RECOMMENDATION
 
-        if not self.client:
-            return "暂无相似工单推荐，建议创建工单由人工处理。"
+        if not self.llm.available:
+            return NO_RECOMMENDATION
 
-        # Reuse ai_service's prompt builder
-        prompt = ai_service._build_simple_recommendation_prompt(problem, similar_tickets)
+        prompt = build_question_prompt(problem, similar_tickets)
 
-        logger.info(f"智能客服 - 生成的提示词:\n{prompt}")
+        logger.info(f"智能客服 - 生成的提示词（{prompt.describe()}）:\n{prompt.text}")
 
         try:
-            def _call_glm():
-                return self.client.chat.completions.create(
-                    model="GLM-4-Flash",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.7,
-                    max_tokens=1000,
-                    timeout=settings.llm_timeout
-                )
-
-            response = await asyncio.wait_for(
-                asyncio.to_thread(_call_glm),
-                timeout=settings.llm_timeout + 5
-            )
-
-            return response.choices[0].message.content.strip()
+            content = await self.llm.chat(prompt.text, max_tokens=1000, temperature=0.7)
+            return content.strip()
 
+        except CircuitOpenError:
+            return AI_UNAVAILABLE
         except asyncio.TimeoutError:
             logger.warning("Timeout generating recommendation")
-            return "暂无相似工单推荐，建议创建工单由人工处理。"
+            return NO_RECOMMENDATION
         except Exception as e:
             logger.error(f"Error generating recommendation: {e}")
-            return "暂无相似工单推荐，建议创建工单由人工处理。"
+            return NO_RECOMMENDATION
 
 
 chat_service = ChatService()
@@ -0,0 +1,162 @@
+"""Circuit breakers for remote dependencies (Zhipu AI, Milvus).
+
+After ``failure_threshold`` consecutive failures a breaker opens and calls
+fail immediately with ``CircuitOpenError`` instead of waiting for the
+dependency's timeout, so callers can fall back at once. After
+``recovery_timeout`` seconds it lets a limited number of probe calls through
+(half-open): a success closes it, a failure opens it again.
+"""
+
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+from app.logger import get_logger
+from app.services.executors import DependencySaturated
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The dependency's circuit is open; the call was not attempted."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is temporarily unavailable (circuit open)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def _default_is_failure(exc: Exception) -> bool:
+    # Local back-pressure says nothing about the dependency's health
+    return not isinstance(exc, (CircuitOpenError, DependencySaturated))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        recovery_timeout: float,
+        half_open_max_calls: int = 1,
+        is_failure: Optional[Callable[[Exception], bool]] = None
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.is_failure = is_failure or _default_is_failure
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.stats: Dict[str, int] = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "rejected": 0,
+            "opened": 0,
+        }
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info(f"Circuit '{self.name}' half-open, probing")
+        return self._state
+
+    def retry_after(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.stats["opened"] += 1
+        logger.warning(
+            f"Circuit '{self.name}' opened after {self._failures} failures; "
+            f"failing fast for {self.recovery_timeout}s"
+        )
+
+    def _before_call(self):
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probes >= self.half_open_max_calls):
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(self.name, self.retry_after())
+        if state == HALF_OPEN:
+            self._probes += 1
+        self.stats["calls"] += 1
+
+    def record_success(self):
+        self.stats["successes"] += 1
+        self._failures = 0
+        if self._state != CLOSED:
+            logger.info(f"Circuit '{self.name}' closed")
+        self._state = CLOSED
+
+    def record_failure(self):
+        self.stats["failures"] += 1
+        self._failures += 1
+        if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+            self._open()
+
+    @asynccontextmanager
+    async def guard(self):
+        """Guard one call: raises ``CircuitOpenError`` if open, records the outcome otherwise."""
+        self._before_call()
+        probing = self._state == HALF_OPEN
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            elif probing:
+                self._probes -= 1
+            raise
+        except BaseException:
+            # Cancelled / generator closed: no verdict on the dependency
+            if probing:
+                self._probes -= 1
+            raise
+        else:
+            self.record_success()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Breaker state for monitoring."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_after": round(self.retry_after(), 1),
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            **self.stats,
+        }
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def register_breaker(
+    name: str,
+    failure_threshold: int,
+    recovery_timeout: float,
+    is_failure: Optional[Callable[[Exception], bool]] = None
+) -> CircuitBreaker:
+    """Create a breaker and make it visible through ``/api/system/breakers``."""
+    breaker = CircuitBreaker(
+        name,
+        failure_threshold,
+        recovery_timeout,
+        half_open_max_calls=settings.breaker_half_open_max_calls,
+        is_failure=is_failure
+    )
+    breakers[name] = breaker
+    return breaker
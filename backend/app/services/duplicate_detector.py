@@ -0,0 +1,221 @@
+"""Near-duplicate detection for newly created tickets with MinHash + LSH.
+
+The same incident is often filed many times in a short period. Each open
+ticket created within ``duplicate_window_hours`` is kept in memory as a
+MinHash signature of its description's shingles (``text_tokenizer``
+bigrams / codes). Signatures are split into LSH bands, so finding
+candidates is a few dict lookups, and candidates are confirmed by the
+estimated Jaccard similarity (share of equal signature slots). No
+embedding call is involved.
+
+The index holds only open tickets from the window. It is rebuilt from
+MongoDB at startup, and entries age out as the window moves.
+"""
+
+import heapq
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from app.config import settings
+from app.database import get_collection
+from app.logger import get_logger
+from app.services.text_tokenizer import tokenize
+
+logger = get_logger(__name__)
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Very short descriptions share most shingles by chance
+MIN_SHINGLES = 3
+
+
+class DuplicateDetector:
+    """MinHash/LSH index over recent open tickets."""
+
+    def __init__(self, num_perm: int, bands: int, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("duplicate_minhash_perm must be a multiple of duplicate_lsh_bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # a < 2^31 and 32-bit shingle hashes keep a * x + b below 2^64
+        self._a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        # ticket_id -> (signature, createdAt, systemSource)
+        self._entries: Dict[str, tuple] = {}
+        # Min-heap of (createdAt, ticket_id); may hold stale pairs of removed tickets
+        self._order: List[tuple] = []
+        self.stats: Dict[str, Any] = {"checks": 0, "flagged": 0, "check_us_total": 0.0}
+
+    # ==================== MinHash ====================
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of the text's shingle set (None if too short)."""
+        shingles = set(tokenize(text))
+        if len(shingles) < MIN_SHINGLES:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        permuted = (hashes[:, None] * self._a + self._b) % _PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[i * self.rows:(i + 1) * self.rows].tobytes()
+            for i in range(self.bands)
+        ]
+
+    # ==================== 索引维护 ====================
+
+    def _insert(self, ticket_id: str, signature: np.ndarray, created_at: datetime, scope: Optional[str]):
+        previous = self._entries.get(ticket_id)
+        self.remove(ticket_id)
+        self._entries[ticket_id] = (signature, created_at, scope)
+        # A re-indexed ticket keeps its createdAt and its heap entry
+        if previous is None or previous[1] != created_at:
+            heapq.heappush(self._order, (created_at, ticket_id))
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(key, set()).add(ticket_id)
+
+    def remove(self, ticket_id: str):
+        entry = self._entries.pop(ticket_id, None)
+        if entry is None:
+            return
+        for band, key in zip(self._buckets, self._band_keys(entry[0])):
+            members = band.get(key)
+            if members is not None:
+                members.discard(ticket_id)
+                if not members:
+                    del band[key]
+
+    @staticmethod
+    def _cutoff() -> datetime:
+        return datetime.utcnow() - timedelta(hours=settings.duplicate_window_hours)
+
+    def _expire(self):
+        """Drop entries created before the window (``_order`` is a heap by creation time)."""
+        cutoff = self._cutoff()
+        while self._order and self._order[0][0] < cutoff:
+            created_at, ticket_id = heapq.heappop(self._order)
+            entry = self._entries.get(ticket_id)
+            # Skip stale order entries of re-indexed tickets
+            if entry is not None and entry[1] == created_at:
+                self.remove(ticket_id)
+
+    # ==================== 查询 ====================
+
+    def _query(
+        self,
+        signature: np.ndarray,
+        scope: Optional[str],
+        exclude_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        candidates: Set[str] = set()
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            candidates |= band.get(key, set())
+        candidates.discard(exclude_id)
+
+        matches = []
+        for ticket_id in candidates:
+            other, created_at, other_scope = self._entries[ticket_id]
+            if scope and other_scope and scope != other_scope:
+                continue
+            similarity = float(np.mean(signature == other))
+            if similarity >= settings.duplicate_threshold:
+                matches.append({"id": ticket_id, "similarity": round(similarity, 3), "createdAt": created_at})
+
+        matches.sort(key=lambda m: m["similarity"], reverse=True)
+        return matches[:settings.duplicate_max_results]
+
+    def check_and_add(
+        self,
+        ticket_id: str,
+        description: str,
+        created_at: datetime,
+        scope: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Return likely duplicates of a new ticket among recent open tickets, then index it."""
+        if not settings.duplicate_detection:
+            return []
+        started = time.perf_counter()
+        self._expire()
+        signature = self.signature(description)
+        if signature is None:
+            return []
+
+        matches = self._query(signature, scope, exclude_id=ticket_id)
+        self._insert(ticket_id, signature, created_at, scope)
+
+        self.stats["checks"] += 1
+        self.stats["check_us_total"] += (time.perf_counter() - started) * 1e6
+        if matches:
+            self.stats["flagged"] += 1
+            logger.info(f"疑似重复工单: {ticket_id} ~ {[m['id'] for m in matches]}")
+        return matches
+
+    def find(self, ticket_id: str, description: str, scope: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Likely duplicates of an existing ticket among recent open tickets."""
+        self._expire()
+        entry = self._entries.get(ticket_id)
+        signature = entry[0] if entry is not None else self.signature(description)
+        if signature is None:
+            return []
+        return self._query(signature, scope, exclude_id=ticket_id)
+
+    def sync(self, ticket: Dict[str, Any]):
+        """Re-index an edited ticket, or drop it once it is completed or outside the window."""
+        status = getattr(ticket.get("status"), "value", ticket.get("status"))
+        created_at = ticket.get("createdAt")
+        if status == "COMPLETED" or created_at is None or created_at < self._cutoff():
+            self.remove(ticket["id"])
+            return
+        signature = self.signature(ticket.get("description") or "")
+        if signature is None:
+            self.remove(ticket["id"])
+            return
+        scope = getattr(ticket.get("systemSource"), "value", ticket.get("systemSource"))
+        self._insert(ticket["id"], signature, created_at, scope)
+
+    async def rebuild(self):
+        """Load open tickets created within the window from MongoDB."""
+        self._buckets = [{} for _ in range(self.bands)]
+        self._entries = {}
+        self._order = []
+        if not settings.duplicate_detection:
+            return
+
+        collection = await get_collection("tickets")
+        cutoff = self._cutoff()
+        cursor = collection.find(
+            {"createdAt": {"$gte": cutoff}, "status": {"$ne": "COMPLETED"}, "id": {"$exists": True}},
+            {"_id": 0, "id": 1, "description": 1, "createdAt": 1, "systemSource": 1}
+        ).sort("createdAt", 1)
+        async for doc in cursor:
+            signature = self.signature(doc.get("description") or "")
+            if signature is not None:
+                self._insert(doc["id"], signature, doc["createdAt"], doc.get("systemSource"))
+        logger.info(f"重复工单检测 - 已加载 {len(self._entries)} 条近期未完成工单")
+
+    def get_stats(self) -> Dict[str, Any]:
+        checks = self.stats["checks"]
+        return {
+            "indexed": len(self._entries),
+            "checks": checks,
+            "flagged": self.stats["flagged"],
+            "check_us_avg": round(self.stats["check_us_total"] / checks, 1) if checks else 0.0,
+            "window_hours": settings.duplicate_window_hours,
+            "threshold": settings.duplicate_threshold,
+        }
+
+
+duplicate_detector = DuplicateDetector(settings.duplicate_minhash_perm, settings.duplicate_lsh_bands)
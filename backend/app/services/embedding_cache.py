@@ -0,0 +1,194 @@
+"""Two-tier embedding cache (in-process LRU + persistent MongoDB collection).
+
+Persistent entries carry ``lastUsedAt``, refreshed at most daily when an
+entry is read from MongoDB; the TTL index in app/indexes.py removes
+entries unused for ``embedding_cache_retention_days``.
+"""
+
+import hashlib
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Tuple
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database import get_collection
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_COLLECTION = "embedding_cache"
+# lastUsedAt is rewritten only when older than this, so hot entries cost no writes
+LAST_USED_REFRESH = timedelta(days=1)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share one cache entry."""
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split())
+
+
+def make_cache_key(text: str, model: str, dim: int) -> str:
+    """Content address for an embedding: hash of normalized text, model and dimension."""
+    raw = f"{model}\x00{dim}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with size and TTL bounds."""
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: List[float]):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache in front of the embedding API.
+
+    Lookups go memory -> MongoDB; MongoDB hits are promoted into memory.
+    MongoDB errors (e.g. database not connected in scripts) degrade to
+    memory-only caching instead of failing the embedding call.
+    """
+
+    def __init__(self, model: str, dim: int):
+        self.model = model
+        self.dim = dim
+        self.memory = LRUCache(settings.embedding_cache_size, settings.embedding_cache_ttl)
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "errors": 0,
+        }
+
+    def key(self, text: str) -> str:
+        return make_cache_key(text, self.model, self.dim)
+
+    async def get(self, text: str) -> Optional[List[float]]:
+        """Return the cached embedding for text, or None."""
+        result = await self.get_many([text])
+        return result[0]
+
+    async def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up several texts at once (one MongoDB round trip for memory misses)."""
+        keys = [self.key(t) for t in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        missing: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            value = self.memory.get(key)
+            if value is not None:
+                self.stats["memory_hits"] += 1
+                results[i] = value
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing and settings.embedding_cache_persist:
+            try:
+                collection = await get_collection(CACHE_COLLECTION)
+                now = datetime.utcnow()
+                stale = []
+                async for doc in collection.find(
+                    {"_id": {"$in": list(missing.keys())}},
+                    {"embedding": 1, "lastUsedAt": 1}
+                ):
+                    value = doc["embedding"]
+                    self.memory.put(doc["_id"], value)
+                    for i in missing.pop(doc["_id"]):
+                        self.stats["persistent_hits"] += 1
+                        results[i] = value
+                    last_used = doc.get("lastUsedAt")
+                    if last_used is None or now - last_used > LAST_USED_REFRESH:
+                        stale.append(doc["_id"])
+                if stale:
+                    await collection.update_many({"_id": {"$in": stale}}, {"$set": {"lastUsedAt": now}})
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.debug(f"Embedding cache lookup skipped MongoDB: {e}")
+
+        self.stats["misses"] += sum(len(idx) for idx in missing.values())
+        return results
+
+    async def put(self, text: str, embedding: List[float]):
+        """Store an embedding in both tiers."""
+        await self.put_many([text], [embedding])
+
+    async def put_many(self, texts: List[str], embeddings: List[Optional[List[float]]]):
+        """Store several embeddings; None entries are skipped."""
+        docs = {}
+        for text, embedding in zip(texts, embeddings):
+            if not embedding:
+                continue
+            key = self.key(text)
+            self.memory.put(key, embedding)
+            docs[key] = embedding
+
+        if not docs or not settings.embedding_cache_persist:
+            return
+
+        try:
+            collection = await get_collection(CACHE_COLLECTION)
+            now = datetime.utcnow()
+            await collection.bulk_write([
+                UpdateOne(
+                    {"_id": key},
+                    {
+                        "$setOnInsert": {
+                            "model": self.model,
+                            "dim": self.dim,
+                            "embedding": embedding,
+                            "createdAt": now,
+                        },
+                        "$set": {"lastUsedAt": now},
+                    },
+                    upsert=True
+                )
+                for key, embedding in docs.items()
+            ], ordered=False)
+            self.stats["writes"] += len(docs)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.debug(f"Embedding cache write skipped MongoDB: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring."""
+        hits = self.stats["memory_hits"] + self.stats["persistent_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_size": len(self.memory),
+            "memory_max_size": self.memory.max_size,
+            "model": self.model,
+            "dim": self.dim,
+        }
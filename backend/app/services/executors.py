@@ -0,0 +1,134 @@
+"""Named, size-bounded thread pools for blocking calls to backend dependencies.
+
+Each dependency gets its own pool with a fixed number of workers and a
+bounded queue, so a slow dependency can only exhaust its own threads. When
+the queue is full, ``run`` fails fast with ``DependencySaturated`` (mapped to
+HTTP 503) instead of piling up more work behind a sick dependency.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DependencySaturated(Exception):
+    """A dependency's worker pool or request queue is full."""
+
+    def __init__(self, name: str):
+        super().__init__(f"{name} is saturated, try again later")
+        self.name = name
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded queue and queue-depth / wait-time metrics."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{name}-")
+        self.stats: Dict[str, Any] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "queued": 0,
+            "active": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "run_ms_total": 0.0,
+            "run_ms_max": 0.0,
+        }
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` in this pool and await its result.
+
+        Raises ``DependencySaturated`` if all workers are busy and the queue is full.
+        """
+        stats = self.stats
+        if stats["queued"] + stats["active"] >= self.max_workers + self.max_queue:
+            stats["rejected"] += 1
+            logger.warning(f"Executor '{self.name}' saturated ({stats['active']} active, {stats['queued']} queued)")
+            raise DependencySaturated(self.name)
+
+        stats["submitted"] += 1
+        stats["queued"] += 1
+        enqueued = time.monotonic()
+        started = None
+        finished = False
+
+        # Counters are only touched on the event loop thread
+        loop = asyncio.get_running_loop()
+
+        def _mark_started():
+            nonlocal started
+            if finished:
+                return  # caller already gave up (cancelled)
+            started = time.monotonic()
+            waited = (started - enqueued) * 1000
+            stats["queued"] -= 1
+            stats["active"] += 1
+            stats["wait_ms_total"] += waited
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], waited)
+
+        def _call():
+            loop.call_soon_threadsafe(_mark_started)
+            return fn(*args, **kwargs)
+
+        try:
+            result = await loop.run_in_executor(self._pool, _call)
+            stats["completed"] += 1
+            return result
+        except Exception:
+            stats["failed"] += 1
+            raise
+        finally:
+            # _mark_started is scheduled before the call returns, so it has run by now
+            # unless the caller was cancelled while the job was still queued
+            finished = True
+            if started is None:
+                stats["queued"] -= 1
+            else:
+                elapsed = (time.monotonic() - started) * 1000
+                stats["active"] -= 1
+                stats["run_ms_total"] += elapsed
+                stats["run_ms_max"] = max(stats["run_ms_max"], elapsed)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool counters for monitoring."""
+        stats = self.stats
+        started = stats["submitted"] - stats["queued"]
+        finished = stats["completed"] + stats["failed"]
+        return {
+            **{k: round(v, 1) if isinstance(v, float) else v for k, v in stats.items()},
+            "wait_ms_avg": round(stats["wait_ms_total"] / started, 1) if started else 0.0,
+            "run_ms_avg": round(stats["run_ms_total"] / finished, 1) if finished else 0.0,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+        }
+
+
+executors: Dict[str, BoundedExecutor] = {
+    # Milvus collection administration and the in-process NumPy vector store
+    "vector": BoundedExecutor("vector", settings.vector_executor_workers, settings.vector_executor_queue),
+    # MinIO object storage
+    "storage": BoundedExecutor("storage", settings.storage_executor_workers, settings.storage_executor_queue),
+}
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    return executors[name]
+
+
+def shutdown_executors():
+    for executor in executors.values():
+        executor.shutdown()
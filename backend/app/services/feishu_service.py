@@ -11,17 +11,21 @@ async def send_ticket_completed_message(
     ticket_id: str,
     description: str,
     handle_detail: str = None
-):
+) -> bool:
     """Send ticket completion notification to Feishu group.
 
     Args:
         ticket_id: Ticket ID (e.g., AS-20260227-21)
         description: Ticket description
         handle_detail: How the ticket was handled (optional)
+
+    Returns:
+        False if the notification should be retried, True otherwise
+        (sent, or no webhook configured).
     """
     if not settings.feishu_webhook_url:
         logger.warning("Feishu webhook URL not configured, skipping notification")
-        return
+        return True
 
     # Build message (must contain keywords: "工单号" and "已完成")
     text = f"工单号:{ticket_id}，问题描述:{description or '无'}，已经处理完成。处理方式:{handle_detail or '无'}！"
@@ -43,12 +47,13 @@ async def send_ticket_completed_message(
                 result = response.json()
                 if result.get("code") == 0:
                     logger.info(f"Feishu notification sent for ticket {ticket_id}")
-                else:
-                    logger.error(f"Feishu notification failed: {result}")
+                    return True
+                logger.error(f"Feishu notification failed: {result}")
             else:
                 logger.error(f"Feishu notification failed: {response.status_code} - {response.text}")
     except Exception as e:
         logger.error(f"Failed to send Feishu notification: {e}")
+    return False
 
 
 async def send_ticket_created_message(
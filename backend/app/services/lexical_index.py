@@ -0,0 +1,225 @@
+"""In-process BM25 index over completed tickets, plus reciprocal-rank fusion.
+
+The lexical side of hybrid retrieval: it matches exact error codes and
+order numbers that embeddings blur, and needs no network, so similar-ticket
+search still works while the embedding API is down. Documents are tokenized
+with ``text_tokenizer`` (Chinese character bigrams + alphanumeric codes).
+
+The index is updated in place as tickets change and persisted to a JSON
+file periodically and on shutdown; on startup it is loaded from that file
+and caught up with tickets updated since it was saved, and tickets deleted
+since then are dropped.
+"""
+
+import asyncio
+import json
+import math
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.logger import get_logger
+from app.services.executors import get_executor
+from app.services.text_tokenizer import tokenize
+
+logger = get_logger(__name__)
+
+INDEX_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], k: int = 60) -> Dict[str, float]:
+    """Fuse ranked ``[{"id": ...}, ...]`` lists: score(d) = sum of 1 / (k + rank)."""
+    fused: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            fused[hit["id"]] = fused.get(hit["id"], 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index, persisted as JSON."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # term -> {ticket_id: term frequency}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # ticket_id -> {"tf": {term: count}, "len": int, "meta": {...}}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._total_len = 0
+        self._dirty = False
+        self.saved_at: Optional[datetime] = None
+        self._persist_task: Optional[asyncio.Task] = None
+        self._executor = get_executor("vector")
+
+    # ==================== 生命周期 ====================
+
+    async def start(self):
+        """Load the index file and start periodic persistence."""
+        await self._executor.run(self.load)
+        if self._persist_task is None:
+            self._persist_task = asyncio.create_task(self._persist_loop())
+
+    async def close(self):
+        """Stop periodic persistence and persist."""
+        if self._persist_task is not None:
+            self._persist_task.cancel()
+            try:
+                await self._persist_task
+            except asyncio.CancelledError:
+                pass
+            self._persist_task = None
+
+        await self._executor.run(self.persist)
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(settings.lexical_index_persist_interval)
+            try:
+                await self._executor.run(self.persist)
+            except Exception as e:
+                logger.error(f"Lexical index persist error: {e}")
+
+    # ==================== 持久化 ====================
+
+    def load(self):
+        """Load the persisted index; leaves it empty (``saved_at`` None) if missing or stale."""
+        if not self.path.exists():
+            logger.info("关键词索引文件不存在，将从 MongoDB 重建")
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"关键词索引文件损坏，将从 MongoDB 重建: {e}")
+            return
+        if data.get("version") != INDEX_VERSION:
+            logger.info("关键词索引版本变化，将从 MongoDB 重建")
+            return
+
+        with self._lock:
+            for ticket_id, doc in data["docs"].items():
+                self._add_doc(ticket_id, doc["tf"], doc["meta"])
+            self.saved_at = datetime.fromisoformat(data["savedAt"])
+            self._dirty = False
+        logger.info(f"Loaded lexical index with {len(self._docs)} tickets")
+
+    def persist(self):
+        """Write the index atomically if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            saved_at = datetime.utcnow()
+            payload = json.dumps({
+                "version": INDEX_VERSION,
+                "savedAt": saved_at.isoformat(),
+                "docs": {
+                    ticket_id: {"tf": doc["tf"], "meta": doc["meta"]}
+                    for ticket_id, doc in self._docs.items()
+                },
+            }, ensure_ascii=False)
+            self._dirty = False
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self.saved_at = saved_at
+
+    # ==================== 写入 ====================
+
+    def _add_doc(self, ticket_id: str, tf: Dict[str, int], meta: Dict[str, Any]):
+        length = sum(tf.values())
+        self._docs[ticket_id] = {"tf": tf, "len": length, "meta": meta}
+        self._total_len += length
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[ticket_id] = count
+
+    def _remove_doc(self, ticket_id: str) -> bool:
+        doc = self._docs.pop(ticket_id, None)
+        if doc is None:
+            return False
+        self._total_len -= doc["len"]
+        for term in doc["tf"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(ticket_id, None)
+                if not postings:
+                    del self._postings[term]
+        return True
+
+    def add(self, ticket_id: str, text: str, meta: Dict[str, Any]):
+        """Index (or re-index) a ticket's text with its filter metadata."""
+        tf = dict(Counter(tokenize(text)))
+        with self._lock:
+            self._remove_doc(ticket_id)
+            if tf:
+                self._add_doc(ticket_id, tf, meta)
+            self._dirty = True
+
+    def remove(self, ticket_id: str):
+        with self._lock:
+            if self._remove_doc(ticket_id):
+                self._dirty = True
+
+    def ticket_ids(self) -> List[str]:
+        """Ids of the indexed tickets."""
+        with self._lock:
+            return list(self._docs)
+
+    # ==================== 检索 ====================
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Top-k tickets by BM25 score.
+
+        Returns ``[{"id", "score", "coverage"}]``; ``coverage`` is the share of
+        distinct query terms the ticket contains (0-1). ``filters`` maps
+        metadata fields to required values.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return []
+            avg_len = self._total_len / n_docs
+
+            scores: Dict[str, float] = {}
+            matched: Dict[str, int] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for ticket_id, tf in postings.items():
+                    doc_len = self._docs[ticket_id]["len"]
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avg_len)
+                    scores[ticket_id] = scores.get(ticket_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+                    matched[ticket_id] = matched.get(ticket_id, 0) + 1
+
+            if filters:
+                scores = {
+                    ticket_id: score for ticket_id, score in scores.items()
+                    if all(self._docs[ticket_id]["meta"].get(f) == v for f, v in filters.items())
+                }
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            {"id": ticket_id, "score": score, "coverage": matched[ticket_id] / len(terms)}
+            for ticket_id, score in ranked
+        ]
+
+    def __len__(self) -> int:
+        return len(self._docs)
@@ -0,0 +1,318 @@
+"""Shared async gateway to the Zhipu AI HTTP API (chat completions and embeddings).
+
+Every LLM / embedding call in the backend goes through one pooled
+``httpx.AsyncClient`` and an admission step: a process-wide token bucket
+(requests per second) followed by a per-lane concurrency semaphore. Waiters
+are admitted in arrival order, so bursts queue fairly instead of tripping
+the provider's rate limit, and the time spent queueing is recorded. Each
+lane's queue is bounded; beyond it requests fail fast with
+``DependencySaturated``. Each lane also has a circuit breaker, so while the
+provider is failing calls are rejected at once with ``CircuitOpenError``.
+"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.config import settings
+from app.logger import get_logger
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, register_breaker
+from app.services.executors import DependencySaturated
+
+logger = get_logger(__name__)
+
+CHAT_MODEL = "GLM-4-Flash"
+
+
+class LLMError(Exception):
+    """Non-success response from the LLM provider."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"LLM API error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Async token bucket; waiters are served in FIFO order."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait for one token (no-op when rate <= 0)."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+def _is_provider_failure(exc: Exception) -> bool:
+    """Errors that indicate the provider is unhealthy (not our request or our back-pressure)."""
+    if isinstance(exc, LLMError):
+        return exc.status_code >= 500 or exc.status_code == 429
+    return not isinstance(exc, (CircuitOpenError, DependencySaturated))
+
+
+class Lane:
+    """Concurrency limit, circuit breaker and queueing counters for one kind of call."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, breaker: CircuitBreaker):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.breaker = breaker
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "errors": 0,
+            "rejected": 0,
+            "waiting": 0,
+            "in_flight": 0,
+            "queue_wait_ms_total": 0.0,
+            "queue_wait_ms_max": 0.0,
+            # Provider-reported usage
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    def record_usage(self, usage: Optional[Dict[str, Any]]):
+        if not usage:
+            return
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["completion_tokens"] += completion_tokens
+        logger.debug(f"LLM {self.name} usage: prompt={prompt_tokens}, completion={completion_tokens}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        admitted = self.stats["requests"]
+        return {
+            **self.stats,
+            "queue_wait_ms_total": round(self.stats["queue_wait_ms_total"], 1),
+            "queue_wait_ms_max": round(self.stats["queue_wait_ms_max"], 1),
+            "queue_wait_ms_avg": round(self.stats["queue_wait_ms_total"] / admitted, 1) if admitted else 0.0,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+class LLMGateway:
+    """Pooled, rate-limited async client for chat completions and embeddings."""
+
+    def __init__(self):
+        self.api_key = settings.zhipu_api_key
+        self.base_url = settings.zhipu_base_url.rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+        self.bucket = TokenBucket(settings.llm_rate_limit, settings.llm_rate_burst)
+        self.lanes = {
+            "chat": Lane(
+                "chat", settings.llm_max_concurrency, settings.llm_max_queue,
+                register_breaker(
+                    "llm", settings.llm_breaker_failures, settings.llm_breaker_recovery,
+                    is_failure=_is_provider_failure
+                )
+            ),
+            "embedding": Lane(
+                "embedding", settings.embedding_max_concurrency, settings.embedding_max_queue,
+                register_breaker(
+                    "embedding", settings.embedding_breaker_failures, settings.embedding_breaker_recovery,
+                    is_failure=_is_provider_failure
+                )
+            ),
+        }
+
+    @property
+    def available(self) -> bool:
+        """Whether an API key is configured."""
+        return bool(self.api_key)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_connections,
+                    keepalive_expiry=60,
+                ),
+                timeout=httpx.Timeout(settings.llm_timeout, connect=10),
+            )
+        return self._client
+
+    async def close(self):
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @asynccontextmanager
+    async def _admit(self, lane_name: str):
+        """Pass the lane's circuit breaker, then wait for a rate-limit token and
+        a concurrency slot, recording queue time.
+
+        Raises ``CircuitOpenError`` while the provider is considered down and
+        ``DependencySaturated`` if the lane's queue is full or the wait
+        exceeds ``llm_queue_timeout`` seconds.
+        """
+        lane = self.lanes[lane_name]
+        async with lane.breaker.guard():
+            if lane.stats["waiting"] >= lane.max_queue:
+                lane.stats["rejected"] += 1
+                raise DependencySaturated(f"llm-{lane_name}")
+            lane.stats["waiting"] += 1
+            started = time.monotonic()
+            try:
+                async with asyncio.timeout(settings.llm_queue_timeout):
+                    await self.bucket.acquire()
+                    await lane.semaphore.acquire()
+            except TimeoutError:
+                lane.stats["rejected"] += 1
+                logger.warning(f"LLM {lane_name} 请求排队超时 ({settings.llm_queue_timeout}s)")
+                raise DependencySaturated(f"llm-{lane_name}")
+            finally:
+                lane.stats["waiting"] -= 1
+
+            waited_ms = (time.monotonic() - started) * 1000
+            lane.stats["requests"] += 1
+            lane.stats["queue_wait_ms_total"] += waited_ms
+            lane.stats["queue_wait_ms_max"] = max(lane.stats["queue_wait_ms_max"], waited_ms)
+            lane.stats["in_flight"] += 1
+            try:
+                yield
+            except Exception:
+                lane.stats["errors"] += 1
+                raise
+            finally:
+                lane.stats["in_flight"] -= 1
+                lane.semaphore.release()
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response):
+        if response.is_success:
+            return
+        try:
+            message = response.json().get("error", {}).get("message") or response.text
+        except (ValueError, AttributeError):
+            message = response.text
+        raise LLMError(response.status_code, message)
+
+    async def chat(
+        self,
+        prompt: str,
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        model: str = CHAT_MODEL
+    ) -> str:
+        """Single-turn chat completion; returns the message content."""
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        async with self._admit("chat"):
+            try:
+                response = await self._get_client().post("/chat/completions", json=payload)
+            except httpx.TimeoutException:
+                raise asyncio.TimeoutError()
+            self._raise_for_status(response)
+            data = response.json()
+            self.lanes["chat"].record_usage(data.get("usage"))
+            return data["choices"][0]["message"]["content"] or ""
+
+    async def stream_chat(
+        self,
+        prompt: str,
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        model: str = CHAT_MODEL
+    ) -> AsyncIterator[str]:
+        """Streaming chat completion; yields content deltas as they arrive.
+
+        The concurrency slot is held until the stream ends or the generator
+        is closed, which also closes the HTTP response. Raises
+        ``asyncio.TimeoutError`` if no data arrives within ``llm_timeout``.
+        """
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+        async with self._admit("chat"):
+            try:
+                async with self._get_client().stream("POST", "/chat/completions", json=payload) as response:
+                    if not response.is_success:
+                        await response.aread()
+                        self._raise_for_status(response)
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        # The final chunk carries the usage for the whole stream
+                        self.lanes["chat"].record_usage(chunk.get("usage"))
+                        choices = chunk.get("choices") or []
+                        delta = choices[0].get("delta", {}).get("content") if choices else None
+                        if delta:
+                            yield delta
+            except httpx.TimeoutException:
+                raise asyncio.TimeoutError()
+
+    async def embeddings(
+        self,
+        texts: List[str],
+        model: str,
+        dimensions: int
+    ) -> List[Optional[List[float]]]:
+        """Embed several texts in one call, in input order."""
+        payload = {"model": model, "input": texts, "dimensions": dimensions}
+        async with self._admit("embedding"):
+            try:
+                response = await self._get_client().post(
+                    "/embeddings",
+                    json=payload,
+                    timeout=settings.embedding_timeout
+                )
+            except httpx.TimeoutException:
+                raise asyncio.TimeoutError()
+            self._raise_for_status(response)
+
+        data = response.json()
+        self.lanes["embedding"].record_usage(data.get("usage"))
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for item in data["data"]:
+            embeddings[item["index"]] = item["embedding"]
+        return embeddings
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-lane admission counters and token usage for monitoring."""
+        return {
+            "rate_limit": self.bucket.rate,
+            "rate_burst": self.bucket.capacity,
+            "lanes": {name: lane.get_stats() for name, lane in self.lanes.items()},
+        }
+
+
+llm_gateway = LLMGateway()
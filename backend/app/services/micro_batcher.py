@@ -0,0 +1,105 @@
+"""Async micro-batching: coalesce concurrent requests into one batched call."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+BatchHandler = Callable[[Hashable, List[Any]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    """Collect concurrent submissions for a few milliseconds (or up to N items)
+    and hand them to ``handler`` as one batch.
+
+    Submissions are grouped by ``key`` so only compatible requests share a
+    batch. The handler must return one result per item, in order; an
+    exception from the handler (or a result count that does not match) is
+    propagated to every waiter of that batch, and waiters are cancelled if
+    the batch task itself is cancelled.
+    """
+
+    def __init__(
+        self,
+        handler: BatchHandler,
+        max_batch_size: int,
+        max_wait_ms: float,
+        name: str = "batcher"
+    ):
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats: Dict[str, int] = {"submitted": 0, "batches": 0, "items": 0, "max_batch_size_seen": 0}
+
+    async def submit(self, item: Any, key: Hashable = None) -> Any:
+        """Queue one item and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((item, future))
+        self.stats["submitted"] += 1
+
+        if len(batch) >= self.max_batch_size:
+            self._dispatch(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._dispatch, key)
+
+        return await future
+
+    def _dispatch(self, key: Hashable):
+        timer: Optional[asyncio.TimerHandle] = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future]]):
+        # Callers that already timed out or were cancelled drop out of the batch
+        live = [(item, future) for item, future in batch if not future.done()]
+        if not live:
+            return
+
+        self.stats["batches"] += 1
+        self.stats["items"] += len(live)
+        self.stats["max_batch_size_seen"] = max(self.stats["max_batch_size_seen"], len(live))
+
+        try:
+            results = await self.handler(key, [item for item, _ in live])
+            if len(results) != len(live):
+                raise RuntimeError(f"handler returned {len(results)} results for {len(live)} items")
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(live)} failed: {e}")
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        else:
+            for (_, future), result in zip(live, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            # Batch task cancelled (e.g. at shutdown): never leave a caller waiting
+            for _, future in live:
+                if not future.done():
+                    future.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batching counters for monitoring."""
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "avg_batch_size": round(self.stats["items"] / batches, 2) if batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
@@ -0,0 +1,620 @@
+import asyncio
+import json
+import time
+from typing import List, Optional, Dict, Any
+
+import numpy as np
+from pymilvus import (
+    AsyncMilvusClient,
+    connections,
+    Collection,
+    FieldSchema,
+    CollectionSchema,
+    DataType,
+    utility,
+)
+from app.config import settings
+from app.logger import get_logger
+from app.services.circuit_breaker import CircuitOpenError, register_breaker
+from app.services.executors import get_executor
+from app.services.micro_batcher import MicroBatcher
+from app.services.vector_store import VectorStore, EMBEDDING_DIM, METADATA_FIELDS
+
+logger = get_logger(__name__)
+
+
+def _cosine_scores(query: List[float], vectors: List[List[float]]) -> List[float]:
+    """Cosine similarity of query against each vector (used for the small write-behind overlay)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    q = np.asarray(query, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(q)
+    norms[norms == 0] = 1.0
+    return ((matrix @ q) / norms).tolist()
+
+
+def build_filter_expr(filters: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Translate an equality filter dict into a Milvus boolean expression."""
+    if not filters:
+        return None
+    return " and ".join(f"{field} == {json.dumps(value)}" for field, value in filters.items())
+
+
+def _matches(metadata: Optional[Dict[str, Any]], filters: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate an equality filter dict against buffered metadata."""
+    if not filters:
+        return True
+    if not metadata:
+        return False
+    return all(metadata.get(field) == value for field, value in filters.items())
+
+
+def build_schema(dim: int) -> CollectionSchema:
+    """Ticket embeddings schema: vector plus scalar fields used for filtering."""
+    fields = [
+        FieldSchema(name="id", dtype=DataType.VARCHAR, is_primary=True, max_length=50),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dim),
+        FieldSchema(name="status", dtype=DataType.VARCHAR, max_length=20),
+        FieldSchema(name="systemSource", dtype=DataType.VARCHAR, max_length=20),
+        FieldSchema(name="category", dtype=DataType.VARCHAR, max_length=30),
+        FieldSchema(name="has_handle_detail", dtype=DataType.BOOL),
+        FieldSchema(name="createdAt", dtype=DataType.INT64),
+    ]
+    return CollectionSchema(fields=fields, description="Ticket embeddings for similarity search")
+
+
+INDEX_TYPES = ("IVF_FLAT", "IVF_SQ8", "IVF_PQ", "HNSW")
+# Indexes that keep compressed codes instead of the float vectors: int8 per
+# dimension (IVF_SQ8, 4x smaller) or one code per sub-vector (IVF_PQ,
+# dim * 4 / pq_m times smaller). Their scores are approximate, so hits are
+# re-ranked against the original vectors.
+QUANTIZED_INDEX_TYPES = ("IVF_SQ8", "IVF_PQ")
+
+
+def build_index_params(
+    index_type: Optional[str] = None,
+    nlist: Optional[int] = None,
+    m: Optional[int] = None,
+    ef_construction: Optional[int] = None,
+    pq_m: Optional[int] = None
+) -> Dict[str, Any]:
+    """Vector index build params; unset values come from settings."""
+    index_type = (index_type or settings.milvus_index_type).upper()
+    if index_type in ("IVF_FLAT", "IVF_SQ8"):
+        params = {"nlist": nlist or settings.milvus_index_nlist}
+    elif index_type == "IVF_PQ":
+        pq_m = pq_m or settings.milvus_pq_m
+        if EMBEDDING_DIM % pq_m:
+            raise ValueError(f"MILVUS_PQ_M={pq_m} must divide the embedding dim {EMBEDDING_DIM}")
+        params = {
+            "nlist": nlist or settings.milvus_index_nlist,
+            "m": pq_m,
+            "nbits": settings.milvus_pq_nbits,
+        }
+    elif index_type == "HNSW":
+        params = {
+            "M": m or settings.milvus_hnsw_m,
+            "efConstruction": ef_construction or settings.milvus_hnsw_ef_construction,
+        }
+    else:
+        raise ValueError(f"Unsupported Milvus index type: {index_type} (expected one of {INDEX_TYPES})")
+    return {"metric_type": "COSINE", "index_type": index_type, "params": params}
+
+
+def build_search_params(
+    index_type: str,
+    limit: int,
+    nprobe: Optional[int] = None,
+    ef: Optional[int] = None
+) -> Dict[str, Any]:
+    """Search params matching the index type; unset values come from settings."""
+    if index_type.upper() == "HNSW":
+        # Milvus rejects ef < limit
+        params = {"ef": max(ef or settings.milvus_search_ef, limit)}
+    else:
+        params = {"nprobe": nprobe or settings.milvus_search_nprobe}
+    return {"metric_type": "COSINE", "params": params}
+
+
+def rerank_hits(query: List[float], hits: List[Dict[str, Any]], vectors: Dict[str, List[float]]) -> List[Dict[str, Any]]:
+    """Re-score approximate hits by exact cosine against their original vectors.
+
+    Hits whose vector is missing keep their approximate score.
+    """
+    known = [hit for hit in hits if hit["id"] in vectors]
+    if not known:
+        return hits
+    scores = _cosine_scores(query, [vectors[hit["id"]] for hit in known])
+    exact = {hit["id"]: score for hit, score in zip(known, scores)}
+    reranked = [{"id": hit["id"], "score": exact.get(hit["id"], hit["score"])} for hit in hits]
+    reranked.sort(key=lambda r: r["score"], reverse=True)
+    return reranked
+
+
+def _empty_metadata() -> Dict[str, Any]:
+    return {"status": "", "systemSource": "", "category": "", "has_handle_detail": False, "createdAt": 0}
+
+
+class MilvusService(VectorStore):
+    """Service for Milvus vector database operations.
+
+    The data path (search / upsert / delete / query) uses pymilvus's native
+    asyncio client, opened once in ``start()``, so concurrent searches scale
+    with the event loop instead of the thread pool and cancelling a request
+    cancels its RPC. Only the one-off schema/index setup at startup uses the
+    synchronous ORM (in the "vector" executor).
+
+    Concurrent searches with the same filter are coalesced into one
+    multi-vector search call; writes go through a write-behind buffer that
+    is applied in batches by a background task. All RPCs pass a circuit
+    breaker: while Milvus is down, searches return no hits at once and
+    buffered writes stay in the buffer until it recovers.
+
+    With a quantized index (IVF_SQ8 / IVF_PQ) the loaded collection holds
+    compressed codes only; searches over-fetch ``milvus_rerank_factor``
+    times the candidates and re-rank them by exact cosine on the float
+    vectors, read back with one ``get`` per batch.
+    """
+
+    def __init__(self):
+        self.collection_name = settings.milvus_collection
+        self.embedding_dim = EMBEDDING_DIM
+        self._connected = False
+        self._collection = None
+        self._client: Optional[AsyncMilvusClient] = None
+        self._client_lock = asyncio.Lock()
+        # False for collections created before scalar fields existed
+        # (see scripts/migrate_milvus_schema.py); filters are then skipped.
+        self._has_metadata = True
+        # Index type of the existing collection, which decides the search params
+        self._index_type = settings.milvus_index_type.upper()
+        self._writer_task: Optional[asyncio.Task] = None
+        self.breaker = register_breaker(
+            "milvus", settings.milvus_breaker_failures, settings.milvus_breaker_recovery
+        )
+
+        # Concurrent search_similar calls sharing a filter expression go to
+        # Milvus as one search with several query vectors.
+        self.search_batcher = MicroBatcher(
+            self._search_batch,
+            max_batch_size=settings.milvus_search_batch_size,
+            max_wait_ms=settings.milvus_search_batch_wait_ms,
+            name="milvus-search"
+        )
+
+        # Write-behind buffer: ticket_id -> (embedding, metadata) / deleted ticket ids.
+        # "inflight" holds the batch currently being applied so searches
+        # still see it until Milvus has it. Only touched from the event loop.
+        self._apply_lock = asyncio.Lock()
+        self._pending_upserts: Dict[str, tuple] = {}
+        self._pending_deletes: set = set()
+        self._inflight_upserts: Dict[str, tuple] = {}
+        self._inflight_deletes: set = set()
+        self._unflushed = False
+        self._last_flush = time.monotonic()
+
+    # ==================== 生命周期 ====================
+
+    async def start(self):
+        """Create the collection, open the async client and start the write-behind flusher."""
+        await self._get_client()
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def close(self):
+        """Stop the flusher, flush buffered writes and close the client."""
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+
+        if self._client is not None:
+            await self.apply_pending(flush=True)
+            await self._client.close()
+            self._client = None
+
+    async def _writer_loop(self):
+        """Periodically apply buffered Milvus writes."""
+        while True:
+            await asyncio.sleep(settings.milvus_write_interval)
+            try:
+                await self.apply_pending()
+            except Exception as e:
+                logger.error(f"Milvus write-behind loop error: {e}")
+
+    async def _get_client(self) -> Optional[AsyncMilvusClient]:
+        """Return the async client, setting up collection and connection on first use."""
+        if self._client is not None:
+            return self._client
+
+        async with self._client_lock:
+            if self._client is not None:
+                return self._client
+
+            if not await get_executor("vector").run(self.create_collection):
+                return None
+
+            try:
+                client = AsyncMilvusClient(
+                    uri=f"http://{settings.milvus_host}:{settings.milvus_port}",
+                    timeout=settings.milvus_timeout
+                )
+                # Load once here instead of per request
+                await client.load_collection(self.collection_name, timeout=settings.milvus_timeout)
+                self._client = client
+                logger.info("Milvus async client ready")
+            except Exception as e:
+                logger.error(f"Failed to open Milvus async client: {e}")
+                return None
+
+        return self._client
+
+    async def _rpc(self, method: str, **kwargs) -> Any:
+        """Call an ``AsyncMilvusClient`` method on the collection through the circuit breaker."""
+        async with self.breaker.guard():
+            client = await self._get_client()
+            if not client:
+                raise RuntimeError("Milvus client unavailable")
+            return await getattr(client, method)(
+                self.collection_name, timeout=settings.milvus_timeout, **kwargs
+            )
+
+    # ==================== 连接与集合 ====================
+
+    def connect(self):
+        """Connect to Milvus server (synchronous ORM connection for administration)."""
+        if self._connected:
+            return True
+
+        try:
+            connections.connect(
+                alias="default",
+                host=settings.milvus_host,
+                port=settings.milvus_port,
+                timeout=settings.milvus_timeout
+            )
+            self._connected = True
+            logger.info(f"Connected to Milvus at {settings.milvus_host}:{settings.milvus_port}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to connect to Milvus: {e}")
+            return False
+
+    def create_collection(self):
+        """Create the ticket embeddings collection if not exists."""
+        if not self.connect():
+            return False
+
+        try:
+            # Check if collection exists
+            if utility.has_collection(self.collection_name):
+                self._collection = Collection(self.collection_name)
+                field_names = {f.name for f in self._collection.schema.fields}
+                self._has_metadata = set(METADATA_FIELDS) <= field_names
+                if not self._has_metadata:
+                    logger.warning(
+                        f"Collection '{self.collection_name}' has no scalar metadata fields; "
+                        "filters are applied after search. Run scripts/migrate_milvus_schema.py"
+                    )
+                for index in self._collection.indexes:
+                    if index.field_name == "embedding":
+                        self._index_type = index.params.get("index_type", self._index_type).upper()
+                if self._index_type != settings.milvus_index_type.upper():
+                    logger.warning(
+                        f"Collection '{self.collection_name}' uses a {self._index_type} index but "
+                        f"MILVUS_INDEX_TYPE={settings.milvus_index_type}; rebuild the index to switch"
+                    )
+                logger.info(f"Collection '{self.collection_name}' already exists")
+                return True
+
+            self._collection = self.create_new_collection(self.collection_name)
+            logger.info(f"Collection '{self.collection_name}' created successfully")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error creating collection: {e}")
+            return False
+
+    def create_new_collection(
+        self,
+        name: str,
+        index_params: Optional[Dict[str, Any]] = None
+    ) -> Collection:
+        """Create a collection with the current schema and its vector index."""
+        collection = Collection(name=name, schema=build_schema(self.embedding_dim))
+
+        # Create index for vector search
+        index_params = index_params or build_index_params()
+        collection.create_index(field_name="embedding", index_params=index_params)
+        return collection
+
+    # ==================== VectorStore ====================
+
+    @property
+    def supports_filters(self) -> bool:
+        return self._has_metadata
+
+    def _rows(
+        self,
+        ticket_ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Row-based upsert data matching the collection schema."""
+        rows = []
+        for ticket_id, embedding, metadata in zip(ticket_ids, embeddings, metadatas):
+            row = {"id": ticket_id, "embedding": embedding}
+            if self._has_metadata:
+                row.update({field: metadata[field] for field in METADATA_FIELDS})
+            rows.append(row)
+        return rows
+
+    async def insert_embedding(
+        self,
+        ticket_id: str,
+        embedding: List[float],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Queue a ticket embedding upsert in the write-behind buffer."""
+        self._pending_deletes.discard(ticket_id)
+        self._pending_upserts[ticket_id] = (embedding, metadata or _empty_metadata())
+
+        if self._buffered_count() >= settings.milvus_write_batch_size:
+            return await self.apply_pending()
+        return True
+
+    async def update_metadata(self, ticket_id: str, metadata: Dict[str, Any]) -> bool:
+        """Replace scalar metadata; Milvus upserts whole rows, so the vector is re-read."""
+        if not self._has_metadata:
+            return True
+
+        overlay_upserts, overlay_deletes = self._buffer_overlay()
+        if ticket_id in overlay_deletes:
+            return True
+
+        if ticket_id in overlay_upserts:
+            embedding = overlay_upserts[ticket_id][0]
+        else:
+            try:
+                rows = await self._rpc("get", ids=[ticket_id], output_fields=["embedding"])
+            except Exception as e:
+                logger.error(f"Error reading embedding for {ticket_id}: {e}")
+                return False
+            if not rows:
+                return True
+            embedding = [float(x) for x in rows[0]["embedding"]]
+
+        return await self.insert_embedding(ticket_id, embedding, metadata)
+
+    async def delete_embedding(self, ticket_id: str) -> bool:
+        """Queue a ticket embedding delete in the write-behind buffer."""
+        self._pending_upserts.pop(ticket_id, None)
+        self._pending_deletes.add(ticket_id)
+
+        if self._buffered_count() >= settings.milvus_write_batch_size:
+            return await self.apply_pending()
+        return True
+
+    async def upsert_embeddings(
+        self,
+        ticket_ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        flush: bool = False
+    ) -> bool:
+        """Bulk upsert ticket embeddings (used by batch jobs; bypasses the buffer)."""
+        if not ticket_ids:
+            return True
+        if metadatas is None:
+            metadatas = [_empty_metadata() for _ in ticket_ids]
+
+        try:
+            await self._rpc("upsert", data=self._rows(ticket_ids, embeddings, metadatas))
+            if flush:
+                await self._rpc("flush")
+            return True
+        except Exception as e:
+            logger.error(f"Error upserting {len(ticket_ids)} embeddings: {e}")
+            return False
+
+    async def existing_ids(self, ticket_ids: List[str]) -> set:
+        """Return the subset of ticket_ids that already have an embedding."""
+        if not ticket_ids:
+            return set()
+
+        rows = await self._rpc("query", filter=f"id in {json.dumps(ticket_ids)}", output_fields=["id"])
+        return {row["id"] for row in rows}
+
+    async def flush(self) -> bool:
+        """Apply buffered writes and seal pending segments."""
+        return await self.apply_pending(flush=True)
+
+    async def sync(self) -> bool:
+        """Apply buffered writes to Milvus (without sealing segments)."""
+        return await self.apply_pending()
+
+    async def count(self) -> int:
+        """Number of stored embeddings."""
+        try:
+            rows = await self._rpc("query", filter="", output_fields=["count(*)"])
+        except Exception as e:
+            logger.error(f"Error counting embeddings: {e}")
+            return 0
+        return rows[0]["count(*)"] if rows else 0
+
+    async def search_similar(
+        self,
+        embedding: List[float],
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search Milvus, merging in buffered writes that have not reached it yet.
+
+        Buffered upserts are scored by exact cosine over the small overlay and
+        ids the buffer shadows are hidden (read-your-writes), so a just-completed
+        ticket is searchable right away. Filters are evaluated by Milvus
+        (``filter`` expression) and in Python for the overlay.
+        """
+        overlay_upserts, overlay_deletes = self._buffer_overlay()
+        hidden = overlay_deletes | overlay_upserts.keys()
+
+        overlay = [
+            (ticket_id, vector)
+            for ticket_id, (vector, metadata) in overlay_upserts.items()
+            if _matches(metadata, filters)
+        ]
+        similar_ids = []
+        if overlay:
+            scores = _cosine_scores(embedding, [vector for _, vector in overlay])
+            similar_ids = [
+                {"id": ticket_id, "score": score}
+                for (ticket_id, _), score in zip(overlay, scores)
+            ]
+
+        filter_expr = build_filter_expr(filters) if self._has_metadata else None
+        # Over-fetch by the number of ids the buffer shadows
+        limit = min(top_k + len(hidden), 16384)
+
+        try:
+            hits = await self.search_batcher.submit((embedding, limit), key=filter_expr or "")
+        except CircuitOpenError:
+            # Milvus is down: answer from the buffer only instead of waiting for a timeout
+            hits = []
+        except Exception as e:
+            logger.error(f"Error searching embeddings: {e}")
+            hits = []
+
+        for hit in hits[:limit]:
+            if hit["id"] in hidden:
+                continue
+            similar_ids.append(hit)
+
+        similar_ids.sort(key=lambda r: r["score"], reverse=True)
+        return similar_ids[:top_k]
+
+    async def _search_batch(
+        self,
+        filter_expr: str,
+        queries: List[tuple]
+    ) -> List[List[Dict[str, Any]]]:
+        """Run several (embedding, limit) queries as one Milvus search.
+
+        The batch uses the largest limit; each caller trims to its own.
+        """
+        limit = max(limit for _, limit in queries)
+        rerank = self._index_type in QUANTIZED_INDEX_TYPES and settings.milvus_rerank_factor > 1
+        if rerank:
+            limit = min(limit * settings.milvus_rerank_factor, 16384)
+
+        results = await self._rpc(
+            "search",
+            data=[embedding for embedding, _ in queries],
+            anns_field="embedding",
+            filter=filter_expr,
+            limit=limit,
+            output_fields=["id"],
+            search_params=build_search_params(self._index_type, limit),
+            consistency_level="Session"
+        )
+        batch = [
+            [{"id": hit["id"], "score": hit["distance"]} for hit in hits]
+            for hits in results
+        ]
+        if not rerank:
+            return batch
+
+        candidate_ids = list({hit["id"] for hits in batch for hit in hits})
+        if not candidate_ids:
+            return batch
+        try:
+            rows = await self._rpc("get", ids=candidate_ids, output_fields=["embedding"])
+        except Exception as e:
+            # The approximate order is still usable
+            logger.warning(f"Milvus rerank skipped, failed to read vectors: {e}")
+            return batch
+        vectors = {row["id"]: row["embedding"] for row in rows}
+        return [
+            rerank_hits(embedding, hits, vectors)
+            for (embedding, _), hits in zip(queries, batch)
+        ]
+
+    # ==================== Write-behind buffer ====================
+
+    async def apply_pending(self, flush: bool = False) -> bool:
+        """Apply buffered upserts/deletes to Milvus as one batch.
+
+        Flushes only when ``flush`` is set or ``milvus_flush_interval`` has
+        elapsed since the last flush. On failure the batch is put back into
+        the buffer (unless newer writes for the same ids arrived meanwhile).
+        """
+        async with self._apply_lock:
+            self._inflight_upserts, self._pending_upserts = self._pending_upserts, {}
+            self._inflight_deletes, self._pending_deletes = self._pending_deletes, set()
+            upserts = self._inflight_upserts
+            deletes = self._inflight_deletes
+
+            if not upserts and not deletes and not (flush and self._unflushed):
+                return True
+
+            try:
+                if deletes:
+                    await self._rpc("delete", ids=list(deletes))
+                if upserts:
+                    ids = list(upserts.keys())
+                    await self._rpc(
+                        "upsert",
+                        data=self._rows(
+                            ids,
+                            [upserts[i][0] for i in ids],
+                            [upserts[i][1] for i in ids]
+                        )
+                    )
+                if upserts or deletes:
+                    self._unflushed = True
+                    logger.debug(f"Milvus 批量写入: upsert {len(upserts)}, delete {len(deletes)}")
+
+                if self._unflushed and (
+                    flush or time.monotonic() - self._last_flush >= settings.milvus_flush_interval
+                ):
+                    await self._rpc("flush")
+                    self._unflushed = False
+                    self._last_flush = time.monotonic()
+                return True
+
+            except Exception as e:
+                if isinstance(e, CircuitOpenError):
+                    logger.debug("Milvus circuit open, keeping writes buffered")
+                else:
+                    logger.error(f"Error applying buffered Milvus writes: {e}")
+                for ticket_id, row in upserts.items():
+                    if ticket_id not in self._pending_upserts and ticket_id not in self._pending_deletes:
+                        self._pending_upserts[ticket_id] = row
+                for ticket_id in deletes:
+                    if ticket_id not in self._pending_upserts:
+                        self._pending_deletes.add(ticket_id)
+                return False
+
+            finally:
+                self._inflight_upserts = {}
+                self._inflight_deletes = set()
+
+    def _buffer_overlay(self) -> tuple[Dict[str, tuple], set]:
+        """Snapshot of not-yet-applied writes: ({id: (vector, metadata)}, deleted ids)."""
+        upserts = dict(self._inflight_upserts)
+        for ticket_id in self._pending_deletes:
+            upserts.pop(ticket_id, None)
+        upserts.update(self._pending_upserts)
+        deletes = (self._inflight_deletes - self._pending_upserts.keys()) | self._pending_deletes
+        return upserts, deletes
+
+    def _buffered_count(self) -> int:
+        return len(self._pending_upserts) + len(self._pending_deletes)
+
+    def pending_count(self) -> int:
+        """Number of writes waiting in the buffer."""
+        return (
+            self._buffered_count()
+            + len(self._inflight_upserts) + len(self._inflight_deletes)
+        )
@@ -0,0 +1,382 @@
+"""In-process exact vector search over a memory-mapped NumPy matrix."""
+
+import asyncio
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+
+import numpy as np
+
+from app.config import settings
+from app.logger import get_logger
+from app.services.executors import get_executor
+from app.services.vector_store import VectorStore, EMBEDDING_DIM, METADATA_FIELDS
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+INITIAL_CAPACITY = 1024
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product is the cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact cosine top-k with NumPy, no external vector database needed.
+
+    Vectors are pre-normalized float32 rows of a contiguous matrix stored as a
+    memory-mapped ``.npy`` file. ``manifest.json`` maps rows to ticket ids
+    (``null`` marks a tombstone) and their scalar metadata, and names the
+    current matrix file; it is replaced atomically, so a crash never pairs a
+    matrix with the wrong ids. Deletes leave tombstones that are compacted
+    away periodically. Metadata is kept in per-field column arrays so
+    filters are a vectorized mask over the score vector.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.embedding_dim = EMBEDDING_DIM
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._matrix: np.ndarray = np.zeros((0, self.embedding_dim), dtype=np.float32)
+        self._alive: np.ndarray = np.zeros(0, dtype=bool)
+        self._ids: List[Optional[str]] = []
+        self._meta: List[Optional[Dict[str, Any]]] = []
+        self._columns: Dict[str, np.ndarray] = self._new_columns(0)
+        self._index: Dict[str, int] = {}
+        self._tombstones = 0
+        self._dirty = False
+        self._loaded = False
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._executor = get_executor("vector")
+
+    # ==================== 生命周期 ====================
+
+    async def start(self):
+        """Load the matrix from disk and start periodic persistence/compaction."""
+        await self._executor.run(self.load)
+        if self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def close(self):
+        """Stop maintenance and persist."""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+
+        await self._executor.run(self.persist)
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(settings.vector_store_persist_interval)
+            try:
+                await self._executor.run(self.maintain)
+            except Exception as e:
+                logger.error(f"Vector store maintenance error: {e}")
+
+    # ==================== 持久化 ====================
+
+    def _new_columns(self, capacity: int) -> Dict[str, np.ndarray]:
+        return {field: np.full(capacity, None, dtype=object) for field in METADATA_FIELDS}
+
+    def _set_metadata(self, row: int, metadata: Optional[Dict[str, Any]]):
+        self._meta[row] = metadata
+        for field in METADATA_FIELDS:
+            self._columns[field][row] = metadata.get(field) if metadata else None
+
+    def _matrix_path(self, generation: int) -> Path:
+        return self.path / f"embeddings.{generation}.npy"
+
+    def load(self):
+        """Open the persisted matrix (memory-mapped) or create an empty one."""
+        with self._lock:
+            if self._loaded:
+                return
+            self.path.mkdir(parents=True, exist_ok=True)
+            manifest_path = self.path / MANIFEST_FILE
+
+            if manifest_path.exists():
+                manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+                if manifest.get("dim") != self.embedding_dim:
+                    raise ValueError(
+                        f"Vector store dim {manifest.get('dim')} != expected {self.embedding_dim}"
+                    )
+                self._generation = manifest["generation"]
+                self._ids = manifest["ids"]
+                self._meta = manifest.get("meta") or [None] * len(self._ids)
+                self._matrix = np.load(self._matrix_path(self._generation), mmap_mode="r+")
+                self._alive = np.zeros(self._matrix.shape[0], dtype=bool)
+                self._columns = self._new_columns(self._matrix.shape[0])
+                self._index = {}
+                for row, ticket_id in enumerate(self._ids):
+                    if ticket_id is not None:
+                        self._index[ticket_id] = row
+                        self._alive[row] = True
+                        self._set_metadata(row, self._meta[row])
+                self._tombstones = len(self._ids) - len(self._index)
+                logger.info(f"Loaded {len(self._index)} vectors from {self.path}")
+            else:
+                self._generation = 1
+                self._matrix = self._new_matrix(self._generation, INITIAL_CAPACITY)
+                self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+                self._columns = self._new_columns(INITIAL_CAPACITY)
+                self._write_manifest()
+                logger.info(f"Created empty vector store at {self.path}")
+
+            self._loaded = True
+
+    def _new_matrix(self, generation: int, capacity: int) -> np.ndarray:
+        return np.lib.format.open_memmap(
+            self._matrix_path(generation),
+            mode="w+",
+            dtype=np.float32,
+            shape=(capacity, self.embedding_dim)
+        )
+
+    def _write_manifest(self):
+        manifest = {
+            "generation": self._generation,
+            "dim": self.embedding_dim,
+            "ids": self._ids,
+            "meta": self._meta,
+        }
+        tmp_path = self.path / f"{MANIFEST_FILE}.tmp"
+        tmp_path.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp_path, self.path / MANIFEST_FILE)
+
+    def persist(self):
+        """Flush matrix pages and commit the id mapping."""
+        with self._lock:
+            if not self._loaded or not self._dirty:
+                return
+            if isinstance(self._matrix, np.memmap):
+                self._matrix.flush()
+            self._write_manifest()
+            self._dirty = False
+
+    def _swap_matrix(self, rows: List[int], capacity: int):
+        """Copy ``rows`` into a new matrix generation and commit it."""
+        old_path = self._matrix_path(self._generation)
+        generation = self._generation + 1
+        matrix = self._new_matrix(generation, capacity)
+        if rows:
+            matrix[:len(rows)] = self._matrix[rows]
+        matrix.flush()
+
+        self._ids = [self._ids[row] for row in rows]
+        self._meta = [self._meta[row] for row in rows]
+        self._index = {ticket_id: row for row, ticket_id in enumerate(self._ids)}
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[:len(rows)] = True
+        self._columns = self._new_columns(capacity)
+        for row, metadata in enumerate(self._meta):
+            self._set_metadata(row, metadata)
+        self._matrix = matrix
+        self._generation = generation
+        self._tombstones = 0
+        self._write_manifest()
+        self._dirty = False
+
+        try:
+            old_path.unlink()
+        except OSError:
+            pass
+
+    def _grow(self):
+        capacity = max(INITIAL_CAPACITY, self._matrix.shape[0] * 2)
+        old_rows = len(self._ids)
+        old_path = self._matrix_path(self._generation)
+        generation = self._generation + 1
+        matrix = self._new_matrix(generation, capacity)
+        matrix[:old_rows] = self._matrix[:old_rows]
+        matrix.flush()
+
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:old_rows] = self._alive[:old_rows]
+        columns = self._new_columns(capacity)
+        for field, column in self._columns.items():
+            columns[field][:old_rows] = column[:old_rows]
+        self._columns = columns
+        self._matrix = matrix
+        self._alive = alive
+        self._generation = generation
+        self._write_manifest()
+
+        try:
+            old_path.unlink()
+        except OSError:
+            pass
+
+    def compact(self):
+        """Drop tombstoned rows by rewriting the matrix."""
+        with self._lock:
+            live_rows = [row for row, ticket_id in enumerate(self._ids) if ticket_id is not None]
+            capacity = max(INITIAL_CAPACITY, len(live_rows) * 2)
+            removed = self._tombstones
+            self._swap_matrix(live_rows, capacity)
+            logger.info(f"Vector store compacted: removed {removed} tombstones")
+
+    def maintain(self):
+        """Compact when tombstones exceed the configured ratio, then persist."""
+        with self._lock:
+            if self._tombstones and self._tombstones >= settings.vector_store_compact_ratio * len(self._ids):
+                self.compact()
+            self.persist()
+
+    # ==================== 同步实现 ====================
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _upsert_sync(
+        self,
+        ticket_ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Optional[Dict[str, Any]]]
+    ) -> bool:
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(-1, self.embedding_dim))
+        with self._lock:
+            self._ensure_loaded()
+            for ticket_id, vector, metadata in zip(ticket_ids, vectors, metadatas):
+                row = self._index.get(ticket_id)
+                if row is None:
+                    if len(self._ids) >= self._matrix.shape[0]:
+                        self._grow()
+                    row = len(self._ids)
+                    self._ids.append(ticket_id)
+                    self._meta.append(None)
+                    self._index[ticket_id] = row
+                    self._alive[row] = True
+                self._matrix[row] = vector
+                self._set_metadata(row, metadata)
+            self._dirty = True
+        return True
+
+    def _update_metadata_sync(self, ticket_id: str, metadata: Dict[str, Any]) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            row = self._index.get(ticket_id)
+            if row is not None:
+                self._set_metadata(row, metadata)
+                self._dirty = True
+        return True
+
+    def _delete_sync(self, ticket_id: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            row = self._index.pop(ticket_id, None)
+            if row is None:
+                return True
+            self._ids[row] = None
+            self._set_metadata(row, None)
+            self._alive[row] = False
+            self._tombstones += 1
+            self._dirty = True
+        return True
+
+    def _search_sync(
+        self,
+        embedding: List[float],
+        top_k: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        with self._lock:
+            self._ensure_loaded()
+            rows = len(self._ids)
+            live = len(self._index)
+            if rows == 0 or live == 0 or top_k <= 0:
+                return []
+
+            scores = self._matrix[:rows] @ query
+            mask = self._alive[:rows].copy()
+            for field, value in (filters or {}).items():
+                mask &= self._columns[field][:rows] == value
+            scores[~mask] = -np.inf
+
+            live = int(mask.sum())
+            if live == 0:
+                return []
+            k = min(top_k, live)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {"id": self._ids[row], "score": float(scores[row])}
+                for row in top
+                if np.isfinite(scores[row])
+            ]
+
+    def export_vectors(self) -> tuple[List[str], np.ndarray]:
+        """Copy of the live (normalized) vectors and their ticket ids, in row order."""
+        with self._lock:
+            self._ensure_loaded()
+            rows = np.flatnonzero(self._alive[:len(self._ids)])
+            return [self._ids[row] for row in rows], np.array(self._matrix[rows])
+
+    # ==================== VectorStore ====================
+
+    async def insert_embedding(
+        self,
+        ticket_id: str,
+        embedding: List[float],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Insert or replace a ticket embedding."""
+        return await self._executor.run(self._upsert_sync, [ticket_id], [embedding], [metadata])
+
+    async def upsert_embeddings(
+        self,
+        ticket_ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        flush: bool = False
+    ) -> bool:
+        """Bulk insert or replace ticket embeddings."""
+        if metadatas is None:
+            metadatas = [None] * len(ticket_ids)
+        ok = await self._executor.run(self._upsert_sync, ticket_ids, embeddings, metadatas)
+        if flush:
+            await self.flush()
+        return ok
+
+    async def update_metadata(self, ticket_id: str, metadata: Dict[str, Any]) -> bool:
+        """Replace the metadata of an existing embedding."""
+        return await self._executor.run(self._update_metadata_sync, ticket_id, metadata)
+
+    async def delete_embedding(self, ticket_id: str) -> bool:
+        """Tombstone a ticket embedding."""
+        return await self._executor.run(self._delete_sync, ticket_id)
+
+    async def search_similar(
+        self,
+        embedding: List[float],
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Exact cosine top-k."""
+        return await self._executor.run(self._search_sync, embedding, top_k, filters)
+
+    async def existing_ids(self, ticket_ids: List[str]) -> set:
+        """Return the subset of ticket_ids that have an embedding."""
+        with self._lock:
+            return {ticket_id for ticket_id in ticket_ids if ticket_id in self._index}
+
+    async def flush(self) -> bool:
+        """Persist the matrix and id mapping."""
+        await self._executor.run(self.persist)
+        return True
+
+    async def count(self) -> int:
+        """Number of stored embeddings."""
+        return len(self._index)
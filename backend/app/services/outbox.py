@@ -0,0 +1,245 @@
+"""MongoDB-backed outbox for side effects of ticket writes.
+
+Write paths enqueue jobs in the ``outbox`` collection in the same
+transaction as the ticket change when the deployment supports
+transactions (replica set / sharded cluster). On a standalone server the
+two writes run one after the other, so a crash in between can lose the
+side effect. A pool of background workers drains the jobs:
+
+- a job is claimed atomically with a lease, so a crashed worker's job is
+  picked up again once the lease expires;
+- failures are retried with exponential backoff and jitter, and after
+  ``outbox_max_attempts`` the job is dead-lettered (``status: "dead"``)
+  until it is requeued through ``/api/system/outbox/retry``;
+- job ids are deterministic, so enqueueing the same event twice is a no-op,
+  and handlers read the current ticket instead of a payload snapshot, so
+  running a job again is safe.
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+from app.config import settings
+from app.database import get_collection
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+DEAD = "dead"
+
+# A handler returns False (or raises) to have the job retried
+JobHandler = Callable[[Dict[str, Any]], Awaitable[bool]]
+
+
+def outbox_job(job_type: str, ticket_id: str, event_key: str) -> Dict[str, Any]:
+    """Build an outbox document; ``event_key`` identifies the triggering event."""
+    now = datetime.utcnow()
+    return {
+        "_id": f"{job_type}:{ticket_id}:{event_key}",
+        "type": job_type,
+        "ticketId": ticket_id,
+        "status": PENDING,
+        "attempts": 0,
+        "nextAttemptAt": now,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+
+
+class OutboxService:
+    """Enqueues outbox jobs and runs the workers that drain them."""
+
+    def __init__(self):
+        self.handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self.stats: Dict[str, int] = {
+            "processed": 0,
+            "retried": 0,
+            "dead_lettered": 0,
+        }
+
+    # ==================== 生命周期 ====================
+
+    async def start(self, handlers: Dict[str, JobHandler]):
+        """Register job handlers and start the workers (indexes: app/indexes.py)."""
+        self.handlers.update(handlers)
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker(i))
+                for i in range(max(1, settings.outbox_workers))
+            ]
+            logger.info(f"Outbox started with {len(self._workers)} workers")
+
+    async def close(self):
+        """Stop the workers; claimed jobs are picked up again after their lease expires."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ==================== 入队 ====================
+
+    async def enqueue(self, jobs: List[Dict[str, Any]], session=None):
+        """Insert jobs (inside the caller's transaction when ``session`` is given).
+
+        Jobs whose id already exists are left as they are. This is an upsert
+        rather than a tolerated duplicate-key error, because a write error
+        would abort the caller's transaction.
+        """
+        if not jobs:
+            return
+        collection = await get_collection("outbox")
+        await collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": job["_id"]},
+                    {"$setOnInsert": {k: v for k, v in job.items() if k != "_id"}},
+                    upsert=True
+                )
+                for job in jobs
+            ],
+            ordered=False,
+            session=session
+        )
+        if session is None:
+            self.notify()
+
+    def notify(self):
+        """Wake idle workers (call after the enqueueing transaction commits)."""
+        self._wakeup.set()
+
+    async def requeue_dead(self, job_id: Optional[str] = None) -> int:
+        """Move dead-lettered jobs (or one of them) back to pending."""
+        collection = await get_collection("outbox")
+        query: Dict[str, Any] = {"status": DEAD}
+        if job_id:
+            query["_id"] = job_id
+        result = await collection.update_many(
+            query,
+            {"$set": {
+                "status": PENDING,
+                "attempts": 0,
+                "nextAttemptAt": datetime.utcnow(),
+                "updatedAt": datetime.utcnow(),
+            }}
+        )
+        if result.modified_count:
+            self.notify()
+        return result.modified_count
+
+    # ==================== Workers ====================
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically lease the next due job (pending, or processing with an expired lease)."""
+        collection = await get_collection("outbox")
+        now = datetime.utcnow()
+        return await collection.find_one_and_update(
+            {"$or": [
+                {"status": PENDING, "nextAttemptAt": {"$lte": now}},
+                {"status": PROCESSING, "lockedUntil": {"$lte": now}},
+            ]},
+            {
+                "$set": {
+                    "status": PROCESSING,
+                    "lockedUntil": now + timedelta(seconds=settings.outbox_lease_seconds),
+                    "updatedAt": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("nextAttemptAt", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Outbox worker {index} failed to claim a job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.outbox_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep the worker alive; the job is claimed again once its lease expires
+                logger.error(f"Outbox worker {index} failed to record job {job['_id']}: {e}")
+
+    async def _run(self, job: Dict[str, Any]):
+        collection = await get_collection("outbox")
+        handler = self.handlers.get(job["type"])
+        error = None
+        try:
+            if handler is None:
+                error = f"no handler for job type {job['type']}"
+            elif not await handler(job):
+                error = "handler reported failure"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = repr(e)
+
+        now = datetime.utcnow()
+        if error is None:
+            self.stats["processed"] += 1
+            await collection.update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": DONE, "completedAt": now, "updatedAt": now},
+                 "$unset": {"lockedUntil": ""}}
+            )
+            return
+
+        if job["attempts"] >= settings.outbox_max_attempts:
+            self.stats["dead_lettered"] += 1
+            logger.error(f"Outbox 任务进入死信: {job['_id']} ({job['attempts']} 次失败): {error}")
+            update = {"status": DEAD, "lastError": error, "updatedAt": now}
+        else:
+            self.stats["retried"] += 1
+            delay = min(
+                settings.outbox_backoff_base * 2 ** (job["attempts"] - 1),
+                settings.outbox_backoff_max
+            )
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning(f"Outbox 任务失败，{delay:.1f}s 后重试: {job['_id']}: {error}")
+            update = {
+                "status": PENDING,
+                "lastError": error,
+                "nextAttemptAt": now + timedelta(seconds=delay),
+                "updatedAt": now,
+            }
+        await collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": update, "$unset": {"lockedUntil": ""}}
+        )
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Job counts by status plus worker counters."""
+        collection = await get_collection("outbox")
+        by_status = {PENDING: 0, PROCESSING: 0, DONE: 0, DEAD: 0}
+        async for doc in collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            by_status[doc["_id"]] = doc["count"]
+        return {
+            **by_status,
+            **self.stats,
+            "workers": len(self._workers),
+        }
+
+
+outbox_service = OutboxService()
@@ -0,0 +1,186 @@
+"""Recommendation prompt assembly under a token budget.
+
+Both recommendation prompts (ticket detail page and smart assistant) share
+one template, filled from pre-built section templates. Before filling it,
+each long field is truncated to ``prompt_field_token_limit`` and similar
+tickets are added in ranking order until ``prompt_token_budget`` is used
+up, so the least similar context is dropped first and the prompt size is
+bounded no matter how long historical tickets are.
+
+Token counts are estimates (GLM's tokenizer is not available offline): a
+CJK character counts as one token, ASCII letters/digits as a quarter each,
+which over-estimates slightly for typical ticket text. The LLM gateway
+records the provider's actual ``usage`` numbers for comparison.
+"""
+
+import re
+from typing import Any, Dict, List
+
+from app.config import settings
+
+CATEGORY_NAMES = {
+    "TICKET_PROCESS": "工单处理",
+    "SYSTEM_FAILURE": "系统故障"
+}
+SOURCE_NAMES = {
+    "TMS": "TMS运输管理系统",
+    "OMS": "OMS订单管理系统",
+    "WMS": "WMS仓储管理系统"
+}
+
+TICKET_SUBJECT = """## 当前工单信息
+- 工单编号: {id}
+- 来源系统: {source}
+- 工单类型: {category}
+- 问题描述: {description}"""
+
+QUESTION_SUBJECT = """## 用户问题
+{problem}"""
+
+CONTEXT_HEADER = "\n## 历史相似工单及处理方式\n\n"
+
+SIMILAR_TICKET = """### 相似工单 {index}
+- 工单编号: {id}
+- 相似度: {score:.1%}
+- 问题描述: {description}
+- 处理详情: {handle_detail}
+"""
+
+SOLUTION_TEMPLATE_LINE = "- 解决方案模板: {template}\n"
+
+RECOMMENDATION_TEMPLATE = """你是一个售后工单处理助手。你只能根据历史相似工单的处理详情，为当前工单推荐处理步骤。
+
+{subject}
+
+{context}
+
+## 严格要求
+1. 如果没有历史相似工单，必须回答"{no_similar}"
+2. 如果有历史相似工单，推荐的处理步骤必须来自上述相似工单的"处理详情",不能自己凭空编造,可以根据当前问题的具体情况，对历史处理步骤进行适当的顺序调整或合并，但不能添加新的内容
+3. 输出格式要清晰，便于阅读和执行
+4. 在输出内容的最后，必须列出你参考的工单编号（**只能使用下面列出的真实编号，如果可用真实工单编号没有，就显示 无相似工单**）：
+
+可用的真实工单编号：
+{available_ids}
+
+---
+**参考工单：**
+（只能填写上面列出的真实编号）
+- AS-XXXXXXX-XX
+- ...
+
+请直接输出处理步骤，不要输出开场白或其他无关内容。"""
+
+_CJK_RE = re.compile(r"[㐀-䶿一-鿿　-〿＀-￯]")
+_ASCII_WORD_RE = re.compile(r"[0-9A-Za-z]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count for mixed Chinese / ASCII text."""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    ascii_word = len(_ASCII_WORD_RE.findall(text))
+    other = len(text) - cjk - ascii_word
+    return int(cjk + ascii_word / 4 + other / 2 + 0.5)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to at most ~``max_tokens`` estimated tokens, marking the cut with "…"."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    budget = max(0.0, max_tokens - 1.0)  # room for the ellipsis
+    used = 0.0
+    for i, ch in enumerate(text):
+        if _CJK_RE.match(ch):
+            used += 1
+        elif _ASCII_WORD_RE.match(ch):
+            used += 0.25
+        else:
+            used += 0.5
+        if used > budget:
+            return text[:i].rstrip() + "…"
+    return text
+
+
+class RecommendationPrompt:
+    """An assembled prompt plus what went into it."""
+
+    def __init__(self, text: str, ticket_ids: List[str], dropped: int):
+        self.text = text
+        self.ticket_ids = ticket_ids
+        self.dropped = dropped
+        self.tokens = estimate_tokens(text)
+
+    def describe(self) -> str:
+        """One-line size summary for logs."""
+        return (
+            f"约 {self.tokens} tokens，相似工单 {len(self.ticket_ids)} 条"
+            + (f"（超出预算丢弃 {self.dropped} 条）" if self.dropped else "")
+        )
+
+
+def _similar_block(index: int, ticket: Dict[str, Any], field_limit: int) -> str:
+    block = SIMILAR_TICKET.format(
+        index=index,
+        id=ticket.get("id", "未知"),
+        score=ticket.get("score", 0),
+        description=truncate_to_tokens(ticket.get("description", "无"), field_limit),
+        handle_detail=truncate_to_tokens(ticket.get("handleDetail", "无"), field_limit),
+    )
+    if ticket.get("solutionTemplate"):
+        block += SOLUTION_TEMPLATE_LINE.format(
+            template=truncate_to_tokens(ticket["solutionTemplate"], field_limit)
+        )
+    return block + "\n"
+
+
+def _assemble(subject: str, similar_tickets: List[Dict[str, Any]], no_similar: str) -> RecommendationPrompt:
+    budget = settings.prompt_token_budget
+    field_limit = settings.prompt_field_token_limit
+
+    # Fixed part: template, subject and the id list (ids are short, reserve generously)
+    fixed = estimate_tokens(RECOMMENDATION_TEMPLATE) + estimate_tokens(subject) + estimate_tokens(CONTEXT_HEADER)
+    remaining = budget - fixed
+
+    blocks: List[str] = []
+    ticket_ids: List[str] = []
+    for ticket in similar_tickets:
+        ticket_id = ticket.get("id", "未知")
+        block = _similar_block(len(blocks) + 1, ticket, field_limit)
+        cost = estimate_tokens(block) + estimate_tokens(f"- {ticket_id}\n")
+        if cost > remaining:
+            # Similar tickets arrive best first: everything from here on ranks lower
+            break
+        blocks.append(block)
+        ticket_ids.append(ticket_id)
+        remaining -= cost
+
+    context = CONTEXT_HEADER + "".join(blocks) if blocks else ""
+    text = RECOMMENDATION_TEMPLATE.format(
+        subject=subject,
+        context=context,
+        no_similar=no_similar,
+        available_ids="\n".join(f"- {tid}" for tid in ticket_ids) if ticket_ids else "无",
+    )
+    return RecommendationPrompt(text, ticket_ids, len(similar_tickets) - len(blocks))
+
+
+def build_ticket_prompt(ticket: Dict[str, Any], similar_tickets: List[Dict[str, Any]]) -> RecommendationPrompt:
+    """Handling-recommendation prompt for an existing ticket."""
+    subject = TICKET_SUBJECT.format(
+        id=ticket.get("id", "未知"),
+        source=SOURCE_NAMES.get(ticket.get("systemSource"), ticket.get("systemSource")),
+        category=CATEGORY_NAMES.get(ticket.get("category"), ticket.get("category")),
+        description=truncate_to_tokens(ticket.get("description", "无"), settings.prompt_field_token_limit),
+    )
+    return _assemble(subject, similar_tickets, "暂无相似工单推荐")
+
+
+def build_question_prompt(problem: str, similar_tickets: List[Dict[str, Any]]) -> RecommendationPrompt:
+    """Recommendation prompt for a smart-assistant question."""
+    subject = QUESTION_SUBJECT.format(
+        problem=truncate_to_tokens(problem, settings.prompt_field_token_limit)
+    )
+    return _assemble(subject, similar_tickets, "暂无相似工单推荐，建议创建工单由人工处理")
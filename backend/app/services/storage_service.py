@@ -3,6 +3,7 @@
 from minio import Minio
 from minio.error import S3Error
 from app.config import settings
+from app.services.executors import get_executor
 from datetime import timedelta
 import uuid
 import io
@@ -24,6 +25,8 @@ class StorageService:
             secret_key=settings.minio_secret_key,
             secure=settings.minio_secure
         )
+        # MinIO calls block; they run in the dedicated "storage" pool
+        self._executor = get_executor("storage")
         self._ensure_bucket()
 
     def _ensure_bucket(self):
@@ -35,7 +38,7 @@ class StorageService:
         except S3Error as e:
             logger.warning(f"Could not ensure bucket exists: {e}")
 
-    def upload_image(self, file_data: bytes, filename: str, content_type: str) -> dict:
+    async def upload_image(self, file_data: bytes, filename: str, content_type: str) -> dict:
         """Upload image and return storage info.
 
         Args:
@@ -48,6 +51,7 @@ class StorageService:
 
         Raises:
             ValueError: If file type or size is invalid
+            DependencySaturated: If the storage pool is full
         """
         # Validate content type
         if content_type not in self.ALLOWED_TYPES:
@@ -62,7 +66,8 @@ class StorageService:
         stored_name = f"{uuid.uuid4()}.{ext}"
 
         # Upload to MinIO
-        self.client.put_object(
+        await self._executor.run(
+            self.client.put_object,
             settings.minio_bucket,
             stored_name,
             io.BytesIO(file_data),
@@ -95,7 +100,7 @@ class StorageService:
             expires=timedelta(seconds=settings.minio_url_expiry)
         )
 
-    def delete_image(self, stored_name: str) -> bool:
+    async def delete_image(self, stored_name: str) -> bool:
         """Delete image from storage.
 
         Args:
@@ -105,7 +110,7 @@ class StorageService:
             True if deletion succeeded, False otherwise
         """
         try:
-            self.client.remove_object(settings.minio_bucket, stored_name)
+            await self._executor.run(self.client.remove_object, settings.minio_bucket, stored_name)
             logger.info(f"Deleted image: {stored_name}")
             return True
         except S3Error as e:
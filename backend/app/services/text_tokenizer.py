@@ -0,0 +1,100 @@
+"""Tokenizer for mixed Chinese / alphanumeric ticket text.
+
+Chinese has no word boundaries, so runs of CJK characters are split into
+overlapping character bigrams ("订单无法支付" -> 订单, 单无, 无法, 法支, 支付);
+a lone CJK character is kept as a unigram. Runs of ASCII letters/digits are
+lower-cased and kept whole, so error codes and order numbers match exactly;
+codes joined by "-" / "_" (``AS-20260227-21``, ``ERR_TIMEOUT``) are also
+emitted as a whole in addition to their parts.
+
+``index_terms`` / ``query_terms`` are the MongoDB side: character n-grams
+stored per ticket (CJK up to bigrams, alphanumeric up to trigrams) so that
+a substring search becomes an indexed ``$all`` over the query's n-grams
+(see ``ticket_search``). ``SEARCH_TOKENS_VERSION`` is stored with them and
+bumped whenever these rules change, so the backfill script knows which
+tickets to re-tokenize.
+"""
+
+import re
+from typing import List
+
+# Stored as searchVersion with each ticket's searchTokens (see scripts/backfill_search_fields.py)
+SEARCH_TOKENS_VERSION = 3
+
+# CJK unified ideographs (incl. extension A) / alphanumeric codes with optional -_ joins
+_TOKEN_RE = re.compile(r"([㐀-䶿一-鿿]+)|([0-9a-z]+(?:[-_][0-9a-z]+)*)")
+_PART_RE = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into index terms (with repeats, in order)."""
+    if not text:
+        return []
+
+    tokens: List[str] = []
+    for cjk, word in _TOKEN_RE.findall(text.lower()):
+        if cjk:
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            tokens.append(word)
+            if "-" in word or "_" in word:
+                tokens.extend(_PART_RE.findall(word))
+    return tokens
+
+
+# n-gram lengths stored per run: CJK bigrams, alphanumeric trigrams (plus shorter grams)
+CJK_NGRAM = 2
+ALNUM_NGRAM = 3
+
+
+def _grams(run: str, n: int) -> List[str]:
+    """Substrings of length ``n`` of ``run`` (the run itself when shorter)."""
+    if len(run) <= n:
+        return [run]
+    return [run[i:i + n] for i in range(len(run) - n + 1)]
+
+
+def _runs(text: str):
+    """(run, n-gram length) for each CJK run and alphanumeric part of ``text``."""
+    for cjk, word in _TOKEN_RE.findall(text.lower()):
+        if cjk:
+            yield cjk, CJK_NGRAM
+        else:
+            for part in _PART_RE.findall(word):
+                yield part, ALNUM_NGRAM
+
+
+def index_terms(text: str) -> List[str]:
+    """Distinct terms to store for substring search over ``text``.
+
+    Every CJK run contributes its unigrams and bigrams, every alphanumeric
+    run (each part of a joined code) its unigrams, bigrams and trigrams, so
+    any substring of a run - the middle of an order number or error code,
+    a single letter - is covered by ``query_terms``.
+    """
+    if not text:
+        return []
+
+    terms = set()
+    for run, n in _runs(text):
+        for k in range(1, n + 1):
+            terms.update(_grams(run, k))
+    return sorted(terms)
+
+
+def query_terms(query: str) -> List[str]:
+    """Terms to require (``$all`` over ``index_terms``) when searching for ``query``.
+
+    Each run is split into n-grams of the stored length (shorter runs are
+    stored whole), so a run matches anywhere inside a stored one. The
+    n-grams do not pin their order or adjacency: callers re-check the exact
+    substring on the index-narrowed candidates.
+    """
+    terms: List[str] = []
+    for run, n in _runs(query):
+        terms.extend(_grams(run, n))
+    # Longest first: the first $all term sets the index bounds and long terms are rarer
+    return sorted(set(terms), key=lambda t: (-len(t), t))
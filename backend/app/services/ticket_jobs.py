@@ -0,0 +1,72 @@
+"""Outbox jobs triggered by ticket updates.
+
+Handlers load the ticket as it is now rather than trusting a snapshot, so
+a retried or duplicated job converges on the current state.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List
+
+from app.database import get_collection
+from app.logger import get_logger
+from app.services.ai_service import ai_service
+from app.services.feishu_service import send_ticket_completed_message
+from app.services.outbox import outbox_job
+from app.services.vector_store import ticket_vector_metadata
+
+logger = get_logger(__name__)
+
+STORE_EMBEDDING = "store_embedding"
+NOTIFY_COMPLETED = "notify_completed"
+
+
+def completion_jobs(ticket_id: str, closed_at: datetime) -> List[Dict[str, Any]]:
+    """Jobs for a ticket marked COMPLETED; keyed by ``closedAt`` so each completion runs once."""
+    event_key = str(int(closed_at.timestamp() * 1000))
+    return [
+        outbox_job(STORE_EMBEDDING, ticket_id, event_key),
+        outbox_job(NOTIFY_COMPLETED, ticket_id, event_key),
+    ]
+
+
+async def _completed_ticket(ticket_id: str):
+    collection = await get_collection("tickets")
+    ticket = await collection.find_one({"id": ticket_id})
+    if not ticket or ticket.get("status") != "COMPLETED":
+        # Deleted or reopened since the job was enqueued
+        logger.info(f"Outbox: 工单 {ticket_id} 已不是完成状态，跳过")
+        return None
+    return ticket
+
+
+async def store_embedding(job: Dict[str, Any]) -> bool:
+    """Embed the completed ticket and write it durably to the vector store."""
+    ticket = await _completed_ticket(job["ticketId"])
+    if not ticket or not ticket.get("description"):
+        return True
+
+    stored = await ai_service.store_ticket_embedding(
+        ticket_id=ticket["id"],
+        description=ticket["description"],
+        metadata=ticket_vector_metadata(ticket)
+    )
+    return stored and await ai_service.vector_store.sync()
+
+
+async def notify_completed(job: Dict[str, Any]) -> bool:
+    """Send the Feishu completion notification."""
+    ticket = await _completed_ticket(job["ticketId"])
+    if not ticket:
+        return True
+
+    return await send_ticket_completed_message(
+        ticket_id=ticket["id"],
+        description=ticket.get("description"),
+        handle_detail=ticket.get("handleDetail")
+    )
+
+
+TICKET_JOB_HANDLERS = {
+    STORE_EMBEDDING: store_embedding,
+    NOTIFY_COMPLETED: notify_completed,
+}
@@ -0,0 +1,127 @@
+"""Index-backed filters and ordering for the ticket list.
+
+Each ticket stores ``searchTokens`` (``text_tokenizer.index_terms`` of its
+description, multikey-indexed), and ``createdByTokens`` / ``createdByLower``
+for its creator. A description or creator search becomes an indexed
+``$all`` over the query's n-grams, with the exact case-insensitive
+substring re-checked only on those candidates, so neither needs a
+collection scan.
+
+The list is ordered by ``TICKET_LIST_SORT`` (newest first, ticket id as
+tie-breaker), which every list index ends with. Besides page/pageSize
+(skip), the list supports keyset pagination: ``encode_cursor`` turns the
+last ticket of a page into an opaque ``nextCursor``, and
+``cursor_filter`` turns it back into a range predicate that seeks
+straight to the next page in the index, so the cost does not grow with
+depth and tickets created meanwhile do not shift later pages.
+"""
+
+import base64
+import binascii
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import DESCENDING
+
+from app.services.text_tokenizer import SEARCH_TOKENS_VERSION, index_terms, query_terms
+
+TICKET_LIST_SORT = [("createdAt", DESCENDING), ("id", DESCENDING)]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def creator_search_fields(created_by: Optional[str]) -> Dict[str, Any]:
+    """Derived creator fields (also set when ``createdBy`` is updated)."""
+    created_by_lower = (created_by or "").strip().lower()
+    return {
+        "createdByLower": created_by_lower,
+        "createdByTokens": index_terms(created_by_lower),
+    }
+
+
+def ticket_search_fields(description: Optional[str], created_by: Optional[str]) -> Dict[str, Any]:
+    """Derived fields to store with a ticket (see scripts/backfill_search_fields.py)."""
+    return {
+        "searchTokens": index_terms(description or ""),
+        "searchVersion": SEARCH_TOKENS_VERSION,
+        **creator_search_fields(created_by),
+    }
+
+
+def search_filter(search: Optional[str], created_by: Optional[str]) -> Dict[str, Any]:
+    """MongoDB filter for the list endpoint's ``search`` / ``createdBy`` parameters."""
+    query: Dict[str, Any] = {}
+    if search:
+        terms = query_terms(search)
+        if terms:
+            query["searchTokens"] = {"$all": terms}
+        query["description"] = {"$regex": re.escape(search), "$options": "i"}
+    if created_by and created_by.strip():
+        created_by = created_by.strip().lower()
+        terms = query_terms(created_by)
+        if terms:
+            query["createdByTokens"] = {"$all": terms}
+        query["createdByLower"] = {"$regex": re.escape(created_by)}
+    return query
+
+
+def ticket_list_pipeline(
+    filter_query: Dict[str, Any],
+    skip: int,
+    page_size: int,
+    cap: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """One list page and its total from a single aggregation (``$facet``).
+
+    With ``cap`` the matches are cut off at ``cap + 1`` before counting.
+    """
+    pipeline: List[Dict[str, Any]] = [{"$match": filter_query}, {"$sort": dict(TICKET_LIST_SORT)}]
+    if cap is not None:
+        pipeline.append({"$limit": cap + 1})
+    pipeline.append({"$facet": {
+        "items": [{"$skip": skip}, {"$limit": page_size}],
+        "total": [{"$count": "count"}],
+    }})
+    return pipeline
+
+
+def _utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(created_at: Optional[datetime], ticket_id: Optional[str]) -> Optional[str]:
+    """Opaque cursor pointing after the ticket with this (createdAt, id)."""
+    if created_at is None or not ticket_id:
+        return None
+    # MongoDB stores dates with millisecond precision
+    millis = (_utc_naive(created_at) - _EPOCH) // timedelta(milliseconds=1)
+    payload = json.dumps([millis, ticket_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def cursor_filter(cursor: str) -> Dict[str, Any]:
+    """Range predicate for the tickets after ``cursor`` in ``TICKET_LIST_SORT`` order.
+
+    Raises ``ValueError`` for a malformed cursor.
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        millis, ticket_id = json.loads(payload)
+        created_at = _EPOCH + timedelta(milliseconds=int(millis))
+    except (binascii.Error, ValueError, TypeError, OverflowError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(ticket_id, str):
+        raise ValueError("Invalid cursor")
+
+    # The createdAt bound sets the index range; the $or is checked on index keys
+    return {
+        "createdAt": {"$lte": created_at},
+        "$or": [
+            {"createdAt": {"$lt": created_at}},
+            {"id": {"$lt": ticket_id}},
+        ],
+    }
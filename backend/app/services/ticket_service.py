@@ -1,12 +1,25 @@
+import asyncio
 from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from bson import ObjectId
 from app.models.ticket import (
-    Ticket, TicketCreate, TicketUpdate, TicketStatus,
+    Ticket, TicketCreate, TicketCreateResponse, TicketUpdate, TicketStatus,
     TicketSystemSource, TicketCategory, TicketPriority
 )
-from app.database import get_collection
+from app.config import settings
+from app.database import get_collection, run_in_transaction
+from app.services.duplicate_detector import duplicate_detector
+from app.services.outbox import outbox_service
 from app.services.storage_service import storage_service
+from app.services.text_tokenizer import SEARCH_TOKENS_VERSION, index_terms
+from app.services.ticket_jobs import completion_jobs
+from app.services.ticket_search import (
+    TICKET_LIST_SORT, creator_search_fields, cursor_filter, search_filter, ticket_list_pipeline,
+    ticket_search_fields
+)
+from app.services.ticket_stats import (
+    STATS_PROJECTION, stats_pipeline, ticket_stats_service, trend_days, trend_series
+)
 
 
 class TicketService:
@@ -31,8 +44,8 @@ class TicketService:
         seq = result.get("seq", 1)
         return f"{prefix}-{seq:02d}"
 
-    async def create_ticket(self, ticket_data: TicketCreate, created_by: Optional[str] = None) -> Ticket:
-        """Create a new ticket."""
+    async def create_ticket(self, ticket_data: TicketCreate, created_by: Optional[str] = None) -> TicketCreateResponse:
+        """Create a new ticket, flagging likely duplicates among recent open tickets."""
         collection = await get_collection("tickets")
 
         # Generate custom ticket ID
@@ -45,14 +58,25 @@ class TicketService:
         ticket_dict["status"] = TicketStatus.OPEN
         ticket_dict["createdBy"] = created_by
         ticket_dict["aiMetadata"] = {"keywords": [], "similarTickets": [], "suggestedSolution": None}
+        ticket_dict.update(ticket_search_fields(ticket_dict.get("description"), created_by))
 
         # Ensure images is a list
         if "images" not in ticket_dict:
             ticket_dict["images"] = []
 
-        result = await collection.insert_one(ticket_dict)
+        async def _write(session):
+            await collection.insert_one(ticket_dict, session=session)
+            await ticket_stats_service.record_created(ticket_dict, session=session)
 
-        return Ticket(**ticket_dict)
+        await run_in_transaction(_write)
+
+        duplicates = duplicate_detector.check_and_add(
+            ticket_id,
+            ticket_dict["description"],
+            ticket_dict["createdAt"],
+            scope=ticket_dict["systemSource"].value
+        )
+        return TicketCreateResponse(**ticket_dict, possibleDuplicates=duplicates)
 
     async def get_ticket_by_id(self, ticket_id: str) -> Optional[Ticket]:
         """Get a ticket by ID."""
@@ -104,9 +128,27 @@ class TicketService:
         priority: Optional[TicketPriority] = None,
         search: Optional[str] = None,
         created_by: Optional[str] = None,
-        ticket_id: Optional[str] = None
-    ) -> tuple[List[Ticket], int]:
-        """Get tickets with filtering and pagination."""
+        ticket_id: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> tuple[List[Ticket], int, bool]:
+        """Get tickets with filtering and pagination.
+
+        Returns ``(tickets, total, capped)``; ``capped`` means ``total`` is a
+        lower bound (``ticket_list_total_mode=approximate``, shown as "1000+").
+
+        Filtered offset pages are one aggregation whose ``$facet`` returns the
+        page and the count together; in approximate mode the matches are cut
+        off at the count cap before the ``$facet``. The unfiltered list never
+        counts: its page is an index-ordered skip/limit and its total the
+        collection's document count from metadata.
+
+        With ``cursor`` (a ``nextCursor`` from the previous page) the page
+        starts right after that ticket and ``page`` is ignored: the page is
+        an index seek and the total a separate count, run concurrently.
+        Raises ``ValueError`` for a malformed cursor.
+        """
+        # Reject a malformed cursor before touching the database
+        after = cursor_filter(cursor) if cursor else None
         collection = await get_collection("tickets")
 
         # Build query filter
@@ -120,27 +162,59 @@ class TicketService:
             filter_query["status"] = status
         if priority:
             filter_query["priority"] = priority
-        if search:
-            filter_query["description"] = {"$regex": search, "$options": "i"}
-        if created_by:
-            filter_query["createdBy"] = {"$regex": created_by, "$options": "i"}
+        filter_query.update(search_filter(search, created_by))
         if ticket_id:
             filter_query["id"] = ticket_id
 
-        # Get total count
-        total = await collection.count_documents(filter_query)
-
-        # Get paginated results
+        approximate = settings.ticket_list_total_mode == "approximate"
         skip = (page - 1) * page_size
-        cursor = collection.find(filter_query).sort("createdAt", -1).skip(skip).limit(page_size)
+
+        if cursor or not filter_query:
+            if cursor:
+                page_query = collection.find({**filter_query, **after})
+            else:
+                page_query = collection.find(filter_query).skip(skip)
+            docs, (total, capped) = await asyncio.gather(
+                page_query.sort(TICKET_LIST_SORT).limit(page_size).to_list(page_size),
+                self._count_tickets(collection, filter_query, approximate, page_size)
+            )
+        else:
+            cap = None
+            if approximate:
+                # Never cut off the requested page itself
+                cap = max(settings.ticket_list_count_cap, skip + page_size)
+            pipeline = ticket_list_pipeline(filter_query, skip, page_size, cap)
+            result = (await collection.aggregate(pipeline).to_list(1))[0]
+            docs = result["items"]
+            total = result["total"][0]["count"] if result["total"] else 0
+            capped = cap is not None and total > cap
+            if capped:
+                total = cap
 
         tickets = []
-        async for doc in cursor:
+        for doc in docs:
             if "id" not in doc:
                 doc["id"] = str(doc["_id"])
             tickets.append(Ticket(**doc))
 
-        return tickets, total
+        return tickets, total, capped
+
+    async def _count_tickets(
+        self,
+        collection,
+        filter_query: Dict[str, Any],
+        approximate: bool,
+        page_size: int
+    ) -> tuple[int, bool]:
+        """Total for a cursor page or the unfiltered list: exact, capped or from metadata."""
+        if not filter_query:
+            # Collection metadata: no scan, exact unless after an unclean shutdown
+            return await collection.estimated_document_count(), False
+        if not approximate:
+            return await collection.count_documents(filter_query), False
+        cap = max(settings.ticket_list_count_cap, page_size)
+        count = await collection.count_documents(filter_query, limit=cap + 1)
+        return min(count, cap), count > cap
 
     async def get_tickets_with_image_urls(
         self,
@@ -154,7 +228,7 @@ class TicketService:
         created_by: Optional[str] = None
     ) -> tuple[List[Dict[str, Any]], int]:
         """Get tickets with presigned URLs for images."""
-        tickets, total = await self.get_tickets(
+        tickets, total, _ = await self.get_tickets(
             page=page,
             page_size=page_size,
             system_source=system_source,
@@ -180,7 +254,12 @@ class TicketService:
         return tickets_with_urls, total
 
     async def update_ticket(self, ticket_id: str, ticket_data: TicketUpdate) -> Optional[Ticket]:
-        """Update a ticket."""
+        """Update a ticket.
+
+        Marking a ticket COMPLETED enqueues its side effects (embedding,
+        Feishu notification) in the outbox, in the same transaction as the
+        update when MongoDB supports it; background workers run them.
+        """
         collection = await get_collection("tickets")
 
         # Build update dict with only non-None fields
@@ -189,152 +268,106 @@ class TicketService:
             return await self.get_ticket_by_id(ticket_id)
 
         update_dict["updatedAt"] = datetime.utcnow()
+        if "description" in update_dict:
+            update_dict["searchTokens"] = index_terms(update_dict["description"])
+            update_dict["searchVersion"] = SEARCH_TOKENS_VERSION
+        if "createdBy" in update_dict:
+            update_dict.update(creator_search_fields(update_dict["createdBy"]))
 
         # If status is being changed to COMPLETED, set closedAt
+        jobs = []
         if ticket_data.status == TicketStatus.COMPLETED:
             update_dict["closedAt"] = datetime.utcnow()
+            jobs = completion_jobs(ticket_id, update_dict["closedAt"])
+
+        async def _write(session):
+            # Try to update by custom id first, then by ObjectId; the previous
+            # status / category / priority move the dashboard counters
+            before = await collection.find_one_and_update(
+                {"id": ticket_id}, {"$set": update_dict}, projection=STATS_PROJECTION, session=session
+            )
+            if before is None:
+                try:
+                    obj_id = ObjectId(ticket_id)
+                except Exception:
+                    return
+                before = await collection.find_one_and_update(
+                    {"_id": obj_id}, {"$set": update_dict}, projection=STATS_PROJECTION, session=session
+                )
+            if before is None:
+                return
+            await ticket_stats_service.record_updated(before, update_dict, session=session)
+            if jobs:
+                await outbox_service.enqueue(jobs, session=session)
+
+        await run_in_transaction(_write)
+        if jobs:
+            outbox_service.notify()
 
-        # Try to update by custom id first, then by ObjectId
-        result = await collection.update_one({"id": ticket_id}, {"$set": update_dict})
-        if result.matched_count == 0:
-            try:
-                obj_id = ObjectId(ticket_id)
-                await collection.update_one({"_id": obj_id}, {"$set": update_dict})
-            except:
-                pass
-
-        return await self.get_ticket_by_id(ticket_id)
+        ticket = await self.get_ticket_by_id(ticket_id)
+        if ticket and ("description" in update_dict or "status" in update_dict):
+            duplicate_detector.sync(ticket.model_dump())
+        return ticket
 
     async def delete_ticket(self, ticket_id: str) -> bool:
-        """Delete a ticket."""
+        """Delete a ticket (and uncount it from the dashboard counters)."""
         collection = await get_collection("tickets")
 
-        # Try to delete by custom id first, then by ObjectId
-        result = await collection.delete_one({"id": ticket_id})
-        if result.deleted_count > 0:
-            return True
-
-        try:
-            obj_id = ObjectId(ticket_id)
-            result = await collection.delete_one({"_id": obj_id})
-            return result.deleted_count > 0
-        except:
-            return False
-
-    async def get_ticket_statistics(self) -> Dict[str, Any]:
-        """Get ticket statistics for dashboard."""
-        collection = await get_collection("tickets")
-
-        pipeline = [
-            {
-                "$group": {
-                    "_id": None,
-                    "total": {"$sum": 1},
-                    "open": {"$sum": {"$cond": [{"$eq": ["$status", "OPEN"]}, 1, 0]}},
-                    "processing": {"$sum": {"$cond": [{"$eq": ["$status", "PROCESSING"]}, 1, 0]}},
-                    "completed": {"$sum": {"$cond": [{"$eq": ["$status", "COMPLETED"]}, 1, 0]}},
-                }
-            }
-        ]
-
-        async for doc in collection.aggregate(pipeline):
-            return {
-                "total": doc.get("total", 0),
-                "open": doc.get("open", 0),
-                "processing": doc.get("processing", 0),
-                "completed": doc.get("completed", 0),
-            }
-
-        return {"total": 0, "open": 0, "processing": 0, "completed": 0}
-
-    async def get_tickets_by_category(self) -> Dict[str, int]:
-        """Get ticket count by category."""
-        collection = await get_collection("tickets")
-
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$category",
-                    "count": {"$sum": 1}
-                }
-            }
-        ]
-
-        result = {}
-        async for doc in collection.aggregate(pipeline):
-            result[doc["_id"]] = doc["count"]
-        return result
-
-    async def get_tickets_by_status(self) -> Dict[str, int]:
-        """Get ticket count by status."""
-        collection = await get_collection("tickets")
-
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1}
-                }
-            }
-        ]
-
-        result = {}
-        async for doc in collection.aggregate(pipeline):
-            result[doc["_id"]] = doc["count"]
-        return result
-
-    async def get_tickets_by_priority(self) -> Dict[str, int]:
-        """Get ticket count by priority."""
-        collection = await get_collection("tickets")
-
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$priority",
-                    "count": {"$sum": 1}
-                }
-            }
-        ]
-
-        result = {}
-        async for doc in collection.aggregate(pipeline):
-            result[doc["_id"]] = doc["count"]
-        return result
+        async def _write(session):
+            # Try to delete by custom id first, then by ObjectId
+            deleted = await collection.find_one_and_delete(
+                {"id": ticket_id}, projection=STATS_PROJECTION, session=session
+            )
+            if deleted is None:
+                try:
+                    obj_id = ObjectId(ticket_id)
+                except Exception:
+                    return None
+                deleted = await collection.find_one_and_delete(
+                    {"_id": obj_id}, projection=STATS_PROJECTION, session=session
+                )
+            if deleted is not None:
+                await ticket_stats_service.record_deleted(deleted, session=session)
+            return deleted
+
+        deleted = await run_in_transaction(_write)
+        if deleted is not None:
+            duplicate_detector.remove(ticket_id)
+        return deleted is not None
+
+    async def get_dashboard_statistics(self) -> Dict[str, Any]:
+        """Overview, per-field counts and the 30-day trend for the dashboard.
+
+        Read from the materialized ``ticket_stats`` counters when enabled and
+        built. Otherwise one aggregation: a single ``$facet`` pass over the
+        collection computes every section; days without tickets are filled in
+        here.
+        """
+        materialized = await ticket_stats_service.get_dashboard()
+        if materialized is not None:
+            return materialized
 
-    async def get_tickets_trend_7days(self) -> List[Dict[str, Any]]:
-        """Get ticket creation trend for the last 30 days."""
         collection = await get_collection("tickets")
-
-        # Get current time in UTC
         now = datetime.now(timezone.utc)
-
-        # Generate 30 days of data
-        trend_data = []
-        for i in range(29, -1, -1):
-            day_start = (now - timedelta(days=i)).replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = (day_start + timedelta(days=1))
-
-            # Count tickets created on this day
-            count = await collection.count_documents({
-                "createdAt": {"$gte": day_start, "$lt": day_end}
-            })
-
-            # Format date label - show month/day for older dates
-            if i == 0:
-                date_label = "今天"
-            elif i == 1:
-                date_label = "昨天"
-            else:
-                # Format as MM-DD for older dates
-                date_label = day_start.strftime("%m-%d")
-
-            trend_data.append({
-                "date": date_label,
-                "value": count,
-                "datetime": day_start
-            })
-
-        return trend_data
-
+        days = trend_days(now)
+
+        result = (await collection.aggregate(stats_pipeline(days[0])).to_list(1))[0]
+        overview = result["overview"][0] if result["overview"] else {}
+
+        def counts(section: str) -> Dict[str, int]:
+            return {doc["_id"]: doc["count"] for doc in result[section]}
+
+        return {
+            "overview": {
+                "total": overview.get("total", 0),
+                "open": overview.get("open", 0),
+                "processing": overview.get("processing", 0),
+                "completed": overview.get("completed", 0),
+            },
+            "byCategory": counts("byCategory"),
+            "byStatus": counts("byStatus"),
+            "byPriority": counts("byPriority"),
+            "trend": trend_series(days, {doc["_id"].date(): doc["count"] for doc in result["trend"]}),
+        }
 
 ticket_service = TicketService()
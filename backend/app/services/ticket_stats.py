@@ -0,0 +1,360 @@
+"""Dashboard statistics for the tickets collection.
+
+``stats_pipeline`` computes the overview, the per-category / status /
+priority counts and the daily creation trend in one ``$facet`` pass, so
+the dashboard costs one round trip; ``trend_series`` fills in the days
+without tickets.
+
+With ``ticket_stats_materialized`` the same numbers are kept as counters
+in the ``ticket_stats`` collection: a ``totals`` document (total and
+per-status / category / priority counts) and one ``day:YYYY-MM-DD``
+document per creation day. ``TicketService`` applies ``$inc`` deltas in
+the same transaction as each create, status / category / priority change
+and delete, so the dashboard is a single ``_id`` lookup. A periodic
+reconciler recounts the tickets, logs any drift and corrects it with
+``$inc`` as well, so it never overwrites concurrent increments.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database import get_collection
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+TREND_DAYS = 30
+
+# Ticket fields with a counter per value in the totals document
+COUNTED_FIELDS = {"status": "byStatus", "category": "byCategory", "priority": "byPriority"}
+# Projection of the fields the counters depend on
+STATS_PROJECTION = {"status": 1, "category": 1, "priority": 1, "createdAt": 1}
+
+TOTALS_ID = "totals"
+# Retry delay when the first reconcile could not build every counter
+INITIAL_RETRY_SECONDS = 10
+
+
+def _count_by(field: str) -> List[Dict[str, Any]]:
+    return [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]
+
+
+def stats_pipeline(trend_start: Optional[datetime]) -> List[Dict[str, Any]]:
+    """Dashboard statistics as one ``$facet`` pass over the tickets collection.
+
+    The trend covers the days from ``trend_start``, or every day when None.
+    """
+    trend_match = [{"$match": {"createdAt": {"$gte": trend_start}}}] if trend_start else []
+    return [{"$facet": {
+        "overview": [{"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "open": {"$sum": {"$cond": [{"$eq": ["$status", "OPEN"]}, 1, 0]}},
+            "processing": {"$sum": {"$cond": [{"$eq": ["$status", "PROCESSING"]}, 1, 0]}},
+            "completed": {"$sum": {"$cond": [{"$eq": ["$status", "COMPLETED"]}, 1, 0]}},
+        }}],
+        "byCategory": _count_by("category"),
+        "byStatus": _count_by("status"),
+        "byPriority": _count_by("priority"),
+        "trend": trend_match + [
+            {"$group": {
+                "_id": {"$dateTrunc": {"date": "$createdAt", "unit": "day", "timezone": "UTC"}},
+                "count": {"$sum": 1},
+            }},
+        ],
+    }}]
+
+
+def trend_days(now: datetime) -> List[datetime]:
+    """UTC midnights of the last ``TREND_DAYS`` days, oldest first."""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [today - timedelta(days=i) for i in range(TREND_DAYS - 1, -1, -1)]
+
+
+def trend_series(days: List[datetime], counts: Dict[Any, int]) -> List[Dict[str, Any]]:
+    """Dashboard trend points for ``days``; ``counts`` maps a date to its ticket count."""
+    trend_data = []
+    for i, day_start in enumerate(days):
+        days_ago = len(days) - 1 - i
+        # Format date label - show month/day for older dates
+        if days_ago == 0:
+            date_label = "今天"
+        elif days_ago == 1:
+            date_label = "昨天"
+        else:
+            date_label = day_start.strftime("%m-%d")
+        trend_data.append({
+            "date": date_label,
+            "value": counts.get(day_start.date(), 0),
+            "datetime": day_start
+        })
+    return trend_data
+
+
+# ==================== 物化计数 ====================
+
+def _value(value: Any) -> Optional[str]:
+    value = getattr(value, "value", value)
+    return str(value) if value is not None else None
+
+
+def day_id(created_at: datetime) -> str:
+    """``_id`` of the daily counter for a ticket created at ``created_at`` (UTC)."""
+    return f"day:{created_at.strftime('%Y-%m-%d')}"
+
+
+def ticket_deltas(doc: Dict[str, Any], sign: int) -> Dict[str, int]:
+    """``$inc`` for the totals document when ``doc`` is added (+1) or removed (-1)."""
+    inc = {"total": sign}
+    for field, section in COUNTED_FIELDS.items():
+        value = _value(doc.get(field))
+        if value is not None:
+            inc[f"{section}.{value}"] = sign
+    return inc
+
+
+def transition_deltas(before: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, int]:
+    """``$inc`` for the totals document when ``update`` is applied to ``before``."""
+    inc: Dict[str, int] = {}
+    for field, section in COUNTED_FIELDS.items():
+        if field not in update:
+            continue
+        old, new = _value(before.get(field)), _value(update[field])
+        if old == new:
+            continue
+        if old is not None:
+            inc[f"{section}.{old}"] = inc.get(f"{section}.{old}", 0) - 1
+        if new is not None:
+            inc[f"{section}.{new}"] = inc.get(f"{section}.{new}", 0) + 1
+    return inc
+
+
+def _flatten(totals: Dict[str, Any]) -> Dict[str, int]:
+    counters = {"total": totals.get("total", 0)}
+    for section in COUNTED_FIELDS.values():
+        for value, count in (totals.get(section) or {}).items():
+            counters[f"{section}.{value}"] = count
+    return counters
+
+
+class TicketStatsService:
+    """Maintains the materialized dashboard counters and serves reads from them."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "reconciles": 0,
+            "lastReconciledAt": None,
+            "lastReconcileMs": None,
+            "lastDrift": {},
+            "lastSkipped": [],
+            "fallbackReads": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ticket_stats_materialized
+
+    # ==================== 生命周期 ====================
+
+    async def start(self):
+        """Start the periodic reconciler; the first run builds missing counters."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._reconcile_loop())
+            logger.info(f"Ticket stats reconciler started (every {settings.ticket_stats_reconcile_interval}s)")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _reconcile_loop(self):
+        while True:
+            interval = settings.ticket_stats_reconcile_interval
+            try:
+                result = await self.reconcile()
+                if result["initial"] and result["skipped"]:
+                    # Not built yet (reads still aggregate): retry soon
+                    interval = min(interval, INITIAL_RETRY_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ticket stats reconcile failed: {e}")
+            await asyncio.sleep(interval)
+
+    # ==================== 增量更新 ====================
+
+    async def _apply(self, totals_inc: Dict[str, int], day_inc: Optional[tuple], session=None):
+        collection = await get_collection("ticket_stats")
+        if totals_inc:
+            await collection.update_one(
+                {"_id": TOTALS_ID},
+                {"$inc": totals_inc, "$set": {"updatedAt": datetime.utcnow()}},
+                upsert=True,
+                session=session
+            )
+        if day_inc:
+            created_at, delta = day_inc
+            await collection.update_one(
+                {"_id": day_id(created_at)},
+                {"$inc": {"count": delta}},
+                upsert=True,
+                session=session
+            )
+
+    async def record_created(self, doc: Dict[str, Any], session=None):
+        """Count a newly inserted ticket."""
+        if not self.enabled:
+            return
+        created_at = doc.get("createdAt")
+        await self._apply(ticket_deltas(doc, 1), (created_at, 1) if created_at else None, session=session)
+
+    async def record_updated(self, before: Dict[str, Any], update: Dict[str, Any], session=None):
+        """Move a ticket between counters when ``update`` changes a counted field."""
+        if not self.enabled:
+            return
+        await self._apply(transition_deltas(before, update), None, session=session)
+
+    async def record_deleted(self, doc: Dict[str, Any], session=None):
+        """Uncount a deleted ticket (``doc`` as it was before the delete)."""
+        if not self.enabled:
+            return
+        created_at = doc.get("createdAt")
+        await self._apply(ticket_deltas(doc, -1), (created_at, -1) if created_at else None, session=session)
+
+    # ==================== 读取 ====================
+
+    async def get_dashboard(self) -> Optional[Dict[str, Any]]:
+        """Dashboard statistics from the counters; None until the first reconcile built them."""
+        if not self.enabled:
+            return None
+        collection = await get_collection("ticket_stats")
+        days = trend_days(datetime.now(timezone.utc))
+        ids = [TOTALS_ID] + [day_id(day) for day in days]
+        docs = {doc["_id"]: doc async for doc in collection.find({"_id": {"$in": ids}})}
+
+        totals = docs.get(TOTALS_ID)
+        if not totals or not totals.get("reconciledAt"):
+            self.stats["fallbackReads"] += 1
+            return None
+
+        by_status = totals.get("byStatus") or {}
+        return {
+            "overview": {
+                "total": totals.get("total", 0),
+                "open": by_status.get("OPEN", 0),
+                "processing": by_status.get("PROCESSING", 0),
+                "completed": by_status.get("COMPLETED", 0),
+            },
+            "byCategory": {k: v for k, v in (totals.get("byCategory") or {}).items() if v},
+            "byStatus": {k: v for k, v in by_status.items() if v},
+            "byPriority": {k: v for k, v in (totals.get("byPriority") or {}).items() if v},
+            "trend": trend_series(days, {
+                day.date(): docs[day_id(day)].get("count", 0)
+                for day in days if day_id(day) in docs
+            }),
+        }
+
+    # ==================== 对账 ====================
+
+    async def _read_counters(self, collection) -> tuple:
+        """(reconciled, counters): every stored counter flattened to one map."""
+        totals, counters = None, {}
+        async for doc in collection.find({}):
+            if doc["_id"] == TOTALS_ID:
+                totals = doc
+            elif doc["_id"].startswith("day:"):
+                counters[doc["_id"]] = doc.get("count", 0)
+        if totals is not None:
+            counters.update(_flatten(totals))
+        return bool(totals and totals.get("reconciledAt")), counters
+
+    async def reconcile(self) -> Dict[str, Any]:
+        """Recount from the tickets collection and correct the counters that drifted.
+
+        Drift maps each counter that differed to ``[materialized, actual]``.
+        Corrections are applied as ``$inc`` of (actual - materialized), so
+        increments landing after the counters were read are kept. A counter
+        that changed while the aggregation ran cannot be compared and is
+        left for the next run (``skipped``).
+        """
+        started = time.monotonic()
+        tickets = await get_collection("tickets")
+        collection = await get_collection("ticket_stats")
+
+        _, before = await self._read_counters(collection)
+        result = (await tickets.aggregate(stats_pipeline(None)).to_list(1))[0]
+        reconciled, materialized = await self._read_counters(collection)
+
+        overview = result["overview"][0] if result["overview"] else {}
+        actual_totals: Dict[str, Any] = {"total": overview.get("total", 0)}
+        for section in COUNTED_FIELDS.values():
+            actual_totals[section] = {
+                str(doc["_id"]): doc["count"] for doc in result[section] if doc["_id"] is not None
+            }
+        actual = _flatten(actual_totals)
+        actual.update({day_id(doc["_id"]): doc["count"] for doc in result["trend"] if doc["_id"]})
+
+        drift: Dict[str, List[int]] = {}
+        skipped: List[str] = []
+        for key in materialized.keys() | actual.keys() | before.keys():
+            if before.get(key, 0) != materialized.get(key, 0):
+                skipped.append(key)
+            elif materialized.get(key, 0) != actual.get(key, 0):
+                drift[key] = [materialized.get(key, 0), actual.get(key, 0)]
+
+        now = datetime.utcnow()
+        totals_set: Dict[str, Any] = {"updatedAt": now}
+        # Counters incremented before the first complete reconcile are not a baseline
+        initial = not reconciled
+        if not (initial and skipped):
+            totals_set["reconciledAt"] = now
+        update: Dict[str, Any] = {"$set": totals_set}
+        totals_inc = {
+            key: actual_count - stored
+            for key, (stored, actual_count) in drift.items()
+            if not key.startswith("day:")
+        }
+        if totals_inc:
+            update["$inc"] = totals_inc
+        await collection.update_one({"_id": TOTALS_ID}, update, upsert=True)
+        day_ops = [
+            UpdateOne({"_id": key}, {"$inc": {"count": actual_count - stored}}, upsert=True)
+            for key, (stored, actual_count) in drift.items()
+            if key.startswith("day:")
+        ]
+        if day_ops:
+            await collection.bulk_write(day_ops, ordered=False)
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.stats["reconciles"] += 1
+        self.stats["lastReconciledAt"] = now
+        self.stats["lastReconcileMs"] = round(elapsed_ms, 1)
+        self.stats["lastDrift"] = {} if initial else drift
+        self.stats["lastSkipped"] = skipped
+        if initial:
+            logger.info(f"工单统计计数已初始化：{actual['total']} 条工单（{elapsed_ms:.0f}ms）")
+        elif drift:
+            logger.warning(f"工单统计计数与实际不一致，已修正 {len(drift)} 项: {drift}")
+        else:
+            logger.info(f"工单统计计数对账一致（{elapsed_ms:.0f}ms）")
+        if skipped:
+            logger.info(f"工单统计计数 {len(skipped)} 项在对账期间有写入，留待下次对账: {skipped}")
+        return {
+            "initial": initial,
+            "drift": self.stats["lastDrift"],
+            "skipped": skipped,
+            "elapsedMs": round(elapsed_ms, 1),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **self.stats}
+
+
+ticket_stats_service = TicketStatsService()
@@ -0,0 +1,125 @@
+"""Vector store interface for ticket embeddings and backend selection."""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any
+
+from app.config import settings
+
+EMBEDDING_DIM = 1024  # Zhipu embedding-3 dimension
+
+# Scalar ticket fields stored next to each vector so searches can filter
+# inside the ANN query instead of post-filtering in MongoDB.
+METADATA_FIELDS = ("status", "systemSource", "category", "has_handle_detail", "createdAt")
+
+
+def ticket_vector_metadata(ticket: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the scalar metadata stored with a ticket's vector."""
+    def _value(v):
+        return str(getattr(v, "value", v) or "")
+
+    created_at = ticket.get("createdAt")
+    if isinstance(created_at, datetime):
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        created_at_ms = int(created_at.timestamp() * 1000)
+    else:
+        created_at_ms = 0
+
+    return {
+        "status": _value(ticket.get("status")),
+        "systemSource": _value(ticket.get("systemSource")),
+        "category": _value(ticket.get("category")),
+        "has_handle_detail": bool((ticket.get("handleDetail") or "").strip()),
+        "createdAt": created_at_ms,
+    }
+
+
+class VectorStore(ABC):
+    """Storage and similarity search for ticket embeddings.
+
+    Scores are cosine similarities; ``search_similar`` returns
+    ``[{"id": ticket_id, "score": float}, ...]`` ordered by score.
+    """
+
+    embedding_dim: int = EMBEDDING_DIM
+
+    @property
+    def supports_filters(self) -> bool:
+        """Whether ``search_similar`` can apply metadata filters."""
+        return True
+
+    async def start(self):
+        """Open connections / load data and start background tasks."""
+
+    async def close(self):
+        """Stop background tasks and persist pending writes."""
+
+    @abstractmethod
+    async def insert_embedding(
+        self,
+        ticket_id: str,
+        embedding: List[float],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Insert or replace a ticket embedding and its metadata."""
+
+    @abstractmethod
+    async def upsert_embeddings(
+        self,
+        ticket_ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        flush: bool = False
+    ) -> bool:
+        """Bulk insert or replace ticket embeddings."""
+
+    @abstractmethod
+    async def update_metadata(self, ticket_id: str, metadata: Dict[str, Any]) -> bool:
+        """Replace the metadata of an existing embedding (no-op if absent)."""
+
+    @abstractmethod
+    async def delete_embedding(self, ticket_id: str) -> bool:
+        """Delete a ticket embedding."""
+
+    @abstractmethod
+    async def search_similar(
+        self,
+        embedding: List[float],
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Return the top_k most similar ticket ids with scores.
+
+        ``filters`` maps metadata fields to required values (equality, AND-ed).
+        """
+
+    @abstractmethod
+    async def existing_ids(self, ticket_ids: List[str]) -> set:
+        """Return the subset of ticket_ids that have an embedding."""
+
+    @abstractmethod
+    async def flush(self) -> bool:
+        """Persist written data."""
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Number of stored embeddings."""
+
+    async def sync(self) -> bool:
+        """Make acknowledged writes survive a process crash."""
+        return await self.flush()
+
+
+def create_vector_store() -> VectorStore:
+    """Create the vector store selected by ``settings.vector_store_backend``."""
+    backend = settings.vector_store_backend.lower()
+
+    if backend == "milvus":
+        from app.services.milvus_service import MilvusService
+        return MilvusService()
+    if backend == "numpy":
+        from app.services.numpy_vector_store import NumpyVectorStore
+        return NumpyVectorStore(settings.vector_store_path)
+
+    raise ValueError(f"Unknown vector store backend: {settings.vector_store_backend}")
@@ -0,0 +1,77 @@
+"""
+Backfill the derived search fields (searchTokens / createdByTokens / createdByLower) on tickets.
+
+New and updated tickets get these fields on write; run this once after
+upgrading, and again whenever the tokenizer in app/services/text_tokenizer.py
+changes (SEARCH_TOKENS_VERSION is bumped then, so the default run picks up
+every ticket tokenized by an older version). Tickets are streamed in _id
+order and updated with bulk writes.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/backfill_search_fields.py              # 只处理缺少搜索字段或分词版本过旧的工单
+    python scripts/backfill_search_fields.py --all        # 全部重新生成
+    python scripts/backfill_search_fields.py --batch-size 2000
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+import time
+
+from pymongo import UpdateOne
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import connect_to_mongo, close_mongo_connection, get_collection
+from app.services.text_tokenizer import SEARCH_TOKENS_VERSION
+from app.services.ticket_search import ticket_search_fields
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill ticket search fields")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批写入的工单数")
+    parser.add_argument("--all", action="store_true", help="重新生成所有工单的搜索字段")
+    return parser.parse_args()
+
+
+async def backfill(args):
+    await connect_to_mongo()
+    tickets = await get_collection("tickets")
+
+    query = {} if args.all else {
+        "$or": [
+            {"searchVersion": {"$ne": SEARCH_TOKENS_VERSION}},
+            {"createdByTokens": {"$exists": False}},
+        ]
+    }
+    total = await tickets.count_documents(query)
+    print(f"待处理 {total} 个工单")
+
+    processed = 0
+    started = time.monotonic()
+    ops = []
+    cursor = tickets.find(query, {"description": 1, "createdBy": 1}).sort("_id", 1).batch_size(args.batch_size)
+    async for doc in cursor:
+        fields = ticket_search_fields(doc.get("description"), doc.get("createdBy"))
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if len(ops) >= args.batch_size:
+            await tickets.bulk_write(ops, ordered=False)
+            processed += len(ops)
+            ops = []
+            rate = processed / (time.monotonic() - started)
+            print(f"[{processed}/{total}] {rate:.0f} 条/秒")
+
+    if ops:
+        await tickets.bulk_write(ops, ordered=False)
+        processed += len(ops)
+
+    print(f"完成：共更新 {processed} 个工单，用时 {time.monotonic() - started:.1f}s")
+    await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill(parse_args()))
@@ -0,0 +1,313 @@
+"""
+Benchmark ANN index settings for ticket similarity search.
+
+Loads a vector dump, holds out a sample of it as queries, computes exact
+cosine top-k ground truth over the rest and then measures recall@k, QPS and
+p50/p95/p99 latency for:
+
+  * exact   - the in-process NumPy store (VECTOR_STORE_BACKEND=numpy)
+  * milvus  - each index type / build / search param combination, built in a
+              scratch collection ``<MILVUS_COLLECTION>_bench`` on the
+              configured Milvus (the live collection is only read)
+
+For every Milvus index the loaded size (segment mem_size) is reported next to
+the raw float32 size. Quantized indexes (IVF_SQ8 / IVF_PQ) are measured both
+as-is and with the service's exact re-rank (fetch k x factor candidates, then
+re-score against the float vectors), see --rerank-factor.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/benchmark_ann.py --source milvus --save data/vectors.npy   # 导出线上向量并测试
+    python scripts/benchmark_ann.py --vectors data/vectors.npy --targets exact,milvus
+    python scripts/benchmark_ann.py --synthetic 100000 --index-types HNSW --ef 32 64 128
+    python scripts/benchmark_ann.py --vectors data/vectors.npy --k 3 --index-types IVF_FLAT,IVF_SQ8,IVF_PQ --pq-m 32 64 128
+    python scripts/benchmark_ann.py --source numpy --targets exact
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymilvus import AsyncMilvusClient, Collection, utility
+
+from app.config import settings
+from app.services.milvus_service import (
+    INDEX_TYPES,
+    QUANTIZED_INDEX_TYPES,
+    MilvusService,
+    build_index_params,
+    build_search_params,
+    rerank_hits,
+)
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.vector_store import EMBEDDING_DIM
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark for ANN index settings")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--vectors", help="向量文件（.npy，形状 N x dim）")
+    source.add_argument("--source", choices=["milvus", "numpy"], help="从线上 Milvus 集合或 numpy 向量库导出向量")
+    source.add_argument("--synthetic", type=int, help="生成 N 条聚簇随机向量（无真实数据时估算用）")
+    parser.add_argument("--save", help="把加载的向量保存为 .npy，便于重复测试")
+    parser.add_argument("--targets", default="exact,milvus", help="逗号分隔：exact, milvus")
+    parser.add_argument("--queries", type=int, default=200, help="留出作查询的向量数")
+    parser.add_argument("--k", type=int, default=5, help="recall@k 的 k")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发查询数（用于 QPS）")
+    parser.add_argument("--index-types", default=",".join(INDEX_TYPES), help="逗号分隔的 Milvus 索引类型")
+    parser.add_argument("--nlist", type=int, nargs="+", default=[settings.milvus_index_nlist], help="IVF nlist")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64], help="IVF nprobe")
+    parser.add_argument("--m", type=int, nargs="+", default=[settings.milvus_hnsw_m], help="HNSW M")
+    parser.add_argument("--ef-construction", type=int, default=settings.milvus_hnsw_ef_construction)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128], help="HNSW ef")
+    parser.add_argument("--pq-m", type=int, nargs="+", default=[settings.milvus_pq_m], help="IVF_PQ 子向量数")
+    parser.add_argument(
+        "--rerank-factor", type=int, nargs="+", default=sorted({1, settings.milvus_rerank_factor}),
+        help="量化索引的候选倍数（1 = 不重排）"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+# ==================== 数据 ====================
+
+def dump_milvus_vectors() -> np.ndarray:
+    """Read every vector of the live collection."""
+    if not MilvusService().connect():
+        raise SystemExit("无法连接 Milvus")
+    collection = Collection(settings.milvus_collection)
+    collection.load()
+    iterator = collection.query_iterator(batch_size=1000, output_fields=["embedding"])
+    chunks = []
+    while True:
+        rows = iterator.next()
+        if not rows:
+            iterator.close()
+            break
+        chunks.append(np.asarray([row["embedding"] for row in rows], dtype=np.float32))
+    return np.concatenate(chunks) if chunks else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+
+def synthetic_vectors(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Clustered random vectors, closer to real embeddings than uniform noise."""
+    centers = rng.standard_normal((max(1, n // 50), EMBEDDING_DIM)).astype(np.float32)
+    labels = rng.integers(0, len(centers), n)
+    return centers[labels] + 0.3 * rng.standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def load_vectors(args, rng: np.random.Generator) -> np.ndarray:
+    if args.vectors:
+        vectors = np.load(args.vectors)
+    elif args.source == "milvus":
+        vectors = dump_milvus_vectors()
+    elif args.source == "numpy":
+        _, vectors = NumpyVectorStore(settings.vector_store_path).export_vectors()
+    else:
+        vectors = synthetic_vectors(args.synthetic or 20000, rng)
+
+    if args.save:
+        np.save(args.save, vectors)
+        print(f"已保存 {len(vectors)} 条向量到 {args.save}")
+    return normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def exact_top_k(base: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Ground truth row indices (n_queries x k), best first."""
+    scores = queries @ base.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+# ==================== 度量 ====================
+
+def recall_at_k(results: List[List[int]], truth: np.ndarray, k: int) -> float:
+    hits = sum(len(set(found[:k]) & set(expected)) for found, expected in zip(results, truth.tolist()))
+    return hits / (k * len(truth))
+
+
+async def timed_queries(search, queries: np.ndarray, concurrency: int):
+    """Run ``search(vector)`` for every query; return (results, latencies_ms, wall_seconds)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = [0.0] * len(queries)
+
+    async def run(i):
+        async with semaphore:
+            started = time.perf_counter()
+            result = await search(queries[i])
+            latencies[i] = (time.perf_counter() - started) * 1000
+            return result
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run(i) for i in range(len(queries))))
+    return results, latencies, time.perf_counter() - started
+
+
+def report(
+    name: str, params: str, results, latencies, wall: float, truth, k: int,
+    build: float = 0.0, memory: str = ""
+):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(
+        f"{name:<9} {params:<40} recall@{k}={recall_at_k(results, truth, k):.4f}  "
+        f"QPS={len(latencies) / wall:8.1f}  p50={p50:7.2f}ms  p95={p95:7.2f}ms  p99={p99:7.2f}ms"
+        + (f"  build={build:.1f}s" if build else "")
+        + (f"  {memory}" if memory else "")
+    )
+
+
+def loaded_memory(name: str, raw_bytes: int) -> str:
+    """Loaded segment size of a collection vs. the raw float32 vectors."""
+    size = sum(segment.mem_size for segment in utility.get_query_segment_info(name))
+    if not size:
+        return "mem=?"
+    return f"mem={size / 2**20:.1f}MB ({size / raw_bytes:.0%} of float32 {raw_bytes / 2**20:.1f}MB)"
+
+
+# ==================== 被测对象 ====================
+
+async def bench_exact(base: np.ndarray, queries: np.ndarray, truth: np.ndarray, args):
+    with tempfile.TemporaryDirectory() as path:
+        store = NumpyVectorStore(path)
+        await store.upsert_embeddings([str(i) for i in range(len(base))], base.tolist())
+
+        async def search(vector):
+            hits = await store.search_similar(vector.tolist(), top_k=args.k)
+            return [int(hit["id"]) for hit in hits]
+
+        results, latencies, wall = await timed_queries(search, queries, args.concurrency)
+        report("exact", "numpy", results, latencies, wall, truth, args.k)
+
+
+def milvus_configs(args):
+    """(index_params, [search_params, ...]) for every requested combination."""
+    for index_type in [t.strip().upper() for t in args.index_types.split(",") if t.strip()]:
+        if index_type == "IVF_PQ":
+            for nlist in args.nlist:
+                for pq_m in args.pq_m:
+                    yield (
+                        build_index_params("IVF_PQ", nlist=nlist, pq_m=pq_m),
+                        [build_search_params(index_type, args.k, nprobe=nprobe) for nprobe in args.nprobe],
+                    )
+        elif index_type == "HNSW":
+            for m in args.m:
+                yield (
+                    build_index_params("HNSW", m=m, ef_construction=args.ef_construction),
+                    [build_search_params("HNSW", args.k, ef=ef) for ef in args.ef],
+                )
+        else:
+            for nlist in args.nlist:
+                yield (
+                    build_index_params(index_type, nlist=nlist),
+                    [build_search_params(index_type, args.k, nprobe=nprobe) for nprobe in args.nprobe],
+                )
+
+
+async def bench_milvus(base: np.ndarray, queries: np.ndarray, truth: np.ndarray, args):
+    milvus = MilvusService()
+    if not milvus.connect():
+        print("无法连接 Milvus，跳过 milvus 测试")
+        return
+
+    name = f"{settings.milvus_collection}_bench"
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+
+    collection = None
+    client = AsyncMilvusClient(
+        uri=f"http://{settings.milvus_host}:{settings.milvus_port}",
+        timeout=settings.milvus_timeout
+    )
+    try:
+        for index_params, search_params_list in milvus_configs(args):
+            started = time.perf_counter()
+            if collection is None:
+                collection = milvus.create_new_collection(name, index_params)
+                empty = ["", "", "", False, 0]
+                for offset in range(0, len(base), 1000):
+                    chunk = base[offset:offset + 1000]
+                    ids = [str(i) for i in range(offset, offset + len(chunk))]
+                    collection.insert([ids, chunk.tolist()] + [[v] * len(chunk) for v in empty])
+                collection.flush()
+            else:
+                collection.release()
+                collection.drop_index()
+                collection.create_index(field_name="embedding", index_params=index_params)
+            utility.wait_for_index_building_complete(name)
+            collection.load()
+            build = time.perf_counter() - started
+            memory = loaded_memory(name, base.nbytes)
+
+            index_type = index_params["index_type"]
+            factors = args.rerank_factor if index_type in QUANTIZED_INDEX_TYPES else [1]
+            build_desc = ",".join(f"{k}={v}" for k, v in index_params["params"].items())
+            for search_params in search_params_list:
+                for factor in factors:
+                    async def search(vector, search_params=search_params, factor=factor):
+                        # factor > 1 only for IVF indexes, whose search params do not depend on limit
+                        limit = args.k * factor
+                        hits = await client.search(
+                            name,
+                            data=[vector.tolist()],
+                            anns_field="embedding",
+                            limit=limit,
+                            search_params=search_params,
+                        )
+                        hits = [{"id": hit["id"], "score": hit["distance"]} for hit in hits[0]]
+                        if factor > 1:
+                            rows = await client.get(name, ids=[hit["id"] for hit in hits], output_fields=["embedding"])
+                            hits = rerank_hits(vector.tolist(), hits, {row["id"]: row["embedding"] for row in rows})
+                        return [int(hit["id"]) for hit in hits[:args.k]]
+
+                    results, latencies, wall = await timed_queries(search, queries, args.concurrency)
+                    search_desc = ",".join(f"{k}={v}" for k, v in search_params["params"].items())
+                    if factor > 1:
+                        search_desc += f" rerank={factor}x"
+                    report(
+                        index_type, f"{build_desc} {search_desc}",
+                        results, latencies, wall, truth, args.k, build, memory
+                    )
+                    build = 0.0
+    finally:
+        await client.close()
+        if utility.has_collection(name):
+            utility.drop_collection(name)
+
+
+async def main(args):
+    rng = np.random.default_rng(args.seed)
+    vectors = load_vectors(args, rng)
+    if len(vectors) <= args.queries + args.k:
+        raise SystemExit(f"向量太少（{len(vectors)} 条），无法留出 {args.queries} 条查询")
+
+    # Held-out queries, so a query never trivially matches itself
+    order = rng.permutation(len(vectors))
+    queries, base = vectors[order[:args.queries]], vectors[order[args.queries:]]
+    truth = exact_top_k(base, queries, args.k)
+    print(f"底库 {len(base)} 条，查询 {len(queries)} 条，k={args.k}，并发 {args.concurrency}\n")
+
+    targets = {t.strip() for t in args.targets.split(",")}
+    if "exact" in targets:
+        await bench_exact(base, queries, truth, args)
+    if "milvus" in targets:
+        await bench_milvus(base, queries, truth, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,213 @@
+"""
+Benchmark the ticket list search: unanchored $regex scan vs. the indexed
+searchTokens / createdByTokens path.
+
+Fills a scratch collection (default ``tickets_search_bench``, the live
+``tickets`` collection is never touched) with synthetic tickets whose
+descriptions mix Chinese phrases, error codes and order numbers, then runs
+the list endpoint's two queries (count + first page sorted by createdAt)
+for each search mode and reports p50/p95 latency and the documents / keys
+examined according to explain(). Every search must return the same
+tickets both ways; the script exits with status 1 on any mismatch.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/benchmark_ticket_search.py                      # 100 万条（首次生成较慢，之后复用）
+    python scripts/benchmark_ticket_search.py --count 200000 --queries 50
+    python scripts/benchmark_ticket_search.py --regenerate         # 重新生成测试数据
+    python scripts/benchmark_ticket_search.py --drop               # 测试结束后删除测试集合
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import connect_to_mongo, close_mongo_connection, get_collection
+from app.services.ticket_search import TICKET_LIST_SORT, search_filter, ticket_search_fields
+
+PHRASES = [
+    "订单", "无法支付", "物流延迟", "库存不一致", "接口超时", "系统报错", "仓库", "出库失败",
+    "入库单", "运单号", "签收异常", "退款", "发票", "收货地址", "修改", "重复扣款", "同步失败",
+    "打印面单", "拣货", "波次", "承运商", "轨迹未更新", "页面空白", "权限不足", "导出报表",
+    "数据丢失", "批量导入", "客户投诉", "加急处理", "回调失败", "网关", "审核不通过",
+]
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗"
+GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂"
+LATIN_NAMES = ["alice", "bob", "carol", "david", "emma", "frank", "grace", "henry"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ticket list search benchmark ($regex scan vs index)")
+    parser.add_argument("--count", type=int, default=1_000_000, help="测试工单数")
+    parser.add_argument("--collection", default="tickets_search_bench", help="测试集合名")
+    parser.add_argument("--queries", type=int, default=20, help="每类查询的次数")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--regenerate", action="store_true", help="删除并重新生成测试数据")
+    parser.add_argument("--drop", action="store_true", help="结束后删除测试集合")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+# ==================== 数据 ====================
+
+def random_ticket(rng: random.Random, seq: int, start: datetime) -> dict:
+    parts = rng.sample(PHRASES, rng.randint(3, 7))
+    if rng.random() < 0.3:
+        parts.insert(rng.randrange(len(parts)), f"ERR_{rng.randint(400, 599)}")
+    if rng.random() < 0.5:
+        parts.insert(rng.randrange(len(parts)), f"SO{rng.randint(10**9, 10**10 - 1)}")
+    description = "，".join(parts)
+
+    if rng.random() < 0.2:
+        created_by = rng.choice(LATIN_NAMES).capitalize() + str(rng.randint(1, 99))
+    else:
+        created_by = rng.choice(SURNAMES) + "".join(rng.choices(GIVEN, k=rng.randint(1, 2)))
+
+    return {
+        "id": f"BENCH-{seq:08d}",
+        "description": description,
+        "createdBy": created_by,
+        "status": rng.choice(["OPEN", "PROCESSING", "COMPLETED"]),
+        "createdAt": start + timedelta(seconds=seq * 30),
+        **ticket_search_fields(description, created_by),
+    }
+
+
+async def generate(collection, count: int, seed: int):
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(seconds=count * 30)
+    batch_size = 5000
+    started = time.monotonic()
+    for offset in range(0, count, batch_size):
+        docs = [random_ticket(rng, seq, start) for seq in range(offset, min(offset + batch_size, count))]
+        await collection.insert_many(docs, ordered=False)
+        done = offset + len(docs)
+        if done % 100_000 < batch_size:
+            print(f"  已生成 {done}/{count}（{done / (time.monotonic() - started):.0f} 条/秒）")
+
+    print("  创建索引…")
+    await collection.create_index([("searchTokens", 1)] + TICKET_LIST_SORT)
+    await collection.create_index([("createdByTokens", 1)] + TICKET_LIST_SORT)
+
+
+def sample_queries(rng: random.Random, docs: list, n: int) -> dict:
+    """Search strings drawn from the generated data."""
+    codes = [w for d in docs for w in d["description"].split("，") if w.startswith(("ERR_", "SO"))]
+    return {
+        "phrase": [rng.choice(PHRASES) for _ in range(n)],
+        "code": [rng.choice(codes) for _ in range(n)],
+        "code-prefix": [rng.choice(codes)[:7] for _ in range(n)],
+        "code-infix": [code[rng.randrange(2, 5):][:rng.randint(1, 5)] for code in rng.choices(codes, k=n)],
+        "mixed": [rng.choice(PHRASES)[-1] + rng.choice(codes)[:2] for _ in range(n)],
+        "createdBy": [name[rng.randrange(len(name)):][:rng.randint(1, 3)]
+                      for name in (rng.choice(docs)["createdBy"] for _ in range(n))],
+    }
+
+
+# ==================== 测试 ====================
+
+def scan_filter(kind: str, q: str) -> dict:
+    """The previous filters: unanchored case-insensitive regex."""
+    if kind == "createdBy":
+        return {"createdBy": {"$regex": q, "$options": "i"}}
+    return {"description": {"$regex": q, "$options": "i"}}
+
+
+def index_filter(kind: str, q: str) -> dict:
+    if kind == "createdBy":
+        return search_filter(None, q)
+    return search_filter(q, None)
+
+
+async def matching_ids(collection, query: dict) -> set:
+    return {doc["_id"] for doc in await collection.find(query, {"_id": 1}).to_list(None)}
+
+
+async def check_same_results(collection, kind: str, strings: list) -> int:
+    """Number of queries whose indexed result differs from the $regex scan."""
+    mismatches = 0
+    for q in strings:
+        scanned = await matching_ids(collection, scan_filter(kind, q))
+        indexed = await matching_ids(collection, index_filter(kind, q))
+        if scanned != indexed:
+            mismatches += 1
+            print(f"  结果不一致 {q!r}: scan={len(scanned)} index={len(indexed)}")
+    return mismatches
+
+
+async def list_page(collection, query: dict, page_size: int) -> int:
+    """The list endpoint's work: total count + first page."""
+    total = await collection.count_documents(query)
+    await collection.find(query).sort(TICKET_LIST_SORT).limit(page_size).to_list(page_size)
+    return total
+
+
+async def explain_stats(collection, query: dict, page_size: int) -> str:
+    plan = await collection.find(query).sort(TICKET_LIST_SORT).limit(page_size).explain()
+    stats = plan.get("executionStats", {})
+    stage = plan.get("queryPlanner", {}).get("winningPlan", {})
+    stages = []
+    while stage:
+        stages.append(stage.get("stage", "?"))
+        stage = stage.get("inputStage") or (stage.get("inputStages") or [None])[0]
+    return (
+        f"plan={'>'.join(stages)} docsExamined={stats.get('totalDocsExamined')} "
+        f"keysExamined={stats.get('totalKeysExamined')}"
+    )
+
+
+async def run(args):
+    await connect_to_mongo()
+    collection = await get_collection(args.collection)
+
+    existing = await collection.estimated_document_count()
+    if args.regenerate or existing != args.count:
+        await collection.drop()
+        print(f"生成 {args.count} 条测试工单到 {args.collection} …")
+        await generate(collection, args.count, args.seed)
+    else:
+        print(f"复用已有测试集合 {args.collection}（{existing} 条）")
+
+    rng = random.Random(args.seed + 1)
+    sample = await collection.aggregate([{"$sample": {"size": 2000}}]).to_list(2000)
+    queries = sample_queries(rng, sample, args.queries)
+
+    print()
+    mismatches = 0
+    for kind, strings in queries.items():
+        for mode, build in (("scan", scan_filter), ("index", index_filter)):
+            latencies, totals = [], []
+            for q in strings:
+                started = time.perf_counter()
+                totals.append(await list_page(collection, build(kind, q), args.page_size))
+                latencies.append((time.perf_counter() - started) * 1000)
+            p50, p95 = np.percentile(latencies, [50, 95])
+            explain = await explain_stats(collection, build(kind, strings[0]), args.page_size)
+            print(
+                f"{kind:<12} {mode:<6} p50={p50:9.1f}ms  p95={p95:9.1f}ms  "
+                f"avg_hits={np.mean(totals):10.0f}  {explain}"
+            )
+        mismatches += await check_same_results(collection, kind, strings)
+        print()
+
+    print(f"搜索结果与 $regex 一致: {'是' if not mismatches else f'否（{mismatches} 个查询不一致）'}")
+
+    if args.drop:
+        await collection.drop()
+        print(f"已删除测试集合 {args.collection}")
+    await close_mongo_connection()
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
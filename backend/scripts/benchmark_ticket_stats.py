@@ -0,0 +1,165 @@
+"""
+Benchmark the dashboard statistics (/api/tickets/stats): the previous 34
+sequential queries (4 $group aggregations + 30 daily count_documents) vs.
+the single $facet pipeline used by TicketService.get_dashboard_statistics.
+
+Fills a scratch collection (default ``tickets_stats_bench``, the live
+``tickets`` collection is never touched) with synthetic tickets spread
+over the last year, with the production indexes on createdAt, checks that
+both variants return the same numbers and reports p50/p95 latency.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/benchmark_ticket_stats.py --count 100000
+    python scripts/benchmark_ticket_stats.py --count 1000000 --runs 5
+    python scripts/benchmark_ticket_stats.py --count 100000 --drop   # 测试结束后删除测试集合
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import connect_to_mongo, close_mongo_connection, get_collection
+from app.services.ticket_search import TICKET_LIST_SORT
+from app.services.ticket_stats import stats_pipeline, trend_days, trend_series
+
+STATUSES = ["OPEN", "PROCESSING", "COMPLETED"]
+CATEGORIES = ["TICKET_PROCESS", "SYSTEM_FAILURE"]
+PRIORITIES = ["P0", "P1", "P2", "P3"]
+SOURCES = ["TMS", "OMS", "WMS"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dashboard statistics benchmark (34 queries vs one $facet)")
+    parser.add_argument("--count", type=int, default=100_000, help="测试工单数")
+    parser.add_argument("--collection", default="tickets_stats_bench", help="测试集合名")
+    parser.add_argument("--runs", type=int, default=10, help="每种方式的执行次数")
+    parser.add_argument("--regenerate", action="store_true", help="删除并重新生成测试数据")
+    parser.add_argument("--drop", action="store_true", help="结束后删除测试集合")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+# ==================== 数据 ====================
+
+async def generate(collection, count: int, seed: int):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    batch_size = 5000
+    started = time.monotonic()
+    for offset in range(0, count, batch_size):
+        docs = [
+            {
+                "id": f"BENCH-{seq:08d}",
+                "status": rng.choice(STATUSES),
+                "category": rng.choice(CATEGORIES),
+                "priority": rng.choice(PRIORITIES),
+                "systemSource": rng.choice(SOURCES),
+                "createdAt": now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+            }
+            for seq in range(offset, min(offset + batch_size, count))
+        ]
+        await collection.insert_many(docs, ordered=False)
+        done = offset + len(docs)
+        if done % 100_000 < batch_size:
+            print(f"  已生成 {done}/{count}（{done / (time.monotonic() - started):.0f} 条/秒）")
+
+    print("  创建索引…")
+    await collection.create_index(TICKET_LIST_SORT)
+    await collection.create_index([("status", 1)] + TICKET_LIST_SORT)
+
+
+# ==================== 两种实现 ====================
+
+async def legacy_stats(collection) -> dict:
+    """The previous implementation: 4 aggregations and 30 counts, one after another."""
+    overview = {}
+    async for doc in collection.aggregate([{"$group": {
+        "_id": None,
+        "total": {"$sum": 1},
+        "open": {"$sum": {"$cond": [{"$eq": ["$status", "OPEN"]}, 1, 0]}},
+        "processing": {"$sum": {"$cond": [{"$eq": ["$status", "PROCESSING"]}, 1, 0]}},
+        "completed": {"$sum": {"$cond": [{"$eq": ["$status", "COMPLETED"]}, 1, 0]}},
+    }}]):
+        overview = {k: doc[k] for k in ("total", "open", "processing", "completed")}
+
+    sections = {}
+    for name, field in (("byCategory", "category"), ("byStatus", "status"), ("byPriority", "priority")):
+        sections[name] = {
+            doc["_id"]: doc["count"]
+            async for doc in collection.aggregate([{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}])
+        }
+
+    trend = []
+    for day_start in trend_days(datetime.now(timezone.utc)):
+        trend.append(await collection.count_documents({
+            "createdAt": {"$gte": day_start, "$lt": day_start + timedelta(days=1)}
+        }))
+    return {"overview": overview, **sections, "trend": trend}
+
+
+async def facet_stats(collection) -> dict:
+    """The current implementation (same code path as get_dashboard_statistics)."""
+    days = trend_days(datetime.now(timezone.utc))
+    result = (await collection.aggregate(stats_pipeline(days[0])).to_list(1))[0]
+    overview = result["overview"][0]
+    counts = {doc["_id"].date(): doc["count"] for doc in result["trend"]}
+    return {
+        "overview": {k: overview[k] for k in ("total", "open", "processing", "completed")},
+        **{
+            name: {doc["_id"]: doc["count"] for doc in result[name]}
+            for name in ("byCategory", "byStatus", "byPriority")
+        },
+        "trend": [point["value"] for point in trend_series(days, counts)],
+    }
+
+
+async def timed(fn, collection, runs: int):
+    latencies, result = [], None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = await fn(collection)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return result, latencies
+
+
+async def run(args):
+    await connect_to_mongo()
+    collection = await get_collection(args.collection)
+
+    existing = await collection.estimated_document_count()
+    if args.regenerate or existing != args.count:
+        await collection.drop()
+        print(f"生成 {args.count} 条测试工单到 {args.collection} …")
+        await generate(collection, args.count, args.seed)
+    else:
+        print(f"复用已有测试集合 {args.collection}（{existing} 条）")
+
+    print()
+    results = {}
+    for name, fn in (("34 queries", legacy_stats), ("$facet", facet_stats)):
+        results[name], latencies = await timed(fn, collection, args.runs)
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"{name:<11} p50={p50:9.1f}ms  p95={p95:9.1f}ms")
+
+    same = results["34 queries"] == results["$facet"]
+    print(f"\n结果一致: {'是' if same else '否'}")
+
+    if args.drop:
+        await collection.drop()
+        print(f"已删除测试集合 {args.collection}")
+    await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,79 @@
+"""
+Create the MongoDB indexes registered in app/indexes.py and check query plans.
+
+The application applies the same registry at startup; run this before a
+deploy to build new indexes ahead of time on large collections. With
+--verify it also lists registered indexes that are missing and indexes
+that exist but are not registered (they are never dropped), then runs
+explain() on every production query shape and aggregation pipeline and
+exits with status 1 if any of them uses a COLLSCAN.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/ensure_indexes.py             # 创建缺少的索引
+    python scripts/ensure_indexes.py --verify    # 创建并校验查询计划（有全表扫描时退出码为 1）
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import connect_to_mongo, close_mongo_connection, get_database
+from app.indexes import INDEXES, ensure_indexes, verify_query_plans
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Apply the MongoDB index registry and verify query plans")
+    parser.add_argument("--verify", action="store_true", help="用 explain() 校验各查询是否走索引")
+    return parser.parse_args()
+
+
+async def report_indexes(db) -> int:
+    """Print missing / unregistered indexes; return the number missing."""
+    missing = 0
+    for collection_name, models in INDEXES.items():
+        existing = await db[collection_name].index_information()
+        declared = {model.document["name"] for model in models}
+        for name in sorted(declared - existing.keys()):
+            print(f"  缺少索引   {collection_name}.{name}")
+            missing += 1
+        for name in sorted(existing.keys() - declared - {"_id_"}):
+            print(f"  未登记索引 {collection_name}.{name}")
+    return missing
+
+
+async def run(args) -> int:
+    await connect_to_mongo()
+    db = get_database()
+    status = 0
+
+    failed = await ensure_indexes(db)
+    if failed:
+        print(f"创建失败的索引: {', '.join(failed)}")
+        status = 1
+    else:
+        print("索引已就绪")
+
+    if args.verify:
+        print("\n索引对比：")
+        if await report_indexes(db):
+            status = 1
+
+        print("\n查询计划：")
+        for result in await verify_query_plans(db):
+            mark = "ok  " if result["ok"] else "SCAN"
+            print(f"  [{mark}] {result['collection']:<14} {result['name']:<48} {'>'.join(result['stages'])}")
+            if not result["ok"]:
+                status = 1
+
+    await close_mongo_connection()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
@@ -0,0 +1,121 @@
+"""
+Migrate the Milvus ticket embeddings collection to the schema with scalar
+filter fields (status, systemSource, category, has_handle_detail, createdAt).
+
+Existing vectors are copied (not re-embedded) into a new collection, with
+the scalar fields filled from MongoDB. The old collection is then dropped
+and the new one renamed to MILVUS_COLLECTION. Vectors whose ticket no
+longer exists in MongoDB are dropped.
+
+Stop the backend (or accept that writes during the copy are lost) before
+running, then start it again afterwards.
+
+Usage:
+    cd backend
+    source venv/bin/activate
+    python scripts/migrate_milvus_schema.py --dry-run
+    python scripts/migrate_milvus_schema.py
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymilvus import Collection, utility
+
+from app.config import settings
+from app.database import connect_to_mongo, close_mongo_connection, get_collection
+from app.services.milvus_service import MilvusService
+from app.services.vector_store import METADATA_FIELDS, ticket_vector_metadata
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Add scalar filter fields to the Milvus collection")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批复制的向量数")
+    parser.add_argument("--dry-run", action="store_true", help="只检查，不修改")
+    return parser.parse_args()
+
+
+async def migrate(args):
+    milvus = MilvusService()
+    if not milvus.connect():
+        print("无法连接 Milvus")
+        return
+
+    name = settings.milvus_collection
+    if not utility.has_collection(name):
+        print(f"集合 {name} 不存在，启动服务时会直接按新 schema 创建")
+        return
+
+    old = Collection(name)
+    field_names = {f.name for f in old.schema.fields}
+    if set(METADATA_FIELDS) <= field_names:
+        print(f"集合 {name} 已是新 schema，无需迁移")
+        return
+
+    old.load()
+    print(f"集合 {name} 需要迁移，当前 {old.num_entities} 条向量")
+    if args.dry_run:
+        return
+
+    new_name = f"{name}_v2"
+    if utility.has_collection(new_name):
+        utility.drop_collection(new_name)
+    milvus.create_new_collection(new_name)
+    new = Collection(new_name)
+
+    await connect_to_mongo()
+    tickets = await get_collection("tickets")
+    projection = {
+        "id": 1, "status": 1, "systemSource": 1,
+        "category": 1, "handleDetail": 1, "createdAt": 1,
+    }
+
+    copied = 0
+    orphans = 0
+    iterator = old.query_iterator(batch_size=args.batch_size, output_fields=["id", "embedding"])
+    while True:
+        rows = iterator.next()
+        if not rows:
+            iterator.close()
+            break
+
+        ids = [row["id"] for row in rows]
+        docs = {}
+        async for doc in tickets.find({"id": {"$in": ids}}, projection):
+            docs[doc["id"]] = doc
+
+        columns = [[], []] + [[] for _ in METADATA_FIELDS]
+        for row in rows:
+            doc = docs.get(row["id"])
+            if not doc:
+                orphans += 1
+                continue
+            metadata = ticket_vector_metadata(doc)
+            columns[0].append(row["id"])
+            columns[1].append(list(row["embedding"]))
+            for i, field in enumerate(METADATA_FIELDS):
+                columns[2 + i].append(metadata[field])
+
+        if columns[0]:
+            new.insert(columns)
+            copied += len(columns[0])
+        print(f"已复制 {copied} 条（丢弃无对应工单的向量 {orphans} 条）")
+
+    new.flush()
+    print(f"新集合 {new_name} 共 {new.num_entities} 条向量")
+
+    old.release()
+    utility.drop_collection(name)
+    utility.rename_collection(new_name, name)
+    print(f"完成！{new_name} 已重命名为 {name}")
+
+    await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate(parse_args()))
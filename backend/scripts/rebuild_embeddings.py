@@ -1,83 +1,222 @@
 """
-Rebuild embeddings for all existing tickets.
-Run this script to generate embeddings for tickets that don't have one yet.
+Rebuild embeddings for existing tickets.
+
+Tickets are streamed from MongoDB in batches, embedded with a bounded number
+of concurrent batched embedding calls and bulk-upserted into the configured
+vector store (Milvus or the in-process NumPy store), with a single flush at
+the end. Progress is checkpointed in MongoDB so an interrupted run resumes
+where it stopped.
 
 Usage:
     cd backend
     source venv/bin/activate
-    python scripts/rebuild_embeddings.py
+    python scripts/rebuild_embeddings.py                  # 全量重建（可断点续跑）
+    python scripts/rebuild_embeddings.py --only-missing   # 只补齐向量库中缺失的向量
+    python scripts/rebuild_embeddings.py --since 2026-01-01 --batch-size 64 --concurrency 4
+    python scripts/rebuild_embeddings.py --restart        # 忽略检查点，从头开始
 """
 
+import argparse
 import asyncio
 import sys
 import os
+import time
+from collections import deque
+from datetime import datetime
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from motor.motor_asyncio import AsyncIOMotorClient
-from app.config import settings
-from app.services.ai_service import AIService
-
-
-async def rebuild_embeddings():
-    """Rebuild embeddings for all tickets."""
-    # Connect to MongoDB
-    client = AsyncIOMotorClient(settings.mongodb_url)
-    db = client[settings.database_name]
-    collection = db["tickets"]
-
-    # Get AI service
-    ai_service = AIService()
-
-    # Get all tickets
-    tickets = []
-    async for doc in collection.find({}):
-        tickets.append(doc)
-
-    print(f"找到 {len(tickets)} 个工单")
-
-    success_count = 0
-    fail_count = 0
-
-    for i, ticket in enumerate(tickets, 1):
-        ticket_id = ticket.get("id")
-        description = ticket.get("description", "")
-        category = ticket.get("category")
-        system_source = ticket.get("systemSource")
-        handle_type = ticket.get("handleType")
-
-        if not description:
-            print(f"[{i}/{len(tickets)}] {ticket_id}: 跳过（无问题描述）")
-            fail_count += 1
-            continue
-
-        print(f"[{i}/{len(tickets)}] {ticket_id}: 正在生成向量...")
-
-        success = await ai_service.store_ticket_embedding(
-            ticket_id=ticket_id,
-            description=description
-        )
-
-        if success:
-            print(f"[{i}/{len(tickets)}] {ticket_id}: ✓ 成功")
-            success_count += 1
+from app.database import connect_to_mongo, close_mongo_connection, get_collection
+from app.services.ai_service import ai_service
+from app.services.vector_store import ticket_vector_metadata
+
+CHECKPOINT_COLLECTION = "embedding_rebuild_checkpoints"
+CHECKPOINT_ID = "rebuild_embeddings"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild ticket embeddings in the vector store")
+    parser.add_argument("--batch-size", type=int, default=64, help="每批读取/写入的工单数")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发批次数")
+    parser.add_argument("--only-missing", action="store_true", help="只处理向量库中没有向量的工单")
+    parser.add_argument("--since", type=lambda s: datetime.strptime(s, "%Y-%m-%d"),
+                        help="只处理该日期(YYYY-MM-DD)之后创建的工单")
+    parser.add_argument("--restart", action="store_true", help="忽略检查点，从头开始")
+    return parser.parse_args()
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+async def load_checkpoint(checkpoints, filters: dict, restart: bool) -> tuple:
+    """Return ``(ObjectId to resume after, tickets already processed)``; ``(None, 0)`` starts from scratch."""
+    if restart:
+        await checkpoints.delete_one({"_id": CHECKPOINT_ID})
+        return None, 0
+
+    checkpoint = await checkpoints.find_one({"_id": CHECKPOINT_ID})
+    if not checkpoint or checkpoint.get("finished") or checkpoint.get("lastId") is None:
+        return None, 0
+    if checkpoint.get("filters") != filters:
+        print("检查点的筛选条件与本次不同，从头开始")
+        return None, 0
+
+    processed = checkpoint.get("processed", 0)
+    print(f"从检查点恢复：上次已处理 {processed} 个工单")
+    return checkpoint["lastId"], processed
+
+
+async def process_batch(docs: list, only_missing: bool) -> dict:
+    """Embed and upsert one batch of tickets. Returns per-batch counters."""
+    stats = {"success": 0, "failed": 0, "skipped": 0}
+
+    if only_missing:
+        try:
+            existing = await ai_service.vector_store.existing_ids([d["id"] for d in docs])
+        except Exception as e:
+            print(f"  查询已有向量失败，整批重新生成: {e}")
+            existing = set()
+        stats["skipped"] += len(existing)
+        docs = [d for d in docs if d["id"] not in existing]
+
+    if not docs:
+        return stats
+
+    try:
+        embeddings = await ai_service.embed_many([d["description"] for d in docs])
+    except asyncio.TimeoutError:
+        embeddings = [None] * len(docs)
+
+    ids, vectors, metadatas = [], [], []
+    for doc, embedding in zip(docs, embeddings):
+        if embedding:
+            ids.append(doc["id"])
+            vectors.append(embedding)
+            metadatas.append(ticket_vector_metadata(doc))
         else:
-            print(f"[{i}/{len(tickets)}] {ticket_id}: ✗ 失败")
-            fail_count += 1
+            print(f"  {doc['id']}: ✗ 生成向量失败")
+            stats["failed"] += 1
 
-    print(f"\n完成！成功: {success_count}, 失败: {fail_count}")
-
-    # Check Milvus count
-    from pymilvus import connections, Collection, utility
-    connections.connect(host=settings.milvus_host, port=settings.milvus_port)
-    if utility.has_collection(settings.milvus_collection):
-        collection = Collection(settings.milvus_collection)
-        num = collection.num_entities
-        print(f"Milvus 中现在有 {num} 条向量数据")
-
-    client.close()
+    if ids:
+        ok = await ai_service.vector_store.upsert_embeddings(ids, vectors, metadatas)
+        if ok:
+            stats["success"] += len(ids)
+        else:
+            stats["failed"] += len(ids)
+
+    return stats
+
+
+async def rebuild_embeddings(args):
+    """Rebuild embeddings for tickets as a streaming, resumable pipeline."""
+    await connect_to_mongo()
+    await ai_service.vector_store.start()
+    tickets = await get_collection("tickets")
+    checkpoints = await get_collection(CHECKPOINT_COLLECTION)
+
+    query = {"id": {"$exists": True}, "description": {"$nin": ["", None]}}
+    if args.since:
+        query["createdAt"] = {"$gte": args.since}
+
+    filters = {
+        "onlyMissing": args.only_missing,
+        "since": args.since.isoformat() if args.since else None,
+    }
+    last_id, resumed = await load_checkpoint(checkpoints, filters, args.restart)
+    if last_id is not None:
+        query["_id"] = {"$gt": last_id}
+
+    remaining = await tickets.count_documents(query)
+    total = resumed + remaining
+    print(f"待处理 {remaining} 个工单（共 {total}，batch={args.batch_size}, concurrency={args.concurrency}）")
+
+    totals = {"success": 0, "failed": 0, "skipped": 0}
+    # Counts tickets of earlier runs too, so progress and the checkpoint stay cumulative
+    processed = resumed
+    started = time.monotonic()
+
+    # In-flight batches in cursor order; the checkpoint only advances past
+    # batches whose predecessors are all done, so a resume never skips work.
+    in_flight = deque()
+
+    async def drain_completed():
+        nonlocal processed
+        while in_flight and in_flight[0][1].done():
+            batch_last_id, task, size = in_flight.popleft()
+            for key, value in task.result().items():
+                totals[key] += value
+            processed += size
+
+            await checkpoints.update_one(
+                {"_id": CHECKPOINT_ID},
+                {"$set": {
+                    "lastId": batch_last_id,
+                    "filters": filters,
+                    "processed": processed,
+                    "finished": False,
+                    "updatedAt": datetime.utcnow(),
+                }},
+                upsert=True
+            )
+
+            elapsed = time.monotonic() - started
+            rate = (processed - resumed) / elapsed if elapsed > 0 else 0.0
+            eta = (total - processed) / rate if rate > 0 else 0.0
+            print(
+                f"[{processed}/{total}] 成功 {totals['success']} 失败 {totals['failed']} "
+                f"跳过 {totals['skipped']} | {rate:.1f} 条/秒 | ETA {format_eta(eta)}"
+            )
+
+    projection = {
+        "id": 1, "description": 1, "status": 1, "systemSource": 1,
+        "category": 1, "handleDetail": 1, "createdAt": 1,
+    }
+    cursor = tickets.find(query, projection).sort("_id", 1).batch_size(args.batch_size)
+
+    async def submit(batch: list):
+        """Start a batch once fewer than ``concurrency`` batches are in flight."""
+        while len(in_flight) >= args.concurrency:
+            await asyncio.wait([t for _, t, _ in in_flight], return_when=asyncio.FIRST_COMPLETED)
+            await drain_completed()
+        task = asyncio.create_task(process_batch(batch, args.only_missing))
+        in_flight.append((batch[-1]["_id"], task, len(batch)))
+
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= args.batch_size:
+            await submit(batch)
+            batch = []
+
+    if batch:
+        await submit(batch)
+
+    if in_flight:
+        await asyncio.wait([t for _, t, _ in in_flight])
+        await drain_completed()
+
+    # Single flush for the whole run
+    await ai_service.vector_store.flush()
+    await checkpoints.update_one(
+        {"_id": CHECKPOINT_ID},
+        {"$set": {"finished": True, "updatedAt": datetime.utcnow()}},
+        upsert=True
+    )
+
+    elapsed = time.monotonic() - started
+    print(
+        f"\n完成！成功: {totals['success']}, 失败: {totals['failed']}, "
+        f"跳过: {totals['skipped']}, 耗时 {format_eta(elapsed)}"
+    )
+
+    print(f"向量库中现在有 {await ai_service.vector_store.count()} 条向量数据")
+
+    await ai_service.shutdown()
+    await close_mongo_connection()
 
 
 if __name__ == "__main__":
-    asyncio.run(rebuild_embeddings())
+    asyncio.run(rebuild_embeddings(parse_args()))
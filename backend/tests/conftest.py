@@ -0,0 +1,39 @@
+"""Shared fixtures.
+
+Tests that need MongoDB use ``mongo_db``: a throwaway database on
+``TEST_MONGODB_URL`` (default: the configured ``MONGODB_URL``), dropped
+afterwards, and installed as ``app.database``'s database so services
+write to it. They are skipped when no server answers.
+"""
+
+import os
+import uuid
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+import app.database as app_database
+from app.config import settings
+
+
+@pytest.fixture
+async def mongo_db(monkeypatch):
+    url = os.environ.get("TEST_MONGODB_URL", settings.mongodb_url)
+    client = AsyncIOMotorClient(url, serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"MongoDB not reachable at {url}")
+
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    database = client[name]
+    monkeypatch.setattr(app_database, "client", client)
+    monkeypatch.setattr(app_database, "database", database)
+    monkeypatch.setattr(app_database, "_supports_transactions", None)
+    try:
+        yield database
+    finally:
+        await client.drop_database(name)
+        client.close()
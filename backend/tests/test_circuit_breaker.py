@@ -0,0 +1,122 @@
+"""Circuit breaker state transitions, with a fake clock."""
+
+import asyncio
+
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from app.services.executors import DependencySaturated
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test", failure_threshold=3, recovery_timeout=30)
+
+
+async def call(breaker: CircuitBreaker, outcome=None):
+    async with breaker.guard():
+        if outcome is not None:
+            raise outcome
+
+
+async def fail(breaker: CircuitBreaker, times: int = 1):
+    for _ in range(times):
+        with pytest.raises(ConnectionError):
+            await call(breaker, ConnectionError("down"))
+
+
+async def test_opens_at_failure_threshold(breaker):
+    await fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+    await fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.stats["opened"] == 1
+
+
+async def test_success_resets_consecutive_failures(breaker):
+    await fail(breaker, 2)
+    await call(breaker)
+    await fail(breaker, 2)
+
+    assert breaker.state == CLOSED
+
+
+async def test_open_breaker_fails_fast(breaker, clock):
+    await fail(breaker, 3)
+    clock.now += 10
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        await call(breaker)
+
+    assert exc_info.value.retry_after == pytest.approx(20)
+    assert breaker.stats["rejected"] == 1
+
+
+async def test_half_open_allows_a_single_probe(breaker, clock):
+    await fail(breaker, 3)
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+
+    probe_started, release = asyncio.Event(), asyncio.Event()
+
+    async def probe():
+        async with breaker.guard():
+            probe_started.set()
+            await release.wait()
+
+    task = asyncio.create_task(probe())
+    await probe_started.wait()
+    with pytest.raises(CircuitOpenError):
+        await call(breaker)
+
+    release.set()
+    await task
+    assert breaker.state == CLOSED
+
+
+async def test_successful_probe_closes(breaker, clock):
+    await fail(breaker, 3)
+    clock.now += 30
+
+    await call(breaker)
+
+    assert breaker.state == CLOSED
+    await fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+
+async def test_failed_probe_reopens(breaker, clock):
+    await fail(breaker, 3)
+    clock.now += 30
+
+    await fail(breaker)
+
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == pytest.approx(30)
+    with pytest.raises(CircuitOpenError):
+        await call(breaker)
+
+
+async def test_local_back_pressure_is_not_a_failure(breaker):
+    for _ in range(5):
+        with pytest.raises(DependencySaturated):
+            await call(breaker, DependencySaturated("vector"))
+
+    assert breaker.state == CLOSED
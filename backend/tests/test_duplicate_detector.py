@@ -0,0 +1,62 @@
+"""Edited tickets must not outlive the duplicate window."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.services.duplicate_detector import DuplicateDetector
+
+TEXT = "订单 SO1001 无法支付，支付页面报错 ERR_502，客户多次重试失败"
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    monkeypatch.setattr(settings, "duplicate_detection", True)
+    monkeypatch.setattr(settings, "duplicate_window_hours", 24)
+    return DuplicateDetector(num_perm=128, bands=32)
+
+
+def ticket(ticket_id: str, created_at: datetime, status: str = "OPEN") -> dict:
+    return {"id": ticket_id, "description": TEXT, "createdAt": created_at, "status": status, "systemSource": "OMS"}
+
+
+def test_new_ticket_matches_recent_one(detector):
+    now = datetime.utcnow()
+    assert detector.check_and_add("AS-1", TEXT, now - timedelta(hours=1)) == []
+    assert [m["id"] for m in detector.check_and_add("AS-2", TEXT, now)] == ["AS-1"]
+
+
+def test_edit_of_ticket_outside_window_is_not_indexed(detector):
+    detector.sync(ticket("AS-OLD", datetime.utcnow() - timedelta(hours=48)))
+
+    assert detector.get_stats()["indexed"] == 0
+    assert detector.check_and_add("AS-NEW", TEXT, datetime.utcnow()) == []
+
+
+def test_repeated_edits_keep_one_order_entry(detector):
+    created_at = datetime.utcnow() - timedelta(hours=1)
+    for _ in range(5):
+        detector.sync(ticket("AS-1", created_at))
+
+    assert len(detector._order) == 1
+
+
+def test_ticket_expires_after_edits(detector, monkeypatch):
+    created_at = datetime.utcnow() - timedelta(hours=23)
+    detector.check_and_add("AS-1", TEXT, created_at)
+    detector.sync(ticket("AS-2", datetime.utcnow()))
+    detector.sync(ticket("AS-1", created_at))
+
+    monkeypatch.setattr(settings, "duplicate_window_hours", 12)
+    detector._expire()
+
+    assert set(detector._entries) == {"AS-2"}
+
+
+def test_completed_ticket_is_dropped(detector):
+    created_at = datetime.utcnow()
+    detector.sync(ticket("AS-1", created_at))
+    detector.sync(ticket("AS-1", created_at, status="COMPLETED"))
+
+    assert detector.get_stats()["indexed"] == 0
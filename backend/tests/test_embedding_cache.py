@@ -0,0 +1,22 @@
+"""Persistent embedding cache entries carry a lastUsedAt for the TTL index."""
+
+from datetime import datetime, timedelta
+
+from app.services.embedding_cache import CACHE_COLLECTION, EmbeddingCache
+
+
+async def test_persistent_hit_refreshes_stale_last_used(mongo_db):
+    cache = EmbeddingCache(model="embedding-3", dim=4)
+    await cache.put("订单无法支付", [0.1, 0.2, 0.3, 0.4])
+    collection = mongo_db[CACHE_COLLECTION]
+    key = cache.key("订单无法支付")
+
+    doc = await collection.find_one({"_id": key})
+    assert doc["lastUsedAt"] >= doc["createdAt"]
+
+    old = datetime.utcnow() - timedelta(days=30)
+    await collection.update_one({"_id": key}, {"$set": {"lastUsedAt": old}})
+    fresh = EmbeddingCache(model="embedding-3", dim=4)  # empty memory tier
+
+    assert await fresh.get("订单无法支付") == [0.1, 0.2, 0.3, 0.4]
+    assert (await collection.find_one({"_id": key}))["lastUsedAt"] > old + timedelta(days=29)
@@ -0,0 +1,49 @@
+"""MicroBatcher must resolve every waiter, whatever the handler does."""
+
+import asyncio
+
+from app.services.micro_batcher import MicroBatcher
+
+
+async def test_concurrent_items_share_one_batch():
+    calls = []
+
+    async def handler(key, items):
+        calls.append(items)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(handler, max_batch_size=8, max_wait_ms=5)
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert results == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+
+
+async def test_short_result_list_fails_every_waiter():
+    async def handler(key, items):
+        return items[:-1]
+
+    batcher = MicroBatcher(handler, max_batch_size=8, max_wait_ms=5)
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True),
+        timeout=1
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+async def test_cancelled_batch_cancels_waiters():
+    started = asyncio.Event()
+
+    async def handler(key, items):
+        started.set()
+        await asyncio.sleep(10)
+
+    batcher = MicroBatcher(handler, max_batch_size=2, max_wait_ms=5)
+    waiters = asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+    await started.wait()
+    for task in list(batcher._tasks):
+        task.cancel()
+
+    results = await asyncio.wait_for(waiters, timeout=1)
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
@@ -0,0 +1,116 @@
+"""NumpyVectorStore: upsert, filtered search, tombstones, compaction and reload."""
+
+import numpy as np
+import pytest
+
+from app.services.numpy_vector_store import NumpyVectorStore
+
+
+def vector(*hot: int) -> list:
+    """Unit-ish vector with weight on the given dimensions."""
+    v = np.zeros(1024, dtype=np.float32)
+    for i, dim in enumerate(hot):
+        v[dim] = 1.0 / (i + 1)
+    return v.tolist()
+
+
+def meta(status: str = "COMPLETED", source: str = "OMS") -> dict:
+    return {"status": status, "systemSource": source, "category": "SYSTEM_FAILURE", "has_handle_detail": True}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "vectors"))
+    store.load()
+    return store
+
+
+async def test_upsert_and_search(store):
+    await store.upsert_embeddings(["AS-1", "AS-2"], [vector(0), vector(1)], [meta(), meta()])
+
+    results = await store.search_similar(vector(0), top_k=2)
+
+    assert [r["id"] for r in results] == ["AS-1", "AS-2"]
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert await store.count() == 2
+
+
+async def test_upsert_same_id_replaces_vector(store):
+    await store.insert_embedding("AS-1", vector(0), meta())
+    await store.insert_embedding("AS-1", vector(5), meta(status="OPEN"))
+
+    assert await store.count() == 1
+    assert len(store._ids) == 1
+    results = await store.search_similar(vector(5), top_k=1)
+    assert results == [{"id": "AS-1", "score": pytest.approx(1.0)}]
+    assert await store.search_similar(vector(5), top_k=1, filters={"status": "COMPLETED"}) == []
+
+
+async def test_search_applies_filters(store):
+    await store.upsert_embeddings(
+        ["AS-1", "AS-2", "AS-3"],
+        [vector(0), vector(0, 1), vector(0, 2)],
+        [meta(source="OMS"), meta(source="WMS"), meta(status="OPEN", source="WMS")]
+    )
+
+    results = await store.search_similar(
+        vector(0), top_k=5, filters={"systemSource": "WMS", "status": "COMPLETED"}
+    )
+
+    assert [r["id"] for r in results] == ["AS-2"]
+
+
+async def test_delete_leaves_tombstone(store):
+    await store.upsert_embeddings(["AS-1", "AS-2"], [vector(0), vector(0, 1)], [meta(), meta()])
+
+    await store.delete_embedding("AS-1")
+
+    assert [r["id"] for r in await store.search_similar(vector(0), top_k=5)] == ["AS-2"]
+    assert await store.existing_ids(["AS-1", "AS-2"]) == {"AS-2"}
+    assert store._tombstones == 1
+    assert store._ids == [None, "AS-2"]
+
+
+async def test_compaction_drops_tombstones(store):
+    await store.upsert_embeddings(
+        ["AS-1", "AS-2", "AS-3"], [vector(0), vector(1), vector(2)], [meta(), meta(), meta(status="OPEN")]
+    )
+    await store.delete_embedding("AS-2")
+    old_matrix = store._matrix_path(store._generation)
+
+    store.compact()
+
+    assert store._ids == ["AS-1", "AS-3"]
+    assert store._tombstones == 0
+    assert not old_matrix.exists()
+    assert [r["id"] for r in await store.search_similar(vector(2), top_k=1)] == ["AS-3"]
+    completed = await store.search_similar(vector(2), top_k=1, filters={"status": "COMPLETED"})
+    assert [r["id"] for r in completed] == ["AS-1"]
+
+
+async def test_reopen_from_disk(store, tmp_path):
+    await store.upsert_embeddings(["AS-1", "AS-2"], [vector(0), vector(1)], [meta(), meta(source="WMS")])
+    await store.delete_embedding("AS-1")
+    store.persist()
+
+    reopened = NumpyVectorStore(str(tmp_path / "vectors"))
+    reopened.load()
+
+    assert await reopened.count() == 1
+    assert reopened._tombstones == 1
+    results = await reopened.search_similar(vector(1), top_k=5, filters={"systemSource": "WMS"})
+    assert results == [{"id": "AS-2", "score": pytest.approx(1.0)}]
+
+
+async def test_grows_past_initial_capacity(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.numpy_vector_store.INITIAL_CAPACITY", 2)
+    small = NumpyVectorStore(str(tmp_path / "small"))
+    small.load()
+
+    ids = [f"AS-{i}" for i in range(5)]
+    await small.upsert_embeddings(ids, [vector(i) for i in range(5)], [meta()] * 5)
+    small.persist()
+
+    reopened = NumpyVectorStore(str(tmp_path / "small"))
+    reopened.load()
+    assert [r["id"] for r in await reopened.search_similar(vector(4), top_k=1)] == ["AS-4"]
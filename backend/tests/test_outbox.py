@@ -0,0 +1,43 @@
+"""An outbox worker must survive MongoDB errors while recording a job's result."""
+
+import asyncio
+
+from app.services import outbox
+from app.services.outbox import OutboxService
+
+
+async def test_worker_survives_failed_status_update(monkeypatch):
+    service = OutboxService()
+    jobs = [
+        {"_id": "embed:AS-1:1", "type": "embed", "attempts": 1},
+        {"_id": "embed:AS-2:1", "type": "embed", "attempts": 1},
+    ]
+    handled = []
+
+    async def claim():
+        return jobs.pop(0) if jobs else None
+
+    async def handler(job):
+        handled.append(job["_id"])
+        return True
+
+    class FailingCollection:
+        async def update_one(self, *args, **kwargs):
+            raise ConnectionError("mongo unavailable")
+
+    async def get_collection(name):
+        return FailingCollection()
+
+    monkeypatch.setattr(service, "_claim", claim)
+    monkeypatch.setattr(outbox, "get_collection", get_collection)
+    service.handlers["embed"] = handler
+
+    worker = asyncio.create_task(service._worker(0))
+    for _ in range(50):
+        if len(handled) == 2:
+            break
+        await asyncio.sleep(0.01)
+    worker.cancel()
+    await asyncio.gather(worker, return_exceptions=True)
+
+    assert handled == ["embed:AS-1:1", "embed:AS-2:1"]
@@ -0,0 +1,17 @@
+"""Every production query shape in app/indexes.py must be served by an index."""
+
+from app.indexes import ensure_indexes, pipeline_shapes, query_shapes, verify_query_plans
+
+
+async def test_registered_indexes_are_created(mongo_db):
+    assert await ensure_indexes(mongo_db) == []
+
+
+async def test_no_query_shape_uses_a_collection_scan(mongo_db):
+    await ensure_indexes(mongo_db)
+
+    results = await verify_query_plans(mongo_db)
+
+    assert len(results) == len(query_shapes()) + len(pipeline_shapes())
+    scans = [f"{r['collection']}: {r['name']} ({'>'.join(r['stages'])})" for r in results if not r["ok"]]
+    assert not scans, "COLLSCAN in: " + "; ".join(scans)
@@ -0,0 +1,51 @@
+"""Substring search over searchTokens must find what the old $regex found."""
+
+import random
+
+import pytest
+
+from app.services.text_tokenizer import index_terms, query_terms
+from app.services.ticket_search import creator_search_fields, search_filter
+
+
+def indexed_match(query: str, text: str) -> bool:
+    """The list endpoint's check: $all over the stored terms, then the substring re-check."""
+    return set(query_terms(query)) <= set(index_terms(text)) and query.lower() in text.lower()
+
+
+@pytest.mark.parametrize("query, text", [
+    ("a", "abc"),
+    ("订单A", "订单ABC"),
+    ("12345", "订单号AS12345异常"),
+    ("404", "ERR404 timeout"),
+    ("AS-2026", "工单 AS-20260227-21 无法出库"),
+    ("err_4", "ERR_404"),
+    ("无法支付", "订单无法支付"),
+    ("单", "订单"),
+])
+def test_substring_is_found(query, text):
+    assert indexed_match(query, text)
+
+
+def test_every_substring_is_covered_by_index_terms():
+    rng = random.Random(7)
+    alphabet = "订单支付异常超时ab1c2-_ ERR404SO99"
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 24)))
+        start = rng.randrange(len(text))
+        query = text[start:rng.randint(start + 1, len(text))]
+        assert set(query_terms(query)) <= set(index_terms(text)), (query, text)
+
+
+@pytest.mark.parametrize("query, creator", [
+    ("zhang", "XiaoZhang"),
+    ("Wang", "wang.lei"),
+    ("伟", "王伟"),
+    ("ob1", "Bob12"),
+])
+def test_creator_search_matches_substrings(query, creator):
+    fields = creator_search_fields(creator)
+    query_filter = search_filter(None, query)
+
+    assert set(query_filter["createdByTokens"]["$all"]) <= set(fields["createdByTokens"])
+    assert query_filter["createdByLower"]["$regex"] in fields["createdByLower"]
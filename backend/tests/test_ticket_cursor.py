@@ -0,0 +1,106 @@
+"""Keyset cursors: every ticket exactly once across pages, bad cursors rejected with 400."""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.services.ticket_search import TICKET_LIST_SORT, cursor_filter, encode_cursor
+
+START = datetime(2026, 10, 1, 8, 0, 0)
+
+
+def make_tickets() -> list:
+    """Tickets with runs of equal createdAt, so pages split inside ties."""
+    tickets = []
+    for i in range(23):
+        created_at = START + timedelta(seconds=i // 4)  # groups of 4 share a timestamp
+        tickets.append({
+            "id": f"AS-20261001-{i:02d}",
+            "status": "OPEN" if i % 3 else "COMPLETED",
+            "createdAt": created_at,
+        })
+    return tickets
+
+
+def list_order(tickets: list) -> list:
+    return sorted(tickets, key=lambda t: (t["createdAt"], t["id"]), reverse=True)
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 1, 8, 0, 0, 123000)
+    query = cursor_filter(encode_cursor(created_at, "AS-20261001-07"))
+
+    assert query == {
+        "createdAt": {"$lte": created_at},
+        "$or": [{"createdAt": {"$lt": created_at}}, {"id": {"$lt": "AS-20261001-07"}}],
+    }
+
+
+def test_cursor_truncates_to_mongo_millisecond_precision():
+    created_at = datetime(2026, 10, 1, 8, 0, 0, 123456)
+    query = cursor_filter(encode_cursor(created_at, "AS-1"))
+
+    assert query["createdAt"]["$lte"] == created_at.replace(microsecond=123000)
+
+
+def _b64(payload: bytes) -> str:
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    _b64(b"garbage"),
+    _b64(json.dumps([1]).encode()),
+    _b64(json.dumps(["x", "AS-1"]).encode()),
+    _b64(json.dumps([1, 2]).encode()),
+    _b64(json.dumps([10 ** 20, "AS-1"]).encode()),
+    _b64(json.dumps({"millis": 1, "id": "AS-1"}).encode()),
+])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        cursor_filter(cursor)
+
+
+@pytest.mark.parametrize("query", [{}, {"status": "OPEN"}])
+async def test_pages_cover_every_ticket_once(mongo_db, query):
+    collection = mongo_db["tickets"]
+    tickets = make_tickets()
+    await collection.insert_many([dict(t) for t in tickets])
+    await collection.create_index([("status", 1)] + TICKET_LIST_SORT)
+
+    seen, cursor = [], None
+    while True:
+        page_query = {**query, **cursor_filter(cursor)} if cursor else query
+        page = await collection.find(page_query, {"_id": 0}).sort(TICKET_LIST_SORT).limit(5).to_list(5)
+        seen.extend(page)
+        if len(page) < 5:
+            break
+        cursor = encode_cursor(page[-1]["createdAt"], page[-1]["id"])
+
+    expected = list_order([t for t in tickets if all(t[k] == v for k, v in query.items())])
+    assert [t["id"] for t in seen] == [t["id"] for t in expected]
+
+
+@pytest.fixture
+async def api(monkeypatch):
+    # The tickets router imports storage_service, which checks its MinIO bucket on import
+    import minio
+    monkeypatch.setattr(minio.Minio, "bucket_exists", lambda self, bucket: True)
+    from app.api import tickets
+
+    app = FastAPI()
+    app.include_router(tickets.router, prefix="/api/tickets")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("cursor", ["%%%", _b64(b"garbage"), _b64(json.dumps([1, 2]).encode())])
+async def test_api_rejects_malformed_cursor_with_400(api, cursor):
+    response = await api.get("/api/tickets", params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
@@ -0,0 +1,82 @@
+"""Materialized dashboard counters follow ticket writes and reconcile with zero drift."""
+
+import pytest
+
+from app.config import settings
+from app.models.ticket import (
+    TicketCategory, TicketCreate, TicketPriority, TicketStatus, TicketSystemSource, TicketUpdate
+)
+from app.services.ticket_stats import ticket_stats_service
+
+
+@pytest.fixture
+def ticket_service(mongo_db):
+    try:
+        from app.services.ticket_service import ticket_service
+    except Exception as e:  # storage_service connects to MinIO on import
+        pytest.skip(f"ticket_service unavailable: {e}")
+    return ticket_service
+
+
+def new_ticket(description: str) -> TicketCreate:
+    return TicketCreate(
+        systemSource=TicketSystemSource.OMS,
+        category=TicketCategory.SYSTEM_FAILURE,
+        description=description,
+        priority=TicketPriority.P2,
+    )
+
+
+async def aggregated_statistics(ticket_service, monkeypatch):
+    monkeypatch.setattr(settings, "ticket_stats_materialized", False)
+    try:
+        return await ticket_service.get_dashboard_statistics()
+    finally:
+        monkeypatch.setattr(settings, "ticket_stats_materialized", True)
+
+
+async def test_counters_follow_create_update_delete(ticket_service, monkeypatch):
+    monkeypatch.setattr(settings, "ticket_stats_materialized", True)
+    await ticket_stats_service.reconcile()
+
+    first = await ticket_service.create_ticket(new_ticket("订单 SO1001 无法支付"))
+    stats = await ticket_stats_service.get_dashboard()
+    assert stats["overview"] == {"total": 1, "open": 1, "processing": 0, "completed": 0}
+    assert stats["byPriority"] == {"P2": 1}
+    assert stats["trend"][-1]["value"] == 1
+
+    await ticket_service.update_ticket(
+        first.id, TicketUpdate(status=TicketStatus.PROCESSING, priority=TicketPriority.P0)
+    )
+    stats = await ticket_stats_service.get_dashboard()
+    assert stats["overview"] == {"total": 1, "open": 0, "processing": 1, "completed": 0}
+    assert stats["byPriority"] == {"P0": 1}
+
+    await ticket_service.create_ticket(new_ticket("仓库出库失败 ERR_502"))
+    assert await ticket_service.delete_ticket(first.id)
+    stats = await ticket_stats_service.get_dashboard()
+    assert stats["overview"] == {"total": 1, "open": 1, "processing": 0, "completed": 0}
+    assert stats["byStatus"] == {"OPEN": 1}
+    assert stats["trend"][-1]["value"] == 1
+
+    assert stats == await aggregated_statistics(ticket_service, monkeypatch)
+
+    result = await ticket_stats_service.reconcile()
+    assert not result["initial"]
+    assert result["drift"] == {}
+    assert result["skipped"] == []
+
+
+async def test_reconcile_corrects_drift(ticket_service, mongo_db, monkeypatch):
+    monkeypatch.setattr(settings, "ticket_stats_materialized", True)
+    await ticket_stats_service.reconcile()
+    await ticket_service.create_ticket(new_ticket("接口超时"))
+
+    await mongo_db["ticket_stats"].update_one({"_id": "totals"}, {"$inc": {"total": 5, "byStatus.OPEN": -1}})
+    result = await ticket_stats_service.reconcile()
+    assert result["drift"] == {"total": [6, 1], "byStatus.OPEN": [0, 1]}
+
+    stats = await ticket_stats_service.get_dashboard()
+    assert stats["overview"]["total"] == 1
+    assert stats["byStatus"] == {"OPEN": 1}
+    assert (await ticket_stats_service.reconcile())["drift"] == {}
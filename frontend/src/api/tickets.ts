@@ -2,6 +2,8 @@ import api from "./client";
 import type {
   Ticket,
   TicketCreate,
+  TicketCreateResponse,
+  DuplicateCandidate,
   TicketUpdate,
   TicketListParams,
   TicketListResponse,
@@ -23,8 +25,8 @@ export const ticketsApi = {
   },
 
   // Create ticket
-  create: async (data: TicketCreate): Promise<Ticket> => {
-    const response = await api.post<Ticket>("/api/tickets", data);
+  create: async (data: TicketCreate): Promise<TicketCreateResponse> => {
+    const response = await api.post<TicketCreateResponse>("/api/tickets", data);
     return response.data;
   },
 
@@ -39,6 +41,12 @@ export const ticketsApi = {
     await api.delete(`/api/tickets/${id}`);
   },
 
+  // Get likely duplicates among recent open tickets
+  getDuplicates: async (id: string): Promise<{ ticketId: string; duplicates: DuplicateCandidate[] }> => {
+    const response = await api.get<{ ticketId: string; duplicates: DuplicateCandidate[] }>(`/api/tickets/${id}/duplicates`);
+    return response.data;
+  },
+
   // Get statistics
   getStats: async (): Promise<TicketStatistics> => {
     const response = await api.get<TicketStatistics>("/api/tickets/stats");
@@ -56,8 +64,10 @@ export const ticketsApi = {
   },
 
   // Get handling recommendation using AI
-  getRecommendation: async (ticketId: string): Promise<{ recommendation: string }> => {
-    const response = await api.get<{ recommendation: string }>(`/api/tickets/${ticketId}/recommendation`);
+  getRecommendation: async (ticketId: string, refresh = false): Promise<{ recommendation: string }> => {
+    const response = await api.get<{ recommendation: string }>(`/api/tickets/${ticketId}/recommendation`, {
+      params: refresh ? { refresh: true } : undefined,
+    });
     return response.data;
   },
 
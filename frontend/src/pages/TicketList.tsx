@@ -43,6 +43,7 @@ const TicketList = () => {
   const [loading, setLoading] = useState(false);
   const [tickets, setTickets] = useState<Ticket[]>([]);
   const [total, setTotal] = useState(0);
+  const [totalCapped, setTotalCapped] = useState(false);
   const [params, setParams] = useState<TicketListParams>({
     page: 1,
     pageSize: 10,
@@ -82,6 +83,7 @@ const TicketList = () => {
       const response = await ticketsApi.list(params);
       setTickets(response.items);
       setTotal(response.total);
+      setTotalCapped(!!response.totalCapped);
     } catch (err) {
       message.error("加载工单列表失败");
       console.error(err);
@@ -454,7 +456,7 @@ const TicketList = () => {
             pageSize: params.pageSize,
             total,
             showSizeChanger: true,
-            showTotal: (total) => <span className="tech-pagination-total">共 {total} 条</span>,
+            showTotal: (total) => <span className="tech-pagination-total">共 {total}{totalCapped ? "+" : ""} 条</span>,
             className: "tech-pagination",
           }}
           onChange={handleTableChange}
@@ -32,6 +32,8 @@ export interface AIMetadata {
   keywords: string[];
   similarTickets: string[];
   suggestedSolution?: string;
+  recommendationFingerprint?: string;
+  recommendedAt?: string;
 }
 
 export interface TicketImage {
@@ -64,6 +66,16 @@ export interface Ticket {
   aiMetadata: AIMetadata;
 }
 
+export interface DuplicateCandidate {
+  id: string;
+  similarity: number;
+  createdAt?: string;
+}
+
+export interface TicketCreateResponse extends Ticket {
+  possibleDuplicates: DuplicateCandidate[];
+}
+
 export interface TicketCreate {
   systemSource: TicketSystemSource;
   category: TicketCategory;
@@ -108,6 +120,7 @@ export interface TicketListParams {
   search?: string;
   createdBy?: string;
   ticketId?: string;
+  cursor?: string; // nextCursor of the previous page (keyset pagination, page is ignored)
 }
 
 export interface TicketListResponse {
@@ -116,6 +129,8 @@ export interface TicketListResponse {
   page: number;
   pageSize: number;
   totalPages: number;
+  totalCapped?: boolean; // total is a lower bound ("1000+")
+  nextCursor?: string | null;
 }
 
 export interface TrendDataPoint {